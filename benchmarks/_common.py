@@ -0,0 +1,38 @@
+"""
+ベンチマーク共通の計測・表示ユーティリティ
+"""
+import gc
+import time
+import tracemalloc
+from typing import Any, Callable
+
+
+def measure(fn: Callable[[Any], Any], setup: Callable[[], Any] = lambda: None, repeat: int = 3) -> tuple[float, int]:
+    """
+    fn(setup()) の実行時間(repeat 回の最短)と、ピークメモリ(tracemalloc, バイト)を計測する
+    setup の時間とメモリは含めない
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        arg = setup()
+        gc.collect()
+        begin = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - begin)
+
+    arg = setup()
+    gc.collect()
+    tracemalloc.start()
+    fn(arg)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def print_table(header: list[str], rows: list[list[Any]]):
+    cells = [header] + [[f"{c:.4f}" if isinstance(c, float) else str(c) for c in row] for row in rows]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(header))]
+    for i, row in enumerate(cells):
+        print("  ".join(c.rjust(w) for c, w in zip(row, widths)))
+        if i == 0:
+            print("  ".join("-" * w for w in widths))
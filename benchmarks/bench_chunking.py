@@ -0,0 +1,80 @@
+"""
+チャンクの分け方(ChunkingPolicy)ごとに、サンプルテーブルの大きさと、FlavReader でのサンプルの読み込み速度を比較する
+チャンクが小さいとstsc/stcoが大きくなり読み込みが細切れになり、大きいと1サンプルを読むまでの待ち(読み込むバイト数)が増える
+
+    python benchmarks/bench_chunking.py --duration 300
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from flavtool.analyzer import analyze
+from flavtool.composer import Composer
+from flavtool.composer.utils import SyntheticMp4Creator, ChunkingPolicy
+from flavtool.parser import Parser
+from flavtool.reader import FlavReader
+from _common import measure, print_table
+
+policies = [
+    ("source", None),
+    ("samples=1", ChunkingPolicy(samples=1)),
+    ("duration=0.1", ChunkingPolicy(duration=0.1)),
+    ("duration=0.5", ChunkingPolicy(duration=0.5)),
+    ("duration=2", ChunkingPolicy(duration=2.0)),
+    ("size=1MiB", ChunkingPolicy(size=1024 * 1024)),
+]
+
+
+def read_all(reader: FlavReader, media_types: list[str]) -> int:
+    """
+    トラックのサンプルを先頭から順にすべて読み、読んだバイト数を返す
+    """
+    size = 0
+    for media_type in media_types:
+        for i in range(reader.sample_count(media_type)):
+            size += len(reader.read_sample(media_type, i))
+    reader.close()
+    return size
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--duration", type=float, default=300, help="file length (s)")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "synthetic.mp4")
+        out_path = os.path.join(tmp, "chunked.mp4")
+        SyntheticMp4Creator(args.duration, {"vide": 30, "soun": 46.875, "tast": 10},
+                            sample_sizes={"vide": 20000, "soun": 400}).write(path)
+        for name, policy in policies:
+            composer = Composer(analyze(Parser(path).parse(read_mdat_bytes=False)), chunking=policy)
+            composer.compose()
+            composer.write(out_path)
+
+            flav_mp4 = Parser(out_path).probe()
+            media_types = [mt for mt, track in flav_mp4.tracks.items() if track is not None]
+            sample_tables = [flav_mp4.tracks[mt].media.media_info.sample_table for mt in media_types]
+            chunk_n = sum(st.chunk_offset.number_of_entries for st in sample_tables)
+            stsc_n = sum(len(st.sample_to_chunk.sample_to_chunk_table) for st in sample_tables)
+            moov_size = flav_mp4.parsed["moov"].cached_size()
+
+            seconds, _ = measure(lambda reader: read_all(reader, media_types), lambda: FlavReader(out_path),
+                                 args.repeat)
+            size = read_all(FlavReader(out_path), media_types)
+            tast_seconds, _ = measure(lambda reader: read_all(reader, ["tast"]), lambda: FlavReader(out_path),
+                                      args.repeat)
+            with FlavReader(out_path, flav_mp4=flav_mp4) as reader:
+                tast_n = reader.sample_count("tast")
+            rows.append([name, chunk_n, stsc_n, f"{moov_size / 1e3:.0f}", f"{size / 1e6 / seconds:.0f}",
+                         f"{tast_n / tast_seconds:.0f}"])
+    print_table(["chunking", "chunks", "stsc", "moov(KB)", "read(MB/s)", "tast(samples/s)"], rows)
+
+
+if __name__ == "__main__":
+    main()
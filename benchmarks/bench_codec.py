@@ -0,0 +1,61 @@
+"""
+(N, D) のフレームを、1フレームずつ get_encoder / get_decoder で処理する場合と、
+encode_batch / decode_batch でまとめて処理する場合で比較する
+(distinct はすべて異なるフレーム、repeated は同じフレームが続く味データを想定したもの)
+
+    python benchmarks/bench_codec.py --frames 216000 --width 5
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from flavtool.codec import encode_batch, decode_batch, get_encoder, get_decoder
+from _common import measure, print_table
+
+
+def frames_of(kind: str, frame_n: int, width: int) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    if kind == "distinct":
+        return rng.integers(0, 256, size=(frame_n, width), dtype=np.uint8)
+    # 平均30フレームずつ同じ値が続く
+    values = rng.integers(0, 256, size=(frame_n // 30 + 1, width), dtype=np.uint8)
+    return values[np.sort(rng.integers(0, len(values), size=frame_n))]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--frames", type=int, default=216000, help="number of frames (1h at 60fps)")
+    arg_parser.add_argument("--width", type=int, default=5, help="bytes per frame")
+    arg_parser.add_argument("--codecs", nargs="+", default=["raw5", "rmix"])
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    rows = []
+    for codec in args.codecs:
+        width = 5 if codec == "raw5" else args.width
+        encoder, decoder = get_encoder(codec), get_decoder(codec)
+        for kind in ("distinct", "repeated"):
+            frames = frames_of(kind, args.frames, width)
+            codes, sizes = encode_batch(codec, frames)
+            separated = [encoder(frame) for frame in frames]
+            results = [
+                ("frame", "encode", measure(lambda data: [encoder(frame) for frame in data], lambda: frames,
+                                            args.repeat)),
+                ("batch", "encode", measure(lambda data: encode_batch(codec, data), lambda: frames, args.repeat)),
+                ("frame", "decode", measure(lambda data: np.stack([decoder(code) for code in data]),
+                                            lambda: separated, args.repeat)),
+                ("batch", "decode", measure(lambda data: decode_batch(codec, data, sizes), lambda: codes,
+                                            args.repeat)),
+            ]
+            for mode, operation, (seconds, peak) in results:
+                rows.append([codec, kind, operation, mode, seconds, f"{args.frames / seconds / 1e6:.2f}",
+                             f"{peak / 1e6:.1f}"])
+    print_table(["codec", "frames", "op", "mode", "time(s)", "Mframes/s", "peak(MB)"], rows)
+
+
+if __name__ == "__main__":
+    main()
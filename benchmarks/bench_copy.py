@@ -0,0 +1,56 @@
+"""
+ストリーミングで compose したファイルの write() を、mdat のコピー方法ごとに比較する
+(copy_file_range / sendfile はカーネル内でコピーし、read は Python 上で読み書きする)
+
+    python benchmarks/bench_copy.py --duration 60 --video-size 100000
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from flavtool.analyzer import analyze
+from flavtool.composer import Composer
+from flavtool.composer.utils import SyntheticMp4Creator
+from flavtool.parser import Parser
+from flavtool.parser.range_writer import RangeWriter
+from _common import measure, print_table
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--duration", type=float, default=60, help="file length (s)")
+    arg_parser.add_argument("--video-size", type=int, default=100000, help="average video sample size (bytes)")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "synthetic.mp4")
+        out_path = os.path.join(tmp, "composed.mp4")
+        SyntheticMp4Creator(args.duration, {"vide": 30, "soun": 46.875, "tast": 10},
+                            sample_sizes={"vide": args.video_size, "soun": 2000}).write(path)
+        size = os.path.getsize(path)
+
+        def composed():
+            composer = Composer(analyze(Parser(path).parse(read_mdat_bytes=False)))
+            composer.compose()
+            return composer
+
+        default_methods = RangeWriter.methods
+        for name, methods in [("copy_file_range", ("copy_file_range",)), ("sendfile", ("sendfile",)), ("read", ())]:
+            if any(not hasattr(os, method) for method in methods):
+                continue
+            RangeWriter.methods = methods
+            try:
+                seconds, peak = measure(lambda composer: composer.write(out_path), composed, args.repeat)
+            finally:
+                RangeWriter.methods = default_methods
+            rows.append([f"{size / 1e6:.0f}", name, seconds, f"{size / 1e6 / seconds:.0f}", f"{peak / 1e6:.1f}"])
+    print_table(["size(MB)", "copy", "time(s)", "MB/s", "peak(MB)"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Composer のインターリーブ(チャンクの並び順とオフセットの決定)の時間を、チャンク数ごとに計測する
+チャンク数に比例して増えること(1チャンクあたりの時間がほぼ一定であること)を確認する
+
+    python benchmarks/bench_interleave.py --durations 60 600 3600
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from flavtool.analyzer import analyze
+from flavtool.composer import Composer
+from flavtool.composer.utils import SyntheticMp4Creator
+from flavtool.parser import Parser
+from _common import measure, print_table
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--durations", type=float, nargs="+", default=[60, 600, 3600], help="file lengths (s)")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for duration in args.durations:
+            path = os.path.join(tmp, "synthetic.mp4")
+            # 1チャンク1サンプルにして、チャンク数を最大にする
+            SyntheticMp4Creator(duration, {"vide": 60, "soun": 46.875, "tast": 10}, samples_per_chunk=1,
+                                sample_sizes={"vide": 16, "soun": 8}).write(path)
+            flav_mp4 = analyze(Parser(path).parse(read_mdat_bytes=False))
+            composer = Composer(flav_mp4)
+            chunk_n = sum(len(media_data.data) for media_data in flav_mp4.media_datas.values()
+                          if media_data is not None)
+            # 非公開のメソッドを直接呼んで、インターリーブだけを計測する
+            interleave = composer._Composer__generate_interleave_chunks
+            seconds, peak = measure(lambda _: interleave("vide", ["soun", "tast"]), repeat=args.repeat)
+            rows.append([f"{duration:g}", chunk_n, seconds, f"{seconds / chunk_n * 1e9:.0f}", f"{peak / 1e6:.1f}"])
+    print_table(["duration(s)", "chunks", "time(s)", "ns/chunk", "peak(MB)"], rows)
+
+
+if __name__ == "__main__":
+    main()
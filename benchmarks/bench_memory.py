@@ -0,0 +1,77 @@
+"""
+サンプル・テーブルエントリ1個あたりのメモリと、解析済みファイル全体のメモリを計測する
+
+    python benchmarks/bench_memory.py --n 200000 --duration 600
+"""
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from flavtool.analyzer import analyze
+from flavtool.analyzer.media_data import SampleData, StreamingSampleData, ChunkData
+from flavtool.composer.utils import SyntheticMp4Creator
+from flavtool.parser import Parser
+from flavtool.parser.boxs.leaf import TimeToSample, SampleToChunk, EditList
+from _common import print_table
+
+
+def bytes_per_object(factory, n: int) -> float:
+    """
+    factory(i) で作ったオブジェクト n 個の、1個あたりの確保量(リスト自体は含めない)
+    """
+    objects = [None] * n
+    gc.collect()
+    tracemalloc.start()
+    for i in range(n):
+        objects[i] = factory(i)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current / n
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--n", type=int, default=200000, help="objects per class")
+    arg_parser.add_argument("--duration", type=float, default=600, help="synthetic file length (s)")
+    arg_parser.add_argument("--fps", type=float, default=60)
+    args = arg_parser.parse_args()
+
+    data = b"x" * 16
+    factories = {
+        "SampleData": lambda i: SampleData(data, 1000),
+        "StreamingSampleData": lambda i: StreamingSampleData(i * 16, 16, 1000),
+        "TimeToSample": lambda i: TimeToSample(1, 1000),
+        "SampleToChunk": lambda i: SampleToChunk(i, 10, 1),
+        "EditList": lambda i: EditList(1000, 0, 1.0),
+        "ChunkData": lambda i: ChunkData([], "vide", begin_time=i),
+    }
+    rows = [[name, f"{bytes_per_object(factory, args.n):.1f}"] for name, factory in factories.items()]
+    print_table(["class", "bytes/object"], rows)
+    print()
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "synthetic.mp4")
+        SyntheticMp4Creator(args.duration, {"vide": args.fps, "tast": 10}, sample_sizes={"vide": 200}).write(path)
+        for read_mdat_bytes in (True, False):
+            gc.collect()
+            tracemalloc.start()
+            flav_mp4 = analyze(Parser(path).parse(read_mdat_bytes=read_mdat_bytes))
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            sample_n = sum(len(chunk) for media_data in flav_mp4.media_datas.values() if media_data is not None
+                           for chunk in media_data.data)
+            mdat_size = 0 if not read_mdat_bytes else len(flav_mp4.mdat.body)
+            rows.append(["bytes" if read_mdat_bytes else "stream", sample_n, f"{current / 1e6:.1f}",
+                         f"{peak / 1e6:.1f}", f"{(current - mdat_size) / sample_n:.1f}"])
+            del flav_mp4
+    print_table(["mode", "samples", "retained(MB)", "peak(MB)", "bytes/sample (excl. mdat)"], rows)
+
+
+if __name__ == "__main__":
+    main()
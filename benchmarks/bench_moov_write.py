@@ -0,0 +1,64 @@
+"""
+moov の書き出しを、Boxごとに書き出す従来の方法(ContainerBox.write_each)と、
+1つのバッファにまとめて1回で書き出す方法(ContainerBox.write)で比較する
+
+    python benchmarks/bench_moov_write.py --durations 60 600 3600
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from flavtool.composer.utils import SyntheticMp4Creator
+from flavtool.parser import Parser
+from _common import measure, print_table
+
+
+class CountingWriter:
+    """
+    write の呼び出し回数を数えるファイルのラッパー
+    """
+
+    def __init__(self, f):
+        self.f = f
+        self.writes = 0
+
+    def write(self, data):
+        self.writes += 1
+        return self.f.write(data)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--durations", type=float, nargs="+", default=[60, 600, 3600], help="file lengths (s)")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    arg_parser.add_argument("--buffering", type=int, default=-1,
+                            help="buffering of the output file (0: unbuffered, every write is a system call)")
+    args = arg_parser.parse_args()
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "synthetic.mp4")
+        out_path = os.path.join(tmp, "moov.bin")
+        for duration in args.durations:
+            # 1チャンク1サンプルにして、サンプルテーブルを最大にする
+            SyntheticMp4Creator(duration, {"vide": 60, "soun": 46.875, "tast": 10}, samples_per_chunk=1,
+                                sample_sizes={"vide": 16, "soun": 8}).write(path)
+            moov = Parser(path).parse(read_mdat_bytes=False)["moov"]
+            for name, write in [("write_each", moov.write_each), ("write", moov.write)]:
+                def run(_):
+                    with open(out_path, "wb", buffering=args.buffering) as f:
+                        write(f)
+                seconds, peak = measure(run, repeat=args.repeat)
+                with open(out_path, "wb") as f:
+                    counter = CountingWriter(f)
+                    write(counter)
+                rows.append([f"{duration:g}", f"{moov.cached_size() / 1e3:.0f}", name, counter.writes, seconds,
+                             f"{peak / 1e6:.1f}"])
+    print_table(["duration(s)", "moov(KB)", "path", "writes", "time(s)", "peak(MB)"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Parser.parse / analyze / Composer.compose / Composer.write の時間とピークメモリを、合成ファイルの長さごとに計測する
+
+    python benchmarks/bench_pipeline.py --durations 10 60 300
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from flavtool.analyzer import analyze
+from flavtool.composer import Composer
+from flavtool.composer.utils import SyntheticMp4Creator
+from flavtool.parser import Parser
+from _common import measure, print_table
+
+
+def bench_file(path: str, out_path: str, repeat: int) -> list[tuple[str, float, int]]:
+    def parsed(read_mdat_bytes):
+        return lambda: Parser(path).parse(read_mdat_bytes=read_mdat_bytes)
+
+    def analyzed(read_mdat_bytes):
+        return lambda: analyze(parsed(read_mdat_bytes)())
+
+    def composed(read_mdat_bytes):
+        def setup():
+            composer = Composer(analyzed(read_mdat_bytes)())
+            composer.compose()
+            return composer
+        return setup
+
+    def compose(flav_mp4):
+        Composer(flav_mp4).compose()
+
+    results = [("probe", *measure(lambda _: Parser(path).probe(), repeat=repeat))]
+    for read_mdat_bytes in (True, False):
+        mode = "bytes" if read_mdat_bytes else "stream"
+        results.append((f"parse ({mode})", *measure(lambda _: parsed(read_mdat_bytes)(), repeat=repeat)))
+        results.append((f"analyze ({mode})", *measure(analyze, parsed(read_mdat_bytes), repeat)))
+        results.append((f"compose ({mode})", *measure(compose, analyzed(read_mdat_bytes), repeat)))
+        results.append((f"write ({mode})", *measure(lambda c: c.write(out_path), composed(read_mdat_bytes), repeat)))
+    return results
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--durations", type=float, nargs="+", default=[10, 60, 300], help="file lengths (s)")
+    arg_parser.add_argument("--fps", type=float, default=30, help="video samples per second")
+    arg_parser.add_argument("--taste-rate", type=float, default=10, help="taste samples per second")
+    arg_parser.add_argument("--samples-per-chunk", type=int, default=10)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for duration in args.durations:
+            path = os.path.join(tmp, f"synthetic_{duration:g}.mp4")
+            SyntheticMp4Creator(duration, {"vide": args.fps, "tast": args.taste_rate},
+                                samples_per_chunk=args.samples_per_chunk).write(path)
+            size_mb = os.path.getsize(path) / 1e6
+            for name, seconds, peak in bench_file(path, os.path.join(tmp, "out.mp4"), args.repeat):
+                rows.append([f"{duration:g}", f"{size_mb:.1f}", name, seconds, f"{peak / 1e6:.1f}"])
+    print_table(["duration(s)", "size(MB)", "stage", "time(s)", "peak(MB)"], rows)
+
+
+if __name__ == "__main__":
+    main()
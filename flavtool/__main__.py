@@ -0,0 +1,5 @@
+import sys
+
+from flavtool.cli import main
+
+sys.exit(main())
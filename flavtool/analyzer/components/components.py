@@ -41,12 +41,26 @@ class SampleTableComponent(EvalComponent):
     def __init__(self, parsed: ContainerBox):
         super().__init__(parsed)
 
-        self.chunk_offset: StcoBox = parsed["stco"]
         self.sample_size: StszBox = parsed["stsz"]
         self.sample_description: StsdBox = parsed["stsd"]
         self.time_to_sample: SttsBox = parsed["stts"]
         self.sample_to_chunk: StscBox = parsed["stsc"]
 
+    @property
+    def chunk_offset(self) -> StcoBox | Co64Box | None:
+        """
+        チャンクオフセット(stco または co64 のうち存在する方)
+        """
+        chunk_offset = self.parsed["stco"]
+        if chunk_offset is None:
+            chunk_offset = self.parsed["co64"]
+        return chunk_offset
+
+    @chunk_offset.setter
+    def chunk_offset(self, chunk_offset: StcoBox | Co64Box):
+        children = self.parsed.children
+        children[children.index(self.chunk_offset)] = chunk_offset
+
 
 
 
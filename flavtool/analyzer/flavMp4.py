@@ -3,7 +3,7 @@
 from typing import Literal
 
 from flavtool.analyzer.components import *
-from flavtool.analyzer.media_data import MediaData
+from flavtool.analyzer.media_data import MediaData, ColumnarMediaData
 from flavtool.parser.boxs.container import ContainerBox
 from flavtool.parser.boxs.leaf import *
 from flavtool.logger import logger
@@ -46,6 +46,7 @@ class FlavMP4:
         if not isinstance(mdat, MdatBox):
             raise Exception("mdat parse error")
         self.mdat: MdatBox = mdat
+        self.mdats: list[MdatBox] = [box for box in self.parsed.children if isinstance(box, MdatBox)]
 
         mov_header = self.parsed["moov"]["mvhd"]
         if not isinstance(mov_header, MvhdBox):
@@ -65,13 +66,46 @@ class FlavMP4:
 
                 subtype: media_types
                 self.tracks[subtype] = TrackComponent(box)
-                self.media_datas[subtype] = MediaData.from_mdat_box(
-                    self.mdat,
+                self.media_datas[subtype] = ColumnarMediaData.from_mdat_box(
+                    self.mdats,
                     self.sample_tables[subtype],
                     subtype,
                     streaming=not self.mdat.read_bytes
                 )
 
+        self.moofs: list[ContainerBox] = self.parsed.get_children("moof")
+        if self.fragmented:
+            self.__load_fragments()
+
+    @property
+    def fragmented(self) -> bool:
+        """
+        moofを持つ(フラグメント化された)MP4か
+        """
+        return len(self.moofs) > 0
+
+    def __load_fragments(self):
+        """
+        moof/trafのサンプルを、moov内のサンプルテーブルのサンプルに続くチャンクとして各トラックに加える
+        """
+        trexs: dict[int, TrexBox] = {}
+        mvex = self.parsed["moov"]["mvex"]
+        if mvex is not None:
+            for trex in mvex.get_children("trex"):
+                trexs[trex.track_id] = trex
+
+        for subtype, track in self.tracks.items():
+            if track is None:
+                continue
+            media_data = self.media_datas[subtype]
+            track_id = track.header.track_id
+            begin_time = media_data.data[-1].end_time if len(media_data.data) > 0 else 0
+            media_data.data.extend(MediaData.chunks_from_fragments(
+                self.moofs, track_id, trexs.get(track_id), self.mdats, subtype,
+                streaming=not self.mdat.read_bytes, begin_time=begin_time
+            ))
+            media_data.fragmented = True
+
     @property
     def sample_tables(self) -> dict[media_types, SampleTableComponent | None]:
         sample_tables: dict[media_types, SampleTableComponent | None] = {}
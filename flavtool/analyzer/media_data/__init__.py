@@ -1,3 +1,5 @@
 from .media_data import MediaData
 from .sample import SampleData, StreamingSampleData
-from  .chunk import ChunkData
+from  .chunk import ChunkData, SlicedChunk
+from .sample_index import SampleIndex
+from .columnar_media_data import ColumnarMediaData, ChunkView
@@ -1,9 +1,16 @@
 import io
+import itertools
+from typing import BinaryIO
 
+import numpy as np
+
+from flavtool.parser.range_writer import RangeWriter
 from .sample import SampleData, StreamingSampleData
 
 
 class ChunkData:
+    __slots__ = ("samples", "media_type", "begin_time", "sample_description")
+
     def __init__(self, samples: list[SampleData], media_type: str,sample_description=1, begin_time=0):
         self.samples = samples
         self.media_type = media_type
@@ -24,6 +31,23 @@ class ChunkData:
             size += len(sample)
         return size
 
+    def iter_samples(self):
+        """
+        サンプルを順に返す
+        """
+        return iter(self.samples)
+
+    def sample_arrays(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        サンプルごとの長さとバイト数の配列
+        Returns
+        -------
+        (deltas, sizes) それぞれ int64 の配列
+        """
+        deltas = np.fromiter((sample.delta for sample in self.samples), dtype=np.int64, count=len(self.samples))
+        sizes = np.fromiter((len(sample) for sample in self.samples), dtype=np.int64, count=len(self.samples))
+        return deltas, sizes
+
     def __len__(self):
         return len(self.samples)
 
@@ -37,6 +61,109 @@ class ChunkData:
         for sample in self.samples:
             sample.print()
 
-    def write(self, buffer: io.BytesIO):
-        for sample in self.samples:
-            buffer.write(sample.data)
+    def write(self, buffer: io.BytesIO | BinaryIO | RangeWriter, source: BinaryIO | None = None):
+        """
+        チャンクのサンプルを書き出す
+        Parameters
+        ----------
+        buffer
+            書き込み先。RangeWriter を渡すと、元ファイル上で連続するサンプルはチャンクをまたいでまとめてコピーされる
+        source
+            StreamingSampleData の読み込み元ファイル(buffer が RangeWriter の場合は不要)
+        """
+        writer = buffer if isinstance(buffer, RangeWriter) else RangeWriter(buffer, source)
+        self.write_range(writer, 0, len(self))
+        if writer is not buffer:
+            writer.flush()
+
+    def write_range(self, writer: RangeWriter, begin: int, end: int):
+        """
+        チャンク内のサンプル begin から end の手前までを writer に書き出す
+        """
+        for sample in self.samples[begin:end]:
+            if isinstance(sample, StreamingSampleData):
+                writer.copy(sample.start, sample.length)
+            else:
+                writer.write(sample.data)
+
+
+class SlicedChunk(ChunkData):
+    """
+    他のチャンクのサンプルの範囲をつないだチャンク(ChunkingPolicy.rechunk で分け直したもの)
+        元のチャンクを参照するだけで、SampleData のリストは samples に初めてアクセスしたときに作る。
+        作った後は通常の ChunkData と同じく samples を変更できる
+    """
+    __slots__ = ("pieces", "materialized", "sample_n", "size", "duration")
+
+    def __init__(self, pieces: list[tuple[ChunkData, int, int]], media_type: str, sample_description=1,
+                 begin_time=0):
+        """
+        Parameters
+        ----------
+        pieces : list[tuple[ChunkData, int, int]]
+            (元のチャンク, 開始サンプル, 終了サンプル(含まない)) のリスト。この順につないだものがこのチャンクになる
+        """
+        self.pieces = pieces
+        self.media_type = media_type
+        self.sample_description = sample_description
+        self.begin_time = begin_time
+        self.materialized: list[SampleData] | None = None
+        deltas, sizes = self.sample_arrays()
+        self.sample_n = len(sizes)
+        self.size = int(sizes.sum())
+        self.duration = int(deltas.sum())
+
+    @property
+    def samples(self) -> list[SampleData]:
+        if self.materialized is None:
+            self.materialized = list(self.iter_samples())
+        return self.materialized
+
+    @samples.setter
+    def samples(self, samples: list[SampleData]):
+        self.materialized = samples
+
+    @property
+    def end_time(self):
+        if self.materialized is not None:
+            return super().end_time
+        return self.begin_time + self.duration
+
+    def get_size(self):
+        if self.materialized is not None:
+            return super().get_size()
+        return self.size
+
+    def iter_samples(self):
+        if self.materialized is not None:
+            return super().iter_samples()
+        return itertools.chain.from_iterable(
+            itertools.islice(chunk.iter_samples(), begin, end) for chunk, begin, end in self.pieces)
+
+    def sample_arrays(self) -> tuple[np.ndarray, np.ndarray]:
+        if self.materialized is not None:
+            return super().sample_arrays()
+        arrays = [(deltas[begin:end], sizes[begin:end])
+                  for (deltas, sizes), (_, begin, end) in
+                  zip((chunk.sample_arrays() for chunk, _, _ in self.pieces), self.pieces)]
+        if len(arrays) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        return (np.concatenate([deltas for deltas, _ in arrays]).astype(np.int64, copy=False),
+                np.concatenate([sizes for _, sizes in arrays]).astype(np.int64, copy=False))
+
+    def __len__(self):
+        if self.materialized is not None:
+            return len(self.materialized)
+        return self.sample_n
+
+    def write_range(self, writer: RangeWriter, begin: int, end: int):
+        if self.materialized is not None:
+            return super().write_range(writer, begin, end)
+        # 元のチャンクごとに、範囲の重なる部分を書き出す
+        position = 0
+        for chunk, piece_begin, piece_end in self.pieces:
+            piece_n = piece_end - piece_begin
+            overlap_begin, overlap_end = max(begin, position), min(end, position + piece_n)
+            if overlap_begin < overlap_end:
+                chunk.write_range(writer, piece_begin + overlap_begin - position, piece_begin + overlap_end - position)
+            position += piece_n
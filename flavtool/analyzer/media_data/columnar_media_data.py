@@ -0,0 +1,218 @@
+import io
+from typing import BinaryIO
+
+import numpy as np
+
+from flavtool.analyzer.components import SampleTableComponent
+from flavtool.parser.boxs.leaf import MdatBox
+from flavtool.parser.range_writer import RangeWriter
+from .chunk import ChunkData
+from .media_data import MediaData
+from .sample import SampleData, StreamingSampleData
+from .sample_index import SampleIndex
+
+
+class ChunkView(ChunkData):
+    """
+    ColumnarMediaData の1チャンクを表すビュー
+        サイズ・時間は配列から求め、SampleData のリストは samples に初めてアクセスしたときに作る。
+        作った後は通常の ChunkData と同じく samples を変更できる
+    """
+    __slots__ = ("owner", "chunk_i", "materialized")
+
+    def __init__(self, owner: 'ColumnarMediaData', chunk_i: int, media_type: str, sample_description=1,
+                 begin_time=0):
+        self.owner = owner
+        self.chunk_i = chunk_i
+        self.media_type = media_type
+        self.sample_description = sample_description
+        self.begin_time = begin_time
+        self.materialized: list[SampleData] | None = None
+
+    @property
+    def samples(self) -> list[SampleData]:
+        if self.materialized is None:
+            self.materialized = self.owner.make_samples(self.chunk_i)
+        return self.materialized
+
+    @samples.setter
+    def samples(self, samples: list[SampleData]):
+        self.materialized = samples
+
+    @property
+    def end_time(self):
+        if self.materialized is not None:
+            return super().end_time
+        return self.begin_time + int(self.owner.chunk_durations[self.chunk_i])
+
+    def get_size(self):
+        if self.materialized is not None:
+            return super().get_size()
+        return int(self.owner.chunk_sizes[self.chunk_i])
+
+    def iter_samples(self):
+        if self.materialized is not None:
+            return super().iter_samples()
+        # 作ったサンプルは保持しない(すべてのチャンクを順に読んでも、メモリに残るのは1チャンク分だけになる)
+        return iter(self.owner.make_samples(self.chunk_i))
+
+    def sample_arrays(self) -> tuple[np.ndarray, np.ndarray]:
+        if self.materialized is not None:
+            return super().sample_arrays()
+        # サンプルを作らずに、サンプルテーブル(stts, stsz)の列から切り出す
+        begin, end = int(self.owner.chunk_starts[self.chunk_i]), int(self.owner.chunk_starts[self.chunk_i + 1])
+        return self.owner.columns.deltas[begin:end], self.owner.columns.sizes[begin:end]
+
+    def __len__(self):
+        if self.materialized is not None:
+            return len(self.materialized)
+        return int(self.owner.chunk_starts[self.chunk_i + 1] - self.owner.chunk_starts[self.chunk_i])
+
+    def write_range(self, writer: RangeWriter, begin: int, end: int):
+        if self.materialized is not None:
+            return super().write_range(writer, begin, end)
+        if begin >= end:
+            return
+        # チャンク内のサンプルは連続しているので、範囲をまとめて書き出す
+        first = int(self.owner.chunk_starts[self.chunk_i]) + begin
+        last = int(self.owner.chunk_starts[self.chunk_i]) + end - 1
+        offset = int(self.owner.columns.offsets[first])
+        size = int(self.owner.columns.offsets[last] + self.owner.columns.sizes[last]) - offset
+        if self.owner.streaming:
+            writer.copy(offset, size)
+        else:
+            body, begin_point = self.owner.mdat_bodies[self.owner.chunk_mdat_ids[self.chunk_i]]
+            writer.write(body[offset - begin_point:offset - begin_point + size])
+
+
+class ColumnarMediaData(MediaData):
+    """
+    サンプルの位置・サイズ・長さ・開始時間とチャンクの境界をNumPy配列(列)で持つメディアデータ
+        サンプルテーブルからベクトル演算で作るので、サンプルごとのPythonオブジェクトを作らない。
+        data は従来どおり ChunkData のリストとして使える(各要素は ChunkView)
+    """
+
+    def __init__(self, media_type: str, columns: SampleIndex, chunk_starts: np.ndarray, chunk_offsets: np.ndarray,
+                 chunk_descriptions: np.ndarray, sample_table: SampleTableComponent | None = None,
+                 mdat_boxes: list[MdatBox] | None = None, streaming=False):
+        """
+        Parameters
+        ----------
+        columns : SampleIndex
+            サンプルごとの列(decode_times, deltas, offsets, sizes, chunk_ids)
+        chunk_starts : np.ndarray
+            各チャンクの最初のサンプルの番号(最後にサンプル数を加えた、チャンク数+1 個)
+        chunk_offsets : np.ndarray
+            各チャンクのファイル上のオフセット
+        chunk_descriptions : np.ndarray
+            各チャンクのサンプル記述の番号
+        mdat_boxes : list[MdatBox] | None
+            サンプルのバイト列を持つmdat(streaming なら不要)。本体と開始位置はここで取り出しておくので、
+            Composer.compose() でmdatが作り直された後も元のサンプルを参照する
+        streaming : bool
+            サンプルを StreamingSampleData として扱うか
+        """
+        self.columns = columns
+        self.chunk_starts = chunk_starts
+        self.chunk_offsets = chunk_offsets
+        self.chunk_descriptions = chunk_descriptions
+        self.mdat_boxes = mdat_boxes
+        # 各mdatの (本体, ファイル上の開始位置)
+        self.mdat_bodies: list[tuple[bytes | memoryview, int]] = \
+            [] if mdat_boxes is None else [(box.body, box.begin_point) for box in mdat_boxes]
+        self.streaming = streaming
+        self.__data: list[ChunkData] | None = None
+
+        size_sums = np.zeros(len(columns) + 1, dtype=np.int64)
+        np.cumsum(columns.sizes, out=size_sums[1:])
+        self.chunk_sizes = size_sums[chunk_starts[1:]] - size_sums[chunk_starts[:-1]]
+        time_sums = np.zeros(len(columns) + 1, dtype=np.int64)
+        np.cumsum(columns.deltas, out=time_sums[1:])
+        self.chunk_begin_times = time_sums[chunk_starts[:-1]]
+        self.chunk_durations = time_sums[chunk_starts[1:]] - self.chunk_begin_times
+
+        self.chunk_mdat_ids = np.zeros(len(chunk_offsets), dtype=np.int64)
+        if not streaming:
+            self.chunk_mdat_ids = self.__assign_mdat_boxes(self.mdat_bodies, chunk_offsets, self.chunk_sizes)
+        super().__init__(media_type, None, sample_table)
+
+    @property
+    def data(self) -> list[ChunkData]:
+        """
+        ChunkData(ChunkView)のリスト(初回アクセス時に作成)
+        """
+        if self.__data is None:
+            self.__data = [
+                ChunkView(self, chunk_i, self.media_type, sample_description, begin_time)
+                for chunk_i, (sample_description, begin_time) in enumerate(
+                    zip(self.chunk_descriptions.tolist(), self.chunk_begin_times.tolist()))
+            ]
+        return self.__data
+
+    @data.setter
+    def data(self, data: list[ChunkData] | None):
+        self.__data = data
+
+    @property
+    def index(self) -> SampleIndex:
+        if self.fragmented:
+            return super().index
+        return self.columns
+
+    def chunk_arrays(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # チャンクが差し替えられたり、サンプルが作られて変更されうる場合はチャンクから求める
+        data = self.data
+        if len(data) != len(self.chunk_sizes) or not all(
+                type(chunk) is ChunkView and chunk.owner is self and chunk.materialized is None for chunk in data):
+            return super().chunk_arrays()
+        return self.chunk_begin_times, self.chunk_begin_times + self.chunk_durations, self.chunk_sizes
+
+    def make_samples(self, chunk_i: int) -> list[SampleData]:
+        """
+        チャンク chunk_i の SampleData のリストを作る
+        """
+        begin, end = int(self.chunk_starts[chunk_i]), int(self.chunk_starts[chunk_i + 1])
+        offsets = self.columns.offsets[begin:end].tolist()
+        sizes = self.columns.sizes[begin:end].tolist()
+        deltas = self.columns.deltas[begin:end].tolist()
+        if self.streaming:
+            return [StreamingSampleData(offset, size, delta) for offset, size, delta in zip(offsets, sizes, deltas)]
+        body, begin_point = self.mdat_bodies[self.chunk_mdat_ids[chunk_i]]
+        return [SampleData(body[offset - begin_point: offset - begin_point + size], delta)
+                for offset, size, delta in zip(offsets, sizes, deltas)]
+
+    @staticmethod
+    def __assign_mdat_boxes(mdat_bodies: list[tuple[bytes | memoryview, int]], chunk_offsets: np.ndarray,
+                            chunk_sizes: np.ndarray) -> np.ndarray:
+        """
+        各チャンクを含むmdatの番号を求める
+        """
+        order = sorted(range(len(mdat_bodies)), key=lambda i: mdat_bodies[i][1])
+        begins = np.array([mdat_bodies[i][1] for i in order], dtype=np.int64)
+        ends = np.array([mdat_bodies[i][1] + len(mdat_bodies[i][0]) for i in order], dtype=np.int64)
+        positions = np.searchsorted(begins, chunk_offsets, side="right") - 1
+        outside = (positions < 0) | (chunk_offsets + chunk_sizes > ends[np.maximum(positions, 0)])
+        if outside.any():
+            raise Exception(f"chunk offset {int(chunk_offsets[outside][0])} is not in any mdat")
+        return np.array(order, dtype=np.int64)[positions]
+
+    @classmethod
+    def from_mdat_box(cls, mdat_box: MdatBox | list[MdatBox], sample_table: SampleTableComponent, media_type: str,
+                      streaming=False) -> 'ColumnarMediaData':
+        """
+        サンプルテーブルから列をベクトル演算で作成する(MediaData.from_mdat_box と同じ引数)
+        """
+        mdat_boxes = mdat_box if isinstance(mdat_box, list) else [mdat_box]
+        columns = SampleIndex.from_sample_table(sample_table)
+
+        chunk_offsets = sample_table.chunk_offset.chunk_to_offset_table.astype(np.int64)
+        chunk_n = len(chunk_offsets)
+        chunk_starts = np.searchsorted(columns.chunk_ids, np.arange(chunk_n + 1), side="left")
+
+        stsc = sample_table.sample_to_chunk.sample_to_chunk_table
+        first_chunks = stsc.first_chunk.astype(np.int64) - 1
+        runs = np.diff(np.append(first_chunks, chunk_n))
+        chunk_descriptions = np.repeat(stsc.sample_description_id.astype(np.int64), runs)
+
+        return cls(media_type, columns, chunk_starts, chunk_offsets, chunk_descriptions, sample_table,
+                   None if streaming else mdat_boxes, streaming)
@@ -1,19 +1,55 @@
+import numpy as np
+
 from flavtool.analyzer.components import SampleTableComponent
 from .sample import SampleData, StreamingSampleData
 from .chunk import ChunkData
-from flavtool.parser.boxs.leaf import MdatBox
+from .sample_index import SampleIndex
+from flavtool.parser.boxs.leaf import MdatBox, TfhdBox, TrexBox
+from flavtool.parser.boxs.container import ContainerBox
 
 
 class MediaData():
     def __init__(self, media_type:str,
-                 data:list[ChunkData]):
+                 data:list[ChunkData], sample_table: SampleTableComponent | None = None):
         self.media_type = media_type
         self.data: list[ChunkData] = data
+        self.sample_table = sample_table
+        # moof/trafにサンプルを持つ(フラグメント化された)トラックか
+        self.fragmented = False
+        self.__index: SampleIndex | None = None
+
+    @property
+    def index(self) -> SampleIndex:
+        """
+        時間からサンプルを二分探索で引くためのインデックス(初回アクセス時に作成)
+        サンプルテーブルがあればそこから、なければ(フラグメント化されている場合も)チャンクから作る
+        """
+        if self.__index is None:
+            if self.sample_table is not None and not self.fragmented:
+                self.__index = SampleIndex.from_sample_table(self.sample_table)
+            else:
+                self.__index = SampleIndex.from_chunks(self.data)
+        return self.__index
+
 
+    def chunk_arrays(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        チャンクごとの開始時間・終了時間・サイズの配列
+        Returns
+        -------
+        (begin_times, end_times, sizes) それぞれ int64 の配列
+        """
+        begin_times = np.fromiter((chunk.begin_time for chunk in self.data), dtype=np.int64, count=len(self.data))
+        end_times = np.fromiter((chunk.end_time for chunk in self.data), dtype=np.int64, count=len(self.data))
+        sizes = np.fromiter((chunk.get_size() for chunk in self.data), dtype=np.int64, count=len(self.data))
+        return begin_times, end_times, sizes
 
     @classmethod
-    def from_mdat_box(cls, mdat_box: MdatBox, sample_table: SampleTableComponent, media_type:str,
+    def from_mdat_box(cls, mdat_box: MdatBox | list[MdatBox], sample_table: SampleTableComponent, media_type:str,
                   streaming=False) -> 'MediaData':
+        # mdatが複数ある(追記されたファイル)場合は、チャンクごとにそれを含むmdatから読む
+        mdat_boxes = mdat_box if isinstance(mdat_box, list) else [mdat_box]
+        mdat_box = mdat_boxes[0]
         offset = mdat_box.begin_point
 
         sample_table = sample_table
@@ -23,20 +59,29 @@ class MediaData():
         samples_per_chunk = 0
         data: list[ChunkData] = []
         sample_delta_list = cls.__generate_sample_delta_list(sample_table)
+        # NumPy配列のテーブルは要素ごとのアクセスが遅いので、一度だけPythonのリストに変換する
+        sample_to_chunk_table = sample_table.sample_to_chunk.sample_to_chunk_table
+        first_chunks = sample_to_chunk_table.first_chunk.tolist()
+        samples_per_chunks = sample_to_chunk_table.samples_per_chunk.tolist()
+        fixed_sample_size = sample_table.sample_size.sample_size
+        sample_size_table = sample_table.sample_size.sample_size_table.tolist()
         t = 0
-        for chunk_i, chunk_offset in enumerate(sample_table.chunk_offset.chunk_to_offset_table, start=1):
-            sample_to_chunk_table = sample_table.sample_to_chunk.sample_to_chunk_table
-            if next_sample_to_chunk_i < len(sample_to_chunk_table) \
-                    and sample_to_chunk_table[next_sample_to_chunk_i].first_chunk == chunk_i:
-                samples_per_chunk = sample_to_chunk_table[next_sample_to_chunk_i].samples_per_chunk
+        for chunk_i, chunk_offset in enumerate(sample_table.chunk_offset.chunk_to_offset_table.tolist(), start=1):
+            if next_sample_to_chunk_i < len(first_chunks) \
+                    and first_chunks[next_sample_to_chunk_i] == chunk_i:
+                samples_per_chunk = samples_per_chunks[next_sample_to_chunk_i]
                 next_sample_to_chunk_i += 1
+            if not streaming and len(mdat_boxes) > 1 \
+                    and not offset <= chunk_offset < offset + len(byte_data):
+                mdat_box = cls.__find_mdat_box(mdat_boxes, chunk_offset)
+                offset = mdat_box.begin_point
+                byte_data = mdat_box.body
             samples: list[SampleData] = []
             chunk_inside_offset = 0
             begin_time = t
 
             for j in range(samples_per_chunk):
-                sample_size = sample_table.sample_size.sample_size if sample_table.sample_size.sample_size != 0 else \
-                    sample_table.sample_size.sample_size_table[sample_i]
+                sample_size = fixed_sample_size if fixed_sample_size != 0 else sample_size_table[sample_i]
                 sample_start = (chunk_offset - offset) + chunk_inside_offset
                 delta = sample_delta_list[sample_i]
                 t += delta
@@ -50,9 +95,104 @@ class MediaData():
 
             end_time = t
             data.append(ChunkData(samples,media_type, begin_time=begin_time))
-        return cls(media_type, data)
+        return cls(media_type, data, sample_table)
+
+
+
+    @classmethod
+    def chunks_from_fragments(cls, moof_boxes: list[ContainerBox], track_id: int, trex: TrexBox | None,
+                              mdat_boxes: list[MdatBox], media_type: str, streaming=False,
+                              begin_time=0) -> list[ChunkData]:
+        """
+        moof/traf/trun からトラックのサンプルを読み、trunごとに1チャンクとして返す
+        Parameters
+        ----------
+        moof_boxes : list[ContainerBox]
+            ファイル順に並んだmoof
+        track_id : int
+            読み込むトラックのID
+        trex : TrexBox | None
+            mvex内のトラックのデフォルト値
+        mdat_boxes : list[MdatBox]
+            ファイル内のすべてのmdat
+        begin_time : int
+            tfdtがない場合の最初のフラグメントの開始時間
+        """
+        chunks: list[ChunkData] = []
+        t = begin_time
+        for moof in moof_boxes:
+            # base_data_offsetもdefault-base-is-moofもない場合、2つ目以降のtrafは直前のtrafのデータの終わりが基準
+            previous_traf_end = moof.box_offset
+            for traf in moof.get_children("traf"):
+                tfhd: TfhdBox = traf["tfhd"]
+                if tfhd.base_data_offset is not None:
+                    base = tfhd.base_data_offset
+                elif tfhd.flag_bits & TfhdBox.default_base_is_moof:
+                    base = moof.box_offset
+                else:
+                    base = previous_traf_end
+                data_end = base
+                for trun in traf.get_children("trun"):
+                    data_start = base + trun.data_offset if trun.data_offset is not None else data_end
+                    data_end = data_start + cls.__trun_values(trun, "sample_size", tfhd.default_sample_size, trex,
+                                                              "default_sample_size").sum()
+                previous_traf_end = data_end
+                if tfhd.track_id != track_id:
+                    continue
+
+                tfdt = traf["tfdt"]
+                if tfdt is not None:
+                    t = tfdt.base_media_decode_time
+                sample_description = tfhd.sample_description_index
+                if sample_description is None:
+                    sample_description = trex.default_sample_description_index if trex is not None else 1
+                data_end = base
+                for trun in traf.get_children("trun"):
+                    if trun.sample_count == 0:
+                        continue
+                    sizes = cls.__trun_values(trun, "sample_size", tfhd.default_sample_size, trex,
+                                              "default_sample_size").tolist()
+                    durations = cls.__trun_values(trun, "sample_duration", tfhd.default_sample_duration, trex,
+                                                  "default_sample_duration").tolist()
+                    data_start = base + trun.data_offset if trun.data_offset is not None else data_end
+                    if not streaming:
+                        mdat_box = cls.__find_mdat_box(mdat_boxes, data_start)
+                        byte_data = mdat_box.body
+                    samples: list[SampleData] = []
+                    begin = t
+                    position = data_start
+                    for size, delta in zip(sizes, durations):
+                        if streaming:
+                            samples.append(StreamingSampleData(position, size, delta))
+                        else:
+                            sample_start = position - mdat_box.begin_point
+                            samples.append(SampleData(byte_data[sample_start: sample_start + size], delta))
+                        position += size
+                        t += delta
+                    data_end = position
+                    chunks.append(ChunkData(samples, media_type, sample_description=sample_description,
+                                            begin_time=begin))
+        return chunks
 
+    @staticmethod
+    def __trun_values(trun, field: str, tfhd_default: int | None, trex: TrexBox | None,
+                      trex_field: str) -> np.ndarray:
+        """
+        trunのサンプルごとの値。trunになければtfhd、trexのデフォルト値の順に使う
+        """
+        if trun.entries.dtype.names is not None and field in trun.entries.dtype.names:
+            return trun.entries[field].astype(np.int64)
+        default = tfhd_default
+        if default is None:
+            default = getattr(trex, trex_field) if trex is not None else 0
+        return np.full(trun.sample_count, default, dtype=np.int64)
 
+    @staticmethod
+    def __find_mdat_box(mdat_boxes: list[MdatBox], chunk_offset: int) -> MdatBox:
+        for mdat_box in mdat_boxes:
+            if mdat_box.begin_point <= chunk_offset < mdat_box.begin_point + len(mdat_box.body):
+                return mdat_box
+        raise Exception(f"chunk offset {chunk_offset} is not in any mdat")
 
     # @classmethod
     # def __get_time_of_sample(cls, sample_i, sample_table: SampleTableComponent, criteria="start"):
@@ -71,8 +211,9 @@ class MediaData():
 
     @classmethod
     def __generate_sample_delta_list(self, sample_table:SampleTableComponent) -> list[int]:
-        sample_delta_list = []
-        for row in sample_table.time_to_sample.time_to_sample_table:
-            for i in range(row.sample_count):
-                sample_delta_list.append(row.sample_delta)
-        return sample_delta_list
+        table = sample_table.time_to_sample.time_to_sample_table
+        # 同じsttsエントリのサンプルは同じintオブジェクトを共有する(サンプルごとにintを作らない)
+        deltas = []
+        for count, delta in zip(table.sample_count.tolist(), table.sample_delta.tolist()):
+            deltas.extend([delta] * count)
+        return deltas
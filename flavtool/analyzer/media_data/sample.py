@@ -1,4 +1,7 @@
 class SampleData:
+    # 1ファイルで数十万個作られるので、__dict__ を持たせない
+    __slots__ = ("data", "delta")
+
     def __init__(self, data: bytes, delta:int):
         self.data = data
         self.delta = delta
@@ -11,22 +14,22 @@ class SampleData:
 
 
 class StreamingSampleData(SampleData):
+    __slots__ = ("start", "length")
+
     def __init__(self, start:int, length:int, delta:int):
-        super().__init__(b'', delta)
+        self.delta = delta
         self.start = start
         self.length = length
 
-
+    @property
+    def data(self) -> bytes:
+        """
+        中身は元ファイルの start から length バイト(ここには持たない)
+        """
+        return b''
 
     def print(self):
         print(f"- {self.start} ~ {self.length}", end=",")
 
     def __len__(self):
         return self.length
-
-
-
-
-
-
-
@@ -0,0 +1,125 @@
+import numpy as np
+
+from flavtool.analyzer.components import SampleTableComponent
+from .chunk import ChunkData
+from .sample import StreamingSampleData
+
+
+class SampleIndex:
+    """
+    トラックのサンプルを時間・位置から二分探索で引くためのインデックス
+    時間はすべてメディアのタイムスケール単位
+    """
+
+    def __init__(self, decode_times: np.ndarray, deltas: np.ndarray, offsets: np.ndarray, sizes: np.ndarray,
+                 chunk_ids: np.ndarray):
+        """
+        Parameters
+        ----------
+        decode_times : np.ndarray
+            各サンプルの開始時間(累積)
+        deltas : np.ndarray
+            各サンプルの長さ
+        offsets : np.ndarray
+            各サンプルのファイル上のオフセット(不明な場合は-1)
+        sizes : np.ndarray
+            各サンプルのサイズ
+        chunk_ids : np.ndarray
+            各サンプルが属するチャンクの番号(0始まり)
+        """
+        self.decode_times = decode_times
+        self.deltas = deltas
+        self.offsets = offsets
+        self.sizes = sizes
+        self.chunk_ids = chunk_ids
+        self.duration = int(decode_times[-1] + deltas[-1]) if len(decode_times) > 0 else 0
+
+    @classmethod
+    def from_sample_table(cls, sample_table: SampleTableComponent) -> 'SampleIndex':
+        """
+        stts/stsc/stsz/stco からインデックスを作成する
+        """
+        stts = sample_table.time_to_sample.time_to_sample_table
+        deltas = np.repeat(stts.sample_delta.astype(np.int64), stts.sample_count)
+        sample_n = len(deltas)
+
+        chunk_offsets = sample_table.chunk_offset.chunk_to_offset_table.astype(np.int64)
+        chunk_n = len(chunk_offsets)
+        stsc = sample_table.sample_to_chunk.sample_to_chunk_table
+        # stscの各エントリが何チャンク分続くか(最後のエントリは最終チャンクまで)
+        first_chunks = stsc.first_chunk.astype(np.int64) - 1
+        runs = np.diff(np.append(first_chunks, chunk_n))
+        samples_per_chunk = np.repeat(stsc.samples_per_chunk.astype(np.int64), runs)
+        chunk_ids = np.repeat(np.arange(chunk_n, dtype=np.int64), samples_per_chunk)[:sample_n]
+
+        stsz = sample_table.sample_size
+        if stsz.sample_size != 0:
+            sizes = np.full(sample_n, stsz.sample_size, dtype=np.int64)
+        else:
+            sizes = stsz.sample_size_table.astype(np.int64)
+
+        return cls.__build(deltas, sizes, chunk_ids, chunk_offsets[chunk_ids])
+
+    @classmethod
+    def from_chunks(cls, chunks: list[ChunkData]) -> 'SampleIndex':
+        """
+        ChunkDataのリストからインデックスを作成する(サンプルテーブルを持たないメディアデータ用)
+        """
+        deltas = []
+        sizes = []
+        chunk_ids = []
+        chunk_offsets = []
+        for chunk_i, chunk in enumerate(chunks):
+            first = chunk.samples[0] if len(chunk.samples) > 0 else None
+            chunk_offsets.append(first.start if isinstance(first, StreamingSampleData) else -1)
+            for sample in chunk.samples:
+                deltas.append(sample.delta)
+                sizes.append(len(sample))
+                chunk_ids.append(chunk_i)
+        chunk_ids = np.array(chunk_ids, dtype=np.int64)
+        chunk_offsets = np.array(chunk_offsets, dtype=np.int64)
+        return cls.__build(np.array(deltas, dtype=np.int64), np.array(sizes, dtype=np.int64), chunk_ids,
+                           chunk_offsets[chunk_ids])
+
+    @classmethod
+    def __build(cls, deltas: np.ndarray, sizes: np.ndarray, chunk_ids: np.ndarray,
+                sample_chunk_offsets: np.ndarray) -> 'SampleIndex':
+        decode_times = np.zeros(len(deltas), dtype=np.int64)
+        np.cumsum(deltas[:-1], out=decode_times[1:])
+
+        # チャンク内でのサンプルの位置 = サイズの累積和 - チャンク先頭サンプルまでの累積和
+        size_sums = np.zeros(len(sizes), dtype=np.int64)
+        np.cumsum(sizes[:-1], out=size_sums[1:])
+        is_chunk_head = np.ones(len(chunk_ids), dtype=bool)
+        is_chunk_head[1:] = chunk_ids[1:] != chunk_ids[:-1]
+        head_sums = np.maximum.accumulate(np.where(is_chunk_head, size_sums, 0))
+        offsets = np.where(sample_chunk_offsets < 0, -1, sample_chunk_offsets + size_sums - head_sums)
+
+        return cls(decode_times, deltas, offsets, sizes, chunk_ids)
+
+    def __len__(self):
+        return len(self.decode_times)
+
+    def sample_at_time(self, t: int) -> int:
+        """
+        時間 t を含むサンプルの番号を返す
+        """
+        if t < 0 or t >= self.duration:
+            raise IndexError(f"time {t} is out of range (duration {self.duration})")
+        return int(np.searchsorted(self.decode_times, t, side="right")) - 1
+
+    def samples_in_range(self, t0: int, t1: int) -> range:
+        """
+        [t0, t1) と重なるサンプルの番号の範囲を返す
+        """
+        begin = max(int(np.searchsorted(self.decode_times, t0, side="right")) - 1, 0)
+        if begin < len(self) and self.decode_times[begin] + self.deltas[begin] <= t0:
+            begin += 1
+        end = int(np.searchsorted(self.decode_times, t1, side="left"))
+        return range(begin, max(begin, end))
+
+    def time_of_sample(self, i: int) -> int:
+        """
+        サンプル i の開始時間を返す
+        """
+        return int(self.decode_times[i])
@@ -0,0 +1 @@
+from .batch import FileResult, BatchReport, process_file, collect_inputs, run_batch
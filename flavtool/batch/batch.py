@@ -0,0 +1,175 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable
+
+from flavtool.parser import Parser
+from flavtool.analyzer import analyze
+from flavtool.composer import Composer
+
+
+class FileResult:
+    """
+    1ファイル分の処理結果
+    """
+
+    def __init__(self, input_path: str, output_path: str, ok: bool, size: int = 0, seconds: float = 0.0,
+                 error: str | None = None):
+        self.input_path = input_path
+        self.output_path = output_path
+        self.ok = ok
+        self.size = size
+        self.seconds = seconds
+        self.error = error
+
+    @property
+    def throughput(self) -> float:
+        """
+        MB/s
+        """
+        return self.size / 1e6 / self.seconds if self.seconds > 0 else 0.0
+
+
+class BatchReport:
+    """
+    バッチ全体の処理結果
+    """
+
+    def __init__(self):
+        self.results: list[FileResult] = []
+        self.seconds = 0.0
+
+    @property
+    def succeeded(self) -> list[FileResult]:
+        return [r for r in self.results if r.ok]
+
+    @property
+    def failed(self) -> list[FileResult]:
+        return [r for r in self.results if not r.ok]
+
+    @property
+    def total_size(self) -> int:
+        return sum(r.size for r in self.succeeded)
+
+    @property
+    def files_per_second(self) -> float:
+        return len(self.results) / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def mb_per_second(self) -> float:
+        return self.total_size / 1e6 / self.seconds if self.seconds > 0 else 0.0
+
+    def print(self):
+        for r in sorted(self.results, key=lambda r: r.input_path):
+            if r.ok:
+                print(f"OK   {r.input_path} -> {r.output_path}  {r.size / 1e6:.2f} MB  {r.seconds:.3f} s  "
+                      f"{r.throughput:.2f} MB/s")
+            else:
+                print(f"FAIL {r.input_path}  {r.error}")
+        print(f"{len(self.results)} files ({len(self.succeeded)} ok, {len(self.failed)} failed) in {self.seconds:.3f} s: "
+              f"{self.files_per_second:.2f} files/s, {self.mb_per_second:.2f} MB/s")
+
+
+def process_file(input_path: str, output_path: str, read_mdat_bytes: bool = False,
+                 faststart: bool = False) -> FileResult:
+    """
+    1ファイルをパース→解析→再構成→書き出しする。例外は FileResult に記録して返す(他のファイルの処理は止めない)
+    Parameters
+    ----------
+    input_path : str
+        入力ファイル
+    output_path : str
+        出力ファイル
+    read_mdat_bytes : bool
+        mdatをメモリに読み込むか(False なら元ファイルからチャンクごとにコピーする)
+    faststart : bool
+        moovをmdatの前に置いて出力する
+    """
+    begin = time.perf_counter()
+    flav_mp4 = None
+    try:
+        size = os.path.getsize(input_path)
+        flav_mp4 = analyze(Parser(input_path).parse(read_mdat_bytes=read_mdat_bytes))
+        composer = Composer(flav_mp4, faststart=faststart)
+        composer.compose()
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        composer.write(output_path)
+    except Exception as e:
+        return FileResult(input_path, output_path, False, seconds=time.perf_counter() - begin,
+                          error=f"{type(e).__name__}: {e}")
+    finally:
+        # 失敗した場合もワーカーにmmapを残さない(パースに失敗した場合は何も開いていない)
+        if flav_mp4 is not None:
+            flav_mp4.mdat.close()
+    return FileResult(input_path, output_path, True, size, time.perf_counter() - begin)
+
+
+def collect_inputs(source: str, output_dir: str, pattern_suffix: str = ".mp4") -> list[tuple[str, str]]:
+    """
+    入力ファイルと出力先の組を作る
+    Parameters
+    ----------
+    source : str
+        ディレクトリ(再帰的に pattern_suffix で終わるファイルを探す)、
+        またはマニフェスト(1行に1ファイル。空行と # で始まる行は無視する)
+    output_dir : str
+        出力先ディレクトリ(ディレクトリからの相対パスを保って書き出す)
+    """
+    if os.path.isdir(source):
+        inputs = []
+        for root, _, files in os.walk(source):
+            for name in sorted(files):
+                if name.lower().endswith(pattern_suffix):
+                    inputs.append(os.path.join(root, name))
+        base = source
+    else:
+        with open(source) as f:
+            inputs = [line.strip() for line in f if line.strip() and not line.strip().startswith("#")]
+        base = os.path.commonpath([os.path.dirname(os.path.abspath(p)) for p in inputs]) if inputs else ""
+    pairs = []
+    for path in sorted(inputs):
+        relative = os.path.relpath(os.path.abspath(path), os.path.abspath(base)) if base else os.path.basename(path)
+        pairs.append((path, os.path.join(output_dir, relative)))
+    return pairs
+
+
+def run_batch(pairs: list[tuple[str, str]], workers: int | None = None, read_mdat_bytes: bool = False,
+              faststart: bool = False, on_result: Callable[[FileResult], None] | None = None) -> BatchReport:
+    """
+    ファイルをプロセスプールに分配して処理する
+    Parameters
+    ----------
+    pairs : list[tuple[str, str]]
+        (入力ファイル, 出力ファイル) のリスト
+    workers : int | None
+        ワーカープロセス数(None ならCPU数、1 ならプールを使わずに順に処理する)
+    on_result : Callable[[FileResult], None] | None
+        1ファイル終わるごとに呼ばれる
+    """
+    report = BatchReport()
+    begin = time.perf_counter()
+    if workers == 1:
+        for input_path, output_path in pairs:
+            result = process_file(input_path, output_path, read_mdat_bytes, faststart)
+            report.results.append(result)
+            if on_result is not None:
+                on_result(result)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(process_file, input_path, output_path, read_mdat_bytes, faststart):
+                    (input_path, output_path)
+                for input_path, output_path in pairs
+            }
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # ワーカープロセス自体が落ちた場合もそのファイルの失敗として扱う
+                    input_path, output_path = futures[future]
+                    result = FileResult(input_path, output_path, False, error=f"{type(e).__name__}: {e}")
+                report.results.append(result)
+                if on_result is not None:
+                    on_result(result)
+    report.seconds = time.perf_counter() - begin
+    return report
@@ -0,0 +1,33 @@
+import argparse
+import sys
+
+from flavtool.batch import collect_inputs, run_batch
+
+
+def batch(args: argparse.Namespace) -> int:
+    pairs = collect_inputs(args.source, args.output_dir)
+    if len(pairs) == 0:
+        print(f"no input files in {args.source}", file=sys.stderr)
+        return 1
+    report = run_batch(pairs, workers=args.workers, read_mdat_bytes=args.in_memory, faststart=args.faststart)
+    report.print()
+    return 0 if len(report.failed) == 0 else 1
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="flavtool")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    batch_parser = subparsers.add_parser(
+        "batch", help="parse, analyze, compose and write many FlavMP4 files in parallel")
+    batch_parser.add_argument("source", help="directory of .mp4 files, or a manifest with one path per line")
+    batch_parser.add_argument("-o", "--output-dir", required=True, help="directory to write composed files to")
+    batch_parser.add_argument("-j", "--workers", type=int, default=None,
+                              help="number of worker processes (default: CPU count, 1: no pool)")
+    batch_parser.add_argument("--in-memory", action="store_true",
+                              help="read mdat into memory instead of copying chunks from the source file")
+    batch_parser.add_argument("--faststart", action="store_true", help="place moov before mdat")
+    batch_parser.set_defaults(func=batch)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
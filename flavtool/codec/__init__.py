@@ -1,6 +1,8 @@
 from typing import Literal
-from .decoder import decoders, decoder_func_type
-from .encoder import encoders, encoder_func_type
+import numpy as np
+
+from .decoder import decoders, decoder_func_type, batch_decoders, batch_decoder_func_type
+from .encoder import encoders, encoder_func_type, batch_encoders, batch_encoder_func_type
 supported_codec_type = Literal["raw5", "rmix"]
 supported_codecs = ["raw5", "rmix"]
 
@@ -14,4 +16,29 @@ def get_encoder(codec : supported_codec_type) -> encoder_func_type :
         raise Exception(f"This codec : {codec} is not supported")
     return encoders[codec]
 
+def get_batch_decoder(codec : supported_codec_type) -> batch_decoder_func_type :
+    if codec not in supported_codecs:
+        raise Exception(f"This codec : {codec} is not supported")
+    return batch_decoders[codec]
+
+def get_batch_encoder(codec : supported_codec_type) -> batch_encoder_func_type :
+    if codec not in supported_codecs:
+        raise Exception(f"This codec : {codec} is not supported")
+    return batch_encoders[codec]
+
+def encode_batch(codec : supported_codec_type, data : np.ndarray) -> tuple[bytes, np.ndarray]:
+    """
+    (N, D) の配列をまとめてエンコードする
+    Returns
+    -------
+    連結された符号と、各サンプルのサイズ(stszにそのまま使える)
+    """
+    return get_batch_encoder(codec)(data)
 
+def decode_batch(codec : supported_codec_type, codes : list[bytes] | bytes, sizes=None) -> np.ndarray:
+    """
+    サンプルごとの符号のリスト、または連結された符号とサイズの配列から (N, D) の配列にデコードする
+    連結された符号を渡す場合、可変長のコーデック(rmix)では sizes が必要
+    すべてのフレームは同じ長さでなければならない(異なる場合は Exception)
+    """
+    return get_batch_decoder(codec)(codes, sizes)
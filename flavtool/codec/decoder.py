@@ -10,10 +10,56 @@ def raw5_decoder(code: bytes) -> np.ndarray :
 def rmix_decoder(code: bytes) -> np.ndarray:
     return np.frombuffer(zlib.decompress(code), dtype=np.uint8)
 
+def split_codes(code: bytes, sizes) -> list[bytes]:
+    """
+    連結されたバイト列を、サンプルサイズの配列にしたがってサンプルごとに分割する
+    """
+    if sizes is None:
+        raise Exception("sizes is required to split concatenated codes")
+    ends = np.cumsum(sizes).tolist()
+    if (ends[-1] if len(ends) > 0 else 0) != len(code):
+        raise Exception(f"sizes sum to {ends[-1] if len(ends) > 0 else 0} but codes are {len(code)} bytes")
+    begins = [0] + ends[:-1]
+    return [code[b:e] for b, e in zip(begins, ends)]
+
+
+def raw5_batch_decoder(codes: list[bytes] | bytes, sizes=None) -> np.ndarray:
+    code = codes if isinstance(codes, (bytes, bytearray, memoryview)) else b"".join(codes)
+    return np.frombuffer(code, dtype=np.uint8).reshape(-1, 5)
+
+
+def rmix_batch_decoder(codes: list[bytes] | bytes, sizes=None) -> np.ndarray:
+    if isinstance(codes, (bytes, bytearray, memoryview)):
+        codes = split_codes(bytes(codes), sizes)
+    # 同じ符号は一度だけ展開する
+    decompressed: dict[bytes, bytes] = {}
+    rows = []
+    for code in codes:
+        if not isinstance(code, bytes):
+            code = bytes(code)
+        row = decompressed.get(code)
+        if row is None:
+            row = zlib.decompress(code)
+            decompressed[code] = row
+        rows.append(row)
+    if len(rows) == 0:
+        return np.zeros((0, 0), dtype=np.uint8)
+    widths = set(map(len, rows))
+    if len(widths) != 1:
+        raise Exception(f"Decode Error. Batch decoding needs frames of the same length, got {sorted(widths)}")
+    return np.frombuffer(b"".join(rows), dtype=np.uint8).reshape(len(rows), widths.pop())
+
+
 decoder_func_type = Callable[[bytes], np.ndarray]
+batch_decoder_func_type = Callable[..., np.ndarray]
 
 decoders : Final[dict[str, decoder_func_type]] = {
     "raw5" : raw5_decoder,
     "rmix" : rmix_decoder,
 }
 
+batch_decoders : Final[dict[str, batch_decoder_func_type]] = {
+    "raw5" : raw5_batch_decoder,
+    "rmix" : rmix_batch_decoder,
+}
+
@@ -18,9 +18,60 @@ def rmix_encoder(data: np.ndarray) -> bytes:
     return zlib.compress(data.tobytes())
 
 
+def raw5_batch_encoder(data: np.ndarray) -> tuple[bytes, np.ndarray]:
+    if data.dtype != np.uint8:
+        raise Exception("Encode Error. Only ndarray dtype=np.uint8 is supported")
+    if not (data.ndim == 2 and data.shape[1] == 5):
+        raise Exception("Encode Error. Only ndarray (N,5) is supported")
+    return np.ascontiguousarray(data).tobytes(), np.full(data.shape[0], 5, dtype=np.uint32)
+
+
+# この長さ以下のフレームは、窓とハッシュ表を小さくした圧縮器で圧縮する
+rmix_small_frame = 256
+
+
+def rmix_batch_encoder(data: np.ndarray) -> tuple[bytes, np.ndarray]:
+    if data.dtype != np.uint8:
+        raise Exception("Encode Error. Only ndarray dtype=np.uint8 is supported")
+    if data.ndim != 2:
+        raise Exception("Encode Error. Only ndarray (N,D) is supported")
+    frame_n, frame_size = data.shape
+    if frame_n == 0:
+        return b'', np.zeros(0, dtype=np.uint32)
+    raw = np.ascontiguousarray(data).tobytes()
+    if frame_size <= rmix_small_frame:
+        # zlib.compress は呼び出しごとに 32KiB の窓と 64KiB のハッシュ表を確保・初期化する。
+        # 短いフレームには 512B の窓と最小のハッシュ表で足りる(zlib.decompress でそのまま展開できる)ので、
+        # その状態を1度だけ作ってフレームごとに複製する
+        base = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, 9, 1)
+
+        def compress(frame: bytes) -> bytes:
+            compressor = base.copy()
+            return compressor.compress(frame) + compressor.flush()
+    else:
+        compress = zlib.compress
+    # 味データは同じフレームが続くことが多いので、同じフレームは一度だけ圧縮する
+    compressed: dict[bytes, bytes] = {}
+    codes = []
+    for begin in range(0, len(raw), frame_size):
+        frame = raw[begin:begin + frame_size]
+        code = compressed.get(frame)
+        if code is None:
+            code = compress(frame)
+            compressed[frame] = code
+        codes.append(code)
+    return b"".join(codes), np.fromiter(map(len, codes), dtype=np.uint32, count=frame_n)
+
+
 encoder_func_type = Callable[[np.ndarray], bytes]
+batch_encoder_func_type = Callable[[np.ndarray], tuple[bytes, np.ndarray]]
 
 encoders: Final[dict[str, encoder_func_type]] = {
     "raw5": raw5_encoder,
     "rmix": rmix_encoder
 }
+
+batch_encoders: Final[dict[str, batch_encoder_func_type]] = {
+    "raw5": raw5_batch_encoder,
+    "rmix": rmix_batch_encoder
+}
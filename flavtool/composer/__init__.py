@@ -1 +1,2 @@
-from .composer import Composer
\ No newline at end of file
+from .composer import Composer
+from .fragment_writer import FragmentWriter
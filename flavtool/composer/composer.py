@@ -1,14 +1,19 @@
+import io
+import os
 from typing import Literal
 
 from flavtool.analyzer.components import *
 from flavtool.analyzer.media_data import SampleData, MediaData, ChunkData
 from flavtool.parser.boxs.container import ContainerBox
 from flavtool.parser.boxs.leaf import *
+from flavtool.parser import Parser
 import numpy as np
 from flavtool.composer.utils.sample_table_creator import SampleTableCreator
+from flavtool.composer.utils.chunking_policy import ChunkingPolicy
 from flavtool.composer.utils.track_box_creator import TrackBoxCreator
 from flavtool.codec import get_encoder
 from flavtool.analyzer import FlavMP4
+from flavtool.tracer import tracer
 
 media_types = Literal["tast", "soun", "vide", "scnt"]
 
@@ -29,24 +34,37 @@ class Composer:
         return sample_tables
 
 
-    def __init__(self, flav_mp4:FlavMP4):
+    def __init__(self, flav_mp4:FlavMP4, faststart: bool = False,
+                 chunking: ChunkingPolicy | dict[media_types, ChunkingPolicy] | None = None):
         """
         パースされたMp4の情報をもとに、トラック情報、サンプルデータ情報を構築
         Parameters
         ----------
-        parsed_box : ContainerBox
-            パースされたMP4データ
-        streaming : bool
-            strea
+        flav_mp4 : FlavMP4
+            解析されたMP4データ
+        faststart : bool
+            moovをmdatの前に置いて出力する(プログレッシブ再生用)
+        chunking : ChunkingPolicy | dict[media_types, ChunkingPolicy] | None
+            compose() 時にトラックのサンプルをチャンクに分け直す方針(全トラック共通、またはトラックごと)。
+            None ならチャンクはそのまま使う
 
         """
         self.flav_mp4 : FlavMP4 = flav_mp4
+        self.faststart = faststart
+        self.chunking = chunking
+
+    def __chunking_of(self, media_type: media_types) -> ChunkingPolicy | None:
+        if isinstance(self.chunking, dict):
+            return self.chunking.get(media_type)
+        return self.chunking
 
 
     def __generate_interleave_chunks(self, criteria_media_type: media_types, target_media_types: list[media_types]) -> \
             tuple[list[ChunkData], dict[media_types, list[int]]]:
         """
         各メディアデータから、指定メディアタイプを基準とした適切なChunkリストとオフセットを作成
+        基準トラックの各チャンクの直後に、そのチャンクの終了時間までに始まる対象トラックのチャンクを置く
+        (残りは最後に対象トラックの順に置く)。時間は整数のまま比較し、配列の二分探索でまとめて配置を決める
         Parameters
         ----------
         criteria_media_type
@@ -58,45 +76,40 @@ class Composer:
         ChunkData list and Offset Dictionary
 
         """
-        track_n = len(target_media_types)
-        criteria_time_scale = self.flav_mp4.tracks[criteria_media_type].media.header.time_scale
-        target_time_scales = [self.flav_mp4.tracks[media_type].media.header.time_scale for media_type in target_media_types]
+        media_types = [criteria_media_type] + target_media_types
+        time_scales = [self.flav_mp4.tracks[media_type].media.header.time_scale for media_type in media_types]
+        chunk_lists: list[list[ChunkData]] = [self.flav_mp4.media_datas[media_type].data for media_type in media_types]
+        arrays = [self.flav_mp4.media_datas[media_type].chunk_arrays() for media_type in media_types]
 
-        chunks: list[ChunkData] = []
-        criteria_chunks: list[ChunkData] = self.flav_mp4.media_datas[criteria_media_type].data
-        targets_chunks: list[list[ChunkData]] = [self.flav_mp4.media_datas[media_type].data for media_type in target_media_types]
+        criteria_end_times = arrays[0][1]
+        criteria_time_scale = time_scales[0]
+        # slot k: 基準トラックのk番目のチャンクの後ろ (len(criteria) は残り)
+        slots = [np.arange(len(criteria_end_times), dtype=np.int64)]
+        for track_i in range(1, len(media_types)):
+            begin_times = arrays[track_i][0]
+            # begin / target_time_scale <= end / criteria_time_scale を整数の掛け算で比較する
+            slot = np.searchsorted(criteria_end_times * time_scales[track_i], begin_times * criteria_time_scale,
+                                   side="left")
+            # 前のチャンクより前には置かない
+            slots.append(np.maximum.accumulate(slot) if len(slot) > 0 else slot)
 
-        criteria_chunk_offsets = []
-        targets_chunk_offsets = [[] for _ in range(track_n)]
-        targets_i = [0 for _ in range(track_n)]
-        offset = 0
-        for criteria_chunk in criteria_chunks:
-            # print(offset)
-            criteria_chunk_offsets.append(offset)
-            chunks.append(criteria_chunk)
-            offset += criteria_chunk.get_size()
-            for track_i in range(track_n):
-                target_chunks = targets_chunks[track_i]
-                target_sps = target_time_scales[track_i]
-                target_chunk_offsets = targets_chunk_offsets[track_i]
-                while targets_i[track_i] < len(target_chunks) and target_chunks[
-                    targets_i[track_i]].begin_time / target_sps <= criteria_chunk.end_time / criteria_time_scale:
-                    target_chunk_offsets.append(offset)
-                    target_chunk = target_chunks[targets_i[track_i]]
-                    chunks.append(target_chunk)
-                    offset += target_chunk.get_size()
-                    targets_i[track_i] += 1
-        for track_i in range(track_n):
-            target_chunks = targets_chunks[track_i]
-            target_chunk_offsets = targets_chunk_offsets[track_i]
-            while targets_i[track_i] < len(target_chunks):
-                target_chunk_offsets.append(offset)
-                chunks.append(target_chunks[targets_i[track_i]])
-                offset += target_chunks[targets_i[track_i]].get_size()
-                targets_i[track_i] += 1
-        result_offset: dict[media_types, list[int]] = {criteria_media_type: criteria_chunk_offsets}
-        for i, tm in enumerate(target_media_types):
-            result_offset[tm] = targets_chunk_offsets[i]
+        counts = [len(chunks) for chunks in chunk_lists]
+        track_ids = np.repeat(np.arange(len(media_types)), counts)
+        chunk_ids = np.concatenate([np.arange(count, dtype=np.int64) for count in counts])
+        order = np.lexsort((chunk_ids, track_ids, np.concatenate(slots)))
+
+        sizes = np.concatenate([sizes for _, _, sizes in arrays])
+        ordered_offsets = np.zeros(len(order), dtype=np.int64)
+        np.cumsum(sizes[order][:-1], out=ordered_offsets[1:])
+        offsets = np.empty(len(order), dtype=np.int64)
+        offsets[order] = ordered_offsets
+
+        all_chunks = [chunk for chunks in chunk_lists for chunk in chunks]
+        chunks = [all_chunks[i] for i in order.tolist()]
+        bounds = np.cumsum([0] + counts)
+        result_offset: dict[media_types, list[int]] = {
+            media_type: offsets[bounds[i]:bounds[i + 1]].tolist() for i, media_type in enumerate(media_types)
+        }
         return chunks, result_offset
 
     def __select_criteria(self, target_media_types: list[media_types]) -> tuple[media_types, list[media_types]]:
@@ -109,35 +122,163 @@ class Composer:
                 return criteria, others
 
 
-    def compose(self, include_media_types : None |list[media_types] = None):
+    def compose(self, include_media_types : None |list[media_types] = None, streaming: bool | None = None):
+        """
+        mdatとサンプルテーブルのオフセットを再構成する
+        Parameters
+        ----------
+        include_media_types
+            出力に含めるメディアタイプ(None なら全トラック)
+        streaming
+            True なら mdat をメモリ上に作らず、write() 時にチャンクを元ファイルから直接書き出す。
+            None の場合、mdatの中身を読み込まずにパースしたとき(read_mdat_bytes=False)は True になる
+        """
+        if streaming is None:
+            streaming = not self.flav_mp4.mdat.read_bytes
         if include_media_types is None:
             include_media_types = []
             for k, v in self.flav_mp4.tracks.items():
                 if v is not None:
                     include_media_types.append(k)
 
+        if self.flav_mp4.fragmented:
+            self.__defragment()
+        for mt in include_media_types:
+            chunking = self.__chunking_of(mt)
+            if chunking is not None:
+                self.__rebuild_sample_table(mt, self.flav_mp4.media_datas[mt].data, chunking)
+
         criteria_media_type, target_media_types = self.__select_criteria(include_media_types)
         chunks, offsets = self.__generate_interleave_chunks(criteria_media_type,target_media_types)
 
         # for c in chunks:
         #     c.print()
 
-        buffer = io.BytesIO()
-        for chunk in chunks:
-            chunk.write(buffer)
-        buffer.seek(0)
-        self.flav_mp4.mdat.body = buffer.read()
+        if streaming:
+            self.flav_mp4.mdat.set_chunks(chunks)
+        else:
+            buffer = io.BytesIO()
+            for chunk in chunks:
+                chunk.write(buffer)
+            self.flav_mp4.mdat.chunks = None
+            self.flav_mp4.mdat.body = buffer.getvalue()
+
+        # 追記で増えたmdatは、すべてのチャンクを1つのmdatにまとめ直すので取り除く
+        for box in self.flav_mp4.mdats:
+            if box is not self.flav_mp4.mdat:
+                self.flav_mp4.parsed.children.remove(box)
+        self.flav_mp4.mdats = [self.flav_mp4.mdat]
+
+        if self.faststart:
+            self.__move_moov_before_mdat()
 
         for cm in include_media_types:
             self.__create_dummy_stco(len(offsets[cm]), stco=self.sample_tables[cm].chunk_offset)
 
         mdat, mdat_offset = self.flav_mp4.parsed.get_mdat_offset()
+        # 32bitに収まらないオフセットがあるトラックはco64に昇格させる(moovのサイズが変わるので再計算する)
+        while self.__promote_chunk_offsets(include_media_types, offsets, mdat_offset):
+            mdat, mdat_offset = self.flav_mp4.parsed.get_mdat_offset()
 
         self.flav_mp4.mdat.begin_point = mdat_offset
 
         for cm in include_media_types:
             self.sample_tables[cm].chunk_offset.chunk_to_offset_table = [co + mdat_offset for co in offsets[cm]]
-        self.flav_mp4.parsed.print()
+        tracer.tree(self.flav_mp4.parsed)
+
+    def append(self, include_media_types: list[media_types], path: str | None = None):
+        """
+        既存のmdatには手を付けず、指定トラックのサンプルだけを新しいmdatとしてファイルに書き込む。
+        書き直すのはmoovだけで、大きくなって元の場所に収まらない場合はファイル末尾に移動する。
+        新しいmdatは、収まるfree boxがあればそこに、なければファイル末尾に置かれる
+        Parameters
+        ----------
+        include_media_types
+            書き込むトラック(set_new_modal 等で設定したもの)
+        path
+            書き換えるファイル(None ならパース元のファイル)
+        """
+        if path is None:
+            path = self.flav_mp4.mdat.source_path
+        if path is None:
+            raise Exception("target file is unknown")
+
+        chunks: list[ChunkData] = []
+        offsets: dict[media_types, list[int]] = {}
+        offset = 0
+        for mt in include_media_types:
+            offsets[mt] = []
+            for chunk in self.flav_mp4.media_datas[mt].data:
+                offsets[mt].append(offset)
+                chunks.append(chunk)
+                offset += chunk.get_size()
+        mdat = MdatBox("mdat", is_extended=False, begin_point=None)
+        mdat.set_chunks(chunks)
+        mdat.source_path = path
+        mdat_size = mdat.get_size()
+
+        layout = Parser(path).scan()
+        file_size = os.path.getsize(path)
+        moov_i = [box_type for box_type, _, _ in layout].index("moov")
+        _, moov_offset, moov_size = layout[moov_i]
+        moov_is_last = moov_i == len(layout) - 1
+        # moovの直後のfreeはmoovが大きくなったときの領域として使う
+        moov_space = moov_size
+        if not moov_is_last and layout[moov_i + 1][0] == "free":
+            moov_space += layout[moov_i + 1][2]
+
+        mdat_offset, mdat_space = None, 0
+        for i, (box_type, box_offset, box_size) in enumerate(layout):
+            if box_type == "free" and i != moov_i + 1 and self.__fits(mdat_size, box_size):
+                mdat_offset, mdat_space = box_offset, box_size
+                break
+        if mdat_offset is None:
+            mdat_offset = moov_offset if moov_is_last else file_size
+
+        for cm in include_media_types:
+            self.__create_dummy_stco(len(offsets[cm]), stco=self.sample_tables[cm].chunk_offset)
+        while self.__promote_chunk_offsets(include_media_types, offsets, mdat_offset + mdat.header_size):
+            pass
+        mdat.begin_point = mdat_offset + mdat.header_size
+        for cm in include_media_types:
+            self.sample_tables[cm].chunk_offset.chunk_to_offset_table = \
+                [co + mdat.begin_point for co in offsets[cm]]
+
+        moov = self.flav_mp4.parsed["moov"]
+        new_moov_size = moov.get_size()
+        with open(path, "r+b") as f:
+            f.seek(mdat_offset)
+            mdat.write(f)
+            if mdat_space > mdat_size:
+                self.__write_free_header(f, mdat_space - mdat_size)
+
+            if moov_is_last:
+                f.seek(mdat_offset + mdat_size if mdat_offset == moov_offset else moov_offset)
+                moov.write(f)
+                f.truncate()
+            elif self.__fits(new_moov_size, moov_space):
+                f.seek(moov_offset)
+                moov.write(f)
+                if moov_space > new_moov_size:
+                    self.__write_free_header(f, moov_space - new_moov_size)
+            else:
+                # 元のmoovはfreeにして、新しいmoovはファイル末尾に置く
+                f.seek(moov_offset + 4)
+                f.write(b"free")
+                f.seek(0, os.SEEK_END)
+                moov.write(f)
+        tracer.tree(self.flav_mp4.parsed)
+
+    @staticmethod
+    def __fits(size: int, space: int) -> bool:
+        """
+        size バイトのBoxを space バイトの領域に置けるか(余りはfree boxで埋めるので8バイト以上必要)
+        """
+        return size == space or space - size >= 8
+
+    @staticmethod
+    def __write_free_header(f, size: int):
+        FreeBox("free").write_type_and_size(f, "free", size)
 
     def set_track(self, media_type:media_types, track_component:TrackComponent):
         if self.flav_mp4.tracks[media_type] is not None:
@@ -153,8 +294,91 @@ class Composer:
     def __create_dummy_stco(self, chunks_len: int, stco: StcoBox):
         if stco is None:
             return
-        stco.number_of_entries = chunks_len
-        stco.chunk_to_offset_table = []
+        # オフセットが決まるまでは、サイズを求めるために0で埋めたテーブルにしておく
+        stco.chunk_to_offset_table = np.zeros(chunks_len, dtype=stco.offset_dtype)
+
+    def __move_moov_before_mdat(self):
+        """
+        トップレベルのmoovをmdatの直前に移動する。オフセットはこの後のレイアウト計算でまとめて決まる
+        """
+        children = self.flav_mp4.parsed.children
+        moov = self.flav_mp4.parsed["moov"]
+        mdat_i = children.index(self.flav_mp4.mdat)
+        if children.index(moov) < mdat_i:
+            return
+        children.remove(moov)
+        children.insert(mdat_i, moov)
+
+    def __defragment(self):
+        """
+        moof/mfra/mvexを取り除き、フラグメントのサンプルを含めたサンプルテーブルをmoovに作り直す
+        (フラグメント化されたMP4を通常のMP4として出力する)
+        """
+        parsed = self.flav_mp4.parsed
+        for box in parsed.get_children("moof") + parsed.get_children("mfra"):
+            parsed.children.remove(box)
+        self.flav_mp4.moofs = []
+        moov = parsed["moov"]
+        mvex = moov["mvex"]
+        if mvex is not None:
+            moov.children.remove(mvex)
+
+        mov_time_scale = self.flav_mp4.mov_header.time_scale
+        movie_duration = self.flav_mp4.mov_header.duration
+        for mt, track in self.flav_mp4.tracks.items():
+            media_data = self.flav_mp4.media_datas[mt]
+            if track is None or media_data is None:
+                continue
+            self.__rebuild_sample_table(mt, media_data.data)
+
+            # フラグメント化されたファイルのmoovは長さが0になっているので、サンプルから求める
+            media_duration = media_data.data[-1].end_time if len(media_data.data) > 0 else 0
+            if track.media.header.duration == 0:
+                track.media.header.duration = media_duration
+            if track.header.duration == 0:
+                track.header.duration = media_duration * mov_time_scale // track.media.header.time_scale
+            movie_duration = max(movie_duration, track.header.duration)
+        self.flav_mp4.mov_header.duration = movie_duration
+
+    def __rebuild_sample_table(self, media_type: media_types, chunks: list[ChunkData],
+                               chunking: ChunkingPolicy | None = None):
+        """
+        チャンクのリストからトラックのサンプルテーブル(stts, stsc, stsz, stco)を作り直し、
+        メディアデータをそのチャンクのリストに置き換える(chunking を指定するとチャンクを分け直す)
+        """
+        track = self.flav_mp4.tracks[media_type]
+        media_info = track.media.media_info
+        stbl = media_info.sample_table.parsed
+        creator = SampleTableCreator(chunks, codec=None, chunking=chunking, time_scale=track.media.header.time_scale)
+        creator.replace_table_boxes(stbl)
+        media_info.sample_table = SampleTableComponent(stbl)
+        # 列(ColumnarMediaData)は元のサンプルテーブルに対応しているので、チャンクのリストのメディアデータに置き換える
+        self.flav_mp4.media_datas[media_type] = MediaData(media_type, creator.chunks, media_info.sample_table)
+
+    def __promote_chunk_offsets(self, include_media_types: list[media_types], offsets: dict[media_types, list[int]],
+                                mdat_offset: int) -> bool:
+        """
+        最大オフセットが32bitに収まらないトラックのstcoをco64に置き換える
+        Returns
+        -------
+        昇格したトラックがあれば True
+        """
+        promoted = False
+        for cm in include_media_types:
+            sample_table = self.sample_tables[cm]
+            stco = sample_table.chunk_offset
+            if stco is None or isinstance(stco, Co64Box) or len(offsets[cm]) == 0:
+                continue
+            if max(offsets[cm]) + mdat_offset < 2 ** 32:
+                continue
+            sample_table.chunk_offset = Co64Box(
+                box_type="co64",
+                version=stco.version,
+                flags=stco.flags,
+                number_of_entries=stco.number_of_entries
+            )
+            promoted = True
+        return promoted
 
     # def __make_chunks(self, codec, data: np.ndarray, sample_delta) -> list[ChunkData]:
     #     encoder = get_encoder(codec)
@@ -204,5 +428,9 @@ class Composer:
 
 
     def write(self, path: str):
+        mdat = self.flav_mp4.mdat
+        if mdat.chunks is not None and mdat.source_path is not None \
+                and os.path.exists(path) and os.path.samefile(path, mdat.source_path):
+            raise Exception("streaming compose cannot overwrite its source file")
         with open(path, "wb") as f:
             self.flav_mp4.parsed.write(f)
@@ -0,0 +1,209 @@
+import copy
+from typing import BinaryIO, Literal
+
+import numpy as np
+
+from flavtool.analyzer.media_data import SampleData, StreamingSampleData, MediaData
+from flavtool.composer.utils.sample_table_creator import SampleTableCreator
+from flavtool.parser.boxs.container import ContainerBox
+from flavtool.parser.boxs.leaf import *
+from flavtool.parser.range_writer import RangeWriter
+from flavtool.tracer import tracer
+
+media_types = Literal["tast", "soun", "vide", "scnt"]
+
+
+class FragmentWriter:
+    """
+    フラグメント化されたMP4 (ftyp + moov + (moof + mdat)* + mfra) を逐次書き出す
+        サンプルはフラグメントごとにファイルへ書き出すので、メモリに載るのは書き込み中のフラグメントだけになる
+    """
+
+    def __init__(self, path: str, init_box: ContainerBox, write_mfra: bool = True):
+        """
+        ftypとmoov(初期化セグメント)を書き出す
+        Parameters
+        ----------
+        path : str
+            出力先
+        init_box : ContainerBox
+            ftyp, moovを含むルートBox(FlavMP4.parsed や EmptyMp4Creator で作ったもの)。
+            moovはフラグメント用に書き換えた複製(サンプルテーブルを空にし、mvexを追加する)を出力し、init_box 自体は変更しない。
+            mdat, moof, mfraは出力されない
+        write_mfra : bool
+            close() 時に、ランダムアクセス用のmfraを書き出すか
+        """
+        self.f: BinaryIO = open(path, "wb")
+        self.write_mfra = write_mfra
+        self.sequence_number = 0
+        self.track_ids: dict[media_types, int] = {}
+        self.time_scales: dict[media_types, int] = {}
+        # トラックごとの次のフラグメントの開始時間(メディアのタイムスケール)
+        self.decode_times: dict[int, int] = {}
+        # トラックごとの (time, moof_offset, traf_number, trun_number, sample_number)
+        self.random_access: dict[int, list[tuple[int, int, int, int, int]]] = {}
+        self.__write_init_segment(init_box)
+
+    def __write_init_segment(self, init_box: ContainerBox):
+        source_moov = init_box["moov"]
+        if source_moov is None:
+            raise Exception("moov is required for fragmented mp4")
+        # 呼び出し元のツリー(FlavMP4 のサンプルテーブル等)は変えず、複製したmoovを書き換える
+        # (親はたどらないので、ルートやmdatは複製しない)
+        moov: ContainerBox = copy.deepcopy(source_moov, {id(source_moov.parent): None})
+
+        tracks = moov.get_children("trak")
+        # trafはtrack_idでトラックを指すので、未設定(0)や重複しているIDは振り直す
+        next_id = max([track["tkhd"].track_id for track in tracks], default=0) + 1
+        used_ids = set()
+        for track in tracks:
+            tkhd: TkhdBox = track["tkhd"]
+            if tkhd.track_id == 0 or tkhd.track_id in used_ids:
+                tkhd.track_id = next_id
+                next_id += 1
+            used_ids.add(tkhd.track_id)
+            mdhd: MdhdBox = track["mdia"]["mdhd"]
+            subtype = track["mdia"]["hdlr"].component_subtype
+            self.track_ids[subtype] = tkhd.track_id
+            self.time_scales[subtype] = mdhd.time_scale
+            self.decode_times[tkhd.track_id] = 0
+            self.random_access[tkhd.track_id] = []
+
+            # サンプルはすべてmoofに入るので、moovのサンプルテーブルと長さは空にする
+            SampleTableCreator([], codec=None).replace_table_boxes(track["mdia"]["minf"]["stbl"])
+            tkhd.duration = 0
+            mdhd.duration = 0
+
+        mvhd: MvhdBox = moov["mvhd"]
+        mvhd.duration = 0
+        mvhd.next_track_id = next_id.to_bytes(4, "big")
+
+        old_mvex = moov["mvex"]
+        if old_mvex is not None:
+            moov.children.remove(old_mvex)
+        mvex = ContainerBox("mvex", children=[TrexBox("trex", track_id=track_id) for track_id in sorted(used_ids)])
+        moov.children.append(mvex)
+
+        tracer.tree(moov)
+        for box in init_box.children:
+            if box.box_type in ("mdat", "moof", "mfra"):
+                continue
+            if box is source_moov:
+                box = moov
+            if isinstance(box, LeafBox) and not box.is_loaded:
+                box.write_raw(self.f)
+            else:
+                box.write(self.f)
+
+    def write_fragment(self, samples: dict[media_types, list[SampleData]], source: BinaryIO | None = None):
+        """
+        1つのフラグメント(moof + mdat)を書き出す
+        Parameters
+        ----------
+        samples : dict[media_types, list[SampleData]]
+            トラックごとのこのフラグメントのサンプル(時間順)
+        source : BinaryIO | None
+            StreamingSampleData の読み込み元ファイル
+        """
+        samples = {mt: s for mt, s in samples.items() if len(s) > 0}
+        if len(samples) == 0:
+            return
+        self.sequence_number += 1
+        moof = ContainerBox("moof", children=[MfhdBox("mfhd", sequence_number=self.sequence_number)])
+        truns: list[TrunBox] = []
+        for mt, track_samples in samples.items():
+            if mt not in self.track_ids:
+                raise Exception(f"track {mt} is not in moov")
+            track_id = self.track_ids[mt]
+            entries = np.zeros(len(track_samples), dtype=TrunBox.entries_dtype(0x000300, b'\x00'))
+            entries["sample_duration"] = [s.delta for s in track_samples]
+            entries["sample_size"] = [len(s) for s in track_samples]
+            trun = TrunBox("trun", data_offset=0, entries=entries)
+            truns.append(trun)
+            moof.children.append(ContainerBox("traf", children=[
+                TfhdBox("tfhd", flags=TfhdBox.default_base_is_moof.to_bytes(3, "big"), track_id=track_id),
+                TfdtBox("tfdt", base_media_decode_time=self.decode_times[track_id]),
+                trun,
+            ]))
+
+        moof_offset = self.f.tell()
+        data_size = sum(len(s) for track_samples in samples.values() for s in track_samples)
+        mdat_size = moof.get_overall_size(data_size)
+        # data_offsetはmoofの先頭からの、そのトラックの最初のサンプルの位置
+        data_offset = moof.get_size() + (mdat_size - data_size)
+        for trun, track_samples in zip(truns, samples.values()):
+            trun.data_offset = data_offset
+            data_offset += int(trun.entries["sample_size"].sum())
+
+        for traf_number, (mt, track_samples) in enumerate(samples.items(), start=1):
+            track_id = self.track_ids[mt]
+            self.random_access[track_id].append((self.decode_times[track_id], moof_offset, traf_number, 1, 1))
+            self.decode_times[track_id] += sum(s.delta for s in track_samples)
+
+        moof.write(self.f)
+        moof.write_type_and_size(self.f, "mdat", mdat_size)
+        writer = RangeWriter(self.f, source)
+        for track_samples in samples.values():
+            for sample in track_samples:
+                if isinstance(sample, StreamingSampleData):
+                    writer.copy(sample.start, sample.length)
+                else:
+                    writer.write(sample.data)
+        writer.flush()
+        tracer.tree(moof)
+
+    def write_media_datas(self, media_datas: dict[media_types, MediaData | None], fragment_duration: float = 1.0,
+                          source: BinaryIO | None = None):
+        """
+        すべてのサンプルを、fragment_duration 秒ごとのフラグメントに分けて書き出す
+        Parameters
+        ----------
+        media_datas : dict[media_types, MediaData | None]
+            トラックごとのメディアデータ(FlavMP4.media_datas など)
+        fragment_duration : float
+            1フラグメントの長さ(秒)
+        source : BinaryIO | None
+            StreamingSampleData の読み込み元ファイル
+        """
+        iterators = {}
+        for mt, media_data in media_datas.items():
+            if media_data is None or mt not in self.track_ids:
+                continue
+            # サンプルはチャンクごとに必要になった時点で作る(トラック全体のサンプルのリストは作らない)
+            iterators[mt] = (s for chunk in media_data.data for s in chunk.iter_samples())
+        pending: dict[media_types, SampleData | None] = {mt: next(it, None) for mt, it in iterators.items()}
+        times = {mt: 0 for mt in iterators}
+        fragment_end = fragment_duration
+        while any(sample is not None for sample in pending.values()):
+            samples: dict[media_types, list[SampleData]] = {mt: [] for mt in iterators}
+            for mt, it in iterators.items():
+                time_scale = self.time_scales[mt]
+                while pending[mt] is not None and times[mt] / time_scale < fragment_end:
+                    samples[mt].append(pending[mt])
+                    times[mt] += pending[mt].delta
+                    pending[mt] = next(it, None)
+            self.write_fragment(samples, source)
+            fragment_end += fragment_duration
+
+    def close(self):
+        """
+        mfraを書き出してファイルを閉じる
+        """
+        if self.f.closed:
+            return
+        if self.write_mfra:
+            mfra = ContainerBox("mfra", children=[
+                TfraBox("tfra", track_id=track_id, entries=entries)
+                for track_id, entries in self.random_access.items() if len(entries) > 0
+            ])
+            mfro = MfroBox("mfro")
+            mfra.children.append(mfro)
+            mfro.size = mfra.get_size()
+            mfra.write(self.f)
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -1,3 +1,5 @@
 from .sample_table_creator import SampleTableCreator
 from .empty_mp4_creator import EmptyMp4Creator
-from .track_box_creator import TrackBoxCreator
\ No newline at end of file
+from .track_box_creator import TrackBoxCreator
+from .synthetic_mp4_creator import SyntheticMp4Creator
+from .chunking_policy import ChunkingPolicy
@@ -0,0 +1,124 @@
+import numpy as np
+
+from flavtool.analyzer.media_data import ChunkData, SlicedChunk
+
+
+class ChunkingPolicy:
+    """
+    トラックのサンプルをチャンクに分け直す方針
+        チャンクの長さ・バイト数・サンプル数のうち指定した上限のいずれかを超える手前でチャンクを区切る
+        (1サンプルで上限を超える場合はそのサンプルだけのチャンクになる)。サンプル記述が変わる位置でも区切る
+
+    >>> ChunkingPolicy(duration=0.5)              # 0.5秒ごと
+    >>> ChunkingPolicy(size=1024 * 1024, samples=100)  # 1MiB か 100サンプルまで
+    """
+
+    def __init__(self, duration: float | None = None, size: int | None = None, samples: int | None = None):
+        """
+        Parameters
+        ----------
+        duration : float | None
+            1チャンクの長さの上限(秒)
+        size : int | None
+            1チャンクのバイト数の上限
+        samples : int | None
+            1チャンクのサンプル数の上限
+        """
+        if duration is None and size is None and samples is None:
+            raise Exception("at least one of duration, size and samples is required")
+        self.duration = duration
+        self.size = size
+        self.samples = samples
+
+    def __repr__(self):
+        limits = [f"{name}={value}" for name, value in
+                  (("duration", self.duration), ("size", self.size), ("samples", self.samples)) if value is not None]
+        return f"ChunkingPolicy({', '.join(limits)})"
+
+    def boundaries(self, deltas: np.ndarray, sizes: np.ndarray, descriptions: np.ndarray,
+                   time_scale: int | None = None) -> np.ndarray:
+        """
+        各チャンクの最初のサンプルの番号を求める
+        Parameters
+        ----------
+        deltas, sizes, descriptions : np.ndarray
+            サンプルごとの長さ(メディアのタイムスケール)、バイト数、サンプル記述の番号
+        time_scale : int | None
+            メディアのタイムスケール(duration を指定した場合は必要)
+        Returns
+        -------
+        starts : np.ndarray
+            チャンクの最初のサンプルの番号に、最後にサンプル数を加えたもの(チャンク数+1 個)
+        """
+        if self.duration is not None and time_scale is None:
+            raise Exception("time_scale is required to chunk by duration")
+        n = len(sizes)
+        time_sums = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(deltas, out=time_sums[1:])
+        size_sums = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(sizes, out=size_sums[1:])
+        # サンプル記述が変わる位置では必ず区切る
+        forced = np.flatnonzero(descriptions[1:] != descriptions[:-1]) + 1
+
+        # チャンクごとに、上限に収まる最後の位置を累積和の二分探索で求める
+        starts = [0]
+        i = 0
+        while i < n:
+            end = n
+            if self.duration is not None:
+                limit = time_sums[i] + self.duration * time_scale
+                end = min(end, int(np.searchsorted(time_sums, limit, side="right")) - 1)
+            if self.size is not None:
+                end = min(end, int(np.searchsorted(size_sums, size_sums[i] + self.size, side="right")) - 1)
+            if self.samples is not None:
+                end = min(end, i + self.samples)
+            k = int(np.searchsorted(forced, i, side="right"))
+            if k < len(forced):
+                end = min(end, int(forced[k]))
+            i = max(end, i + 1)
+            starts.append(i)
+        return np.array(starts, dtype=np.int64)
+
+    def rechunk(self, chunks: list[ChunkData], time_scale: int | None = None) -> list[ChunkData]:
+        """
+        チャンクのサンプルを、この方針のチャンクに分け直す(サンプルの順番と中身は変わらない)
+        Parameters
+        ----------
+        chunks : list[ChunkData]
+            1トラックのチャンク
+        time_scale : int | None
+            メディアのタイムスケール(duration を指定した場合は必要)
+        """
+        if len(chunks) == 0:
+            return []
+        # 長さ・サイズはサンプルを作らずに求める(パースしたトラックではサンプルテーブルの列から)
+        arrays = [c.sample_arrays() for c in chunks]
+        deltas = np.concatenate([chunk_deltas for chunk_deltas, _ in arrays])
+        sizes = np.concatenate([chunk_sizes for _, chunk_sizes in arrays])
+        descriptions = np.repeat(np.array([c.sample_description for c in chunks], dtype=np.int64),
+                                 [len(chunk_deltas) for chunk_deltas, _ in arrays])
+        starts = self.boundaries(deltas, sizes, descriptions, time_scale)
+
+        # 新しいチャンクは元のチャンクの範囲を参照するだけで、サンプルは作らない
+        source_starts = np.zeros(len(chunks) + 1, dtype=np.int64)
+        np.cumsum([len(chunk_sizes) for _, chunk_sizes in arrays], out=source_starts[1:])
+        begin_times = np.zeros(len(sizes) + 1, dtype=np.int64)
+        np.cumsum(deltas, out=begin_times[1:])
+        begin_times += chunks[0].begin_time
+        media_type = chunks[0].media_type
+        source_starts = source_starts.tolist()
+        rechunked = []
+        source_i = 0
+        for begin, end in zip(starts[:-1].tolist(), starts[1:].tolist()):
+            pieces = []
+            while source_starts[source_i + 1] <= begin:
+                source_i += 1
+            i = source_i
+            while source_starts[i] < end:
+                piece_begin = max(begin, source_starts[i]) - source_starts[i]
+                piece_end = min(end, source_starts[i + 1]) - source_starts[i]
+                if piece_begin < piece_end:
+                    pieces.append((chunks[i], piece_begin, piece_end))
+                i += 1
+            rechunked.append(SlicedChunk(pieces, media_type, int(descriptions[begin]), int(begin_times[begin])))
+        return rechunked
@@ -1,5 +1,6 @@
 from flavtool.parser.boxs.container import ContainerBox
 from flavtool.parser.boxs.leaf import *
+from flavtool.tracer import tracer
 
 
 class EmptyMp4Creator:
@@ -45,6 +46,6 @@ class EmptyMp4Creator:
 
             ]
         )
-        track_box.print()
+        tracer.tree(track_box)
         return track_box
 
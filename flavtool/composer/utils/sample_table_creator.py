@@ -1,7 +1,10 @@
+import numpy as np
+
 from flavtool.analyzer.media_data import ChunkData
 from flavtool.parser.boxs.container import ContainerBox
 from flavtool.parser.boxs.leaf import *
 from flavtool.codec.codec_options import CodecOption, MixCodecOption
+from .chunking_policy import ChunkingPolicy
 
 
 class SampleTableCreator:
@@ -9,7 +12,8 @@ class SampleTableCreator:
     サンプルテーブルを作るクラス
     """
 
-    def __init__(self, chunks: list[ChunkData], codec: str, codec_option: CodecOption=None):
+    def __init__(self, chunks: list[ChunkData], codec: str, codec_option: CodecOption=None,
+                 chunking: ChunkingPolicy | None = None, time_scale: int | None = None):
         """
         サンプルテーブルを作るクラス
 
@@ -19,9 +23,14 @@ class SampleTableCreator:
             対象のチャンクデータ
         codec : str
             コーデック
+        chunking : ChunkingPolicy | None
+            指定すると、chunks のサンプルをこの方針でチャンクに分け直してからテーブルを作る(self.chunks が分け直したもの)
+        time_scale : int | None
+            メディアのタイムスケール(chunking で長さを指定した場合に必要)
         """
 
-
+        if chunking is not None:
+            chunks = chunking.rechunk(chunks, time_scale)
         self.chunks = chunks
         self.codec = codec
         self.codec_option = codec_option
@@ -31,6 +40,7 @@ class SampleTableCreator:
     def __make_sample_to_chunk_table(self) -> list[SampleToChunk]:
         """
         SampleToChunkテーブル(どのサンプルがどのチャンクに属するか)を作成する
+        サンプル数とサンプル記述が前のチャンクと同じチャンクはエントリを作らない(最小のランレングス)
 
         Returns
         ----------
@@ -39,55 +49,48 @@ class SampleTableCreator:
 
         """
         sample_to_chunk_table: list[SampleToChunk] = []
-        pre_sample_per_chunk = -1
+        pre_entry = None
         for i, c in enumerate(self.chunks, start=1):
-            if len(c.samples) != pre_sample_per_chunk:
-                sample_to_chunk_table.append(SampleToChunk(i, len(c.samples), c.sample_description))
-                pre_sample_per_chunk = len(c.samples)
+            entry = (len(c), c.sample_description)
+            if entry != pre_entry:
+                sample_to_chunk_table.append(SampleToChunk(i, *entry))
+                pre_entry = entry
         return sample_to_chunk_table
 
-    def __get_sample_size(self) -> tuple[int, list[int]]:
+    def __get_sample_size(self) -> tuple[int, np.ndarray]:
         """
         サンプルサイズを計算し、サンプルサイズテーブルを返す
         Returns
         -------
-        sample_size: tuple[int, list[int]]
+        sample_size: tuple[int, np.ndarray]
             すべて同じサイズなら、(サイズ、空配列), 異なるサイズなら(0、サイズの配列)を返します
         """
-        sizes = [len(self.chunks[0][0].data)]
-        first = True
-        all_same = True
-        for c in self.chunks:
-            for s in c.samples:
-                if not first:
-                    size = len(s.data)
-                    if size != sizes[-1]:
-                        all_same = False
-                    sizes.append(size)
-                first = False
-
-        if all_same:
-            return sizes[0], []
-        else:
+        # サンプルを作らずに、チャンクの配列から求める
+        sizes = self.__concat_arrays(1)
+        if len(sizes) == 0:
             return 0, sizes
+        if (sizes == sizes[0]).all():
+            return int(sizes[0]), sizes[:0]
+        return 0, sizes
 
     def __make_time_to_sample_table(self) -> list[TimeToSample]:
-        deltas = [self.chunks[0][0].delta]
-        table: list[TimeToSample] = [
-            TimeToSample(1, deltas[0])
-        ]
-        first = True
-        for c in self.chunks:
-            for s in c.samples:
-                if not first:
-                    delta = s.delta
-                    if delta != table[-1].sample_delta:
-                        table.append(TimeToSample(1, delta))
-                    else:
-                        table[-1].sample_count += 1
-                    deltas.append(delta)
-                first = False
-        return table
+        deltas = self.__concat_arrays(0)
+        if len(deltas) == 0:
+            return []
+        # 同じ長さが続く区間ごとに1エントリ
+        run_starts = np.concatenate(([0], np.flatnonzero(deltas[1:] != deltas[:-1]) + 1))
+        run_counts = np.diff(np.append(run_starts, len(deltas)))
+        return [TimeToSample(count, delta)
+                for count, delta in zip(run_counts.tolist(), deltas[run_starts].tolist())]
+
+    def __concat_arrays(self, column: int) -> np.ndarray:
+        """
+        全チャンクの sample_arrays() の column 列目(0: 長さ, 1: バイト数)をつないだ配列
+        """
+        arrays = [c.sample_arrays()[column] for c in self.chunks]
+        if len(arrays) == 0:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate(arrays).astype(np.int64, copy=False)
 
     def __make_sample_description_table(self) -> StsdBox:
         option = None
@@ -112,6 +115,59 @@ class SampleTableCreator:
             ],
         )
 
+    def make_table_boxes(self) -> list[LeafBox]:
+        """
+        stsd以外のサンプルテーブル(stts, stsc, stsz, stco)を作成する(Stcoの中身を除く)
+        既存のトラックのサンプルテーブルを作り直すときに使う
+        Returns
+        -------
+        boxes : list[LeafBox]
+            stts, stsc, stsz, stco の順のリスト
+        """
+        sample_to_chunk_table = self.__make_sample_to_chunk_table()
+        sample_size, sample_size_table = self.__get_sample_size()
+        time_to_sample = self.__make_time_to_sample_table()
+        return [
+            SttsBox(
+                box_type="stts",
+                number_of_entries=len(time_to_sample),
+                time_to_sample_table=time_to_sample
+            ),
+            StscBox(
+                box_type="stsc",
+                number_of_entries=len(sample_to_chunk_table),
+                sample_to_chunk_table=sample_to_chunk_table
+            ),
+            StszBox(
+                box_type="stsz",
+                sample_size=sample_size,
+                number_of_entries=sum(len(c) for c in self.chunks),
+                sample_size_table=sample_size_table
+            ),
+            StcoBox(
+                box_type="stco",
+                number_of_entries=len(self.chunks)
+            )
+        ]
+
+    def replace_table_boxes(self, stbl: ContainerBox):
+        """
+        既存のサンプルテーブル stbl の stts, stsc, stsz, stco を make_table_boxes で作ったものに置き換える
+        (co64 は stco に置き換わるので取り除く。stsd などそれ以外のBoxはそのまま)
+        Parameters
+        ----------
+        stbl : ContainerBox
+            置き換えるサンプルテーブル(Container Box-Stbl)
+        """
+        for box in stbl.get_children("co64"):
+            stbl.children.remove(box)
+        for box in self.make_table_boxes():
+            old_box = stbl[box.box_type]
+            if old_box is None:
+                stbl.children.append(box)
+            else:
+                stbl.children[stbl.children.index(old_box)] = box
+
     def make_sample_table(self) -> ContainerBox:
         """
         サンプルテーブルを作成する(Stcoの中身を除く)
@@ -121,34 +177,8 @@ class SampleTableCreator:
             サンプルテーブル(Container Box-Stbl)
 
         """
-
-        sample_to_chunk_table = self.__make_sample_to_chunk_table()
-        sample_size, sample_size_table = self.__get_sample_size()
-        time_to_sample = self.__make_time_to_sample_table()
         sample_table = ContainerBox(
             box_type="stbl",
-            children=[
-                self.__make_sample_description_table(),
-                SttsBox(
-                    box_type="stts",
-                    number_of_entries=len(time_to_sample),
-                    time_to_sample_table=self.__make_time_to_sample_table()
-                ),
-                StscBox(
-                    box_type="stsc",
-                    number_of_entries=len(sample_to_chunk_table),
-                    sample_to_chunk_table=sample_to_chunk_table
-                ),
-                StszBox(
-                    box_type="stsz",
-                    sample_size=sample_size,
-                    number_of_entries=len(sample_size_table),
-                    sample_size_table=sample_size_table
-                ),
-                StcoBox(
-                    box_type="stco",
-                    number_of_entries=len(self.chunks)
-                )
-            ]
+            children=[self.__make_sample_description_table()] + self.make_table_boxes()
         )
         return sample_table
@@ -0,0 +1,97 @@
+import numpy as np
+
+from flavtool.analyzer import FlavMP4
+from flavtool.analyzer.components import TrackComponent
+from flavtool.analyzer.media_data import MediaData, ChunkData, SampleData
+from flavtool.codec import encode_batch
+from .empty_mp4_creator import EmptyMp4Creator
+from .sample_table_creator import SampleTableCreator
+from .track_box_creator import TrackBoxCreator
+
+
+class SyntheticMp4Creator:
+    """
+    外部のファイルを使わずに、指定した長さ・トラック構成のFlavMP4を作るクラス(ベンチマーク・動作確認用)
+    映像・音声のサンプルは乱数のバイト列、味・香りのサンプルは raw5 でエンコードした乱数になる
+    """
+    codecs = {"vide": "avc1", "soun": "mp4a", "tast": "raw5", "scnt": "raw5"}
+
+    def __init__(self, duration: float, sample_rates: dict[str, float] = None, samples_per_chunk: int = 10,
+                 sample_sizes: dict[str, int] = None, seed: int = 0):
+        """
+        Parameters
+        ----------
+        duration : float
+            長さ(秒)
+        sample_rates : dict[str, float]
+            トラック(vide, soun, tast, scnt)ごとの1秒あたりのサンプル数。指定したトラックだけが作られる
+        samples_per_chunk : int
+            1チャンクあたりのサンプル数
+        sample_sizes : dict[str, int]
+            映像・音声のサンプルの平均サイズ(バイト)。実際のサイズは ±25% の範囲でばらつく
+        seed : int
+            乱数のシード
+        """
+        self.duration = duration
+        self.sample_rates = {"vide": 30, "tast": 10} if sample_rates is None else sample_rates
+        self.samples_per_chunk = samples_per_chunk
+        self.sample_sizes = {"vide": 2000, "soun": 400} if sample_sizes is None else sample_sizes
+        self.seed = seed
+
+    def __make_samples(self, rng: np.random.Generator, media_type: str, n: int) -> list[bytes]:
+        if self.codecs[media_type] == "raw5":
+            codes, sizes = encode_batch("raw5", rng.integers(0, 256, size=(n, 5), dtype=np.uint8))
+        else:
+            base = self.sample_sizes.get(media_type, 1000)
+            sizes = rng.integers(base - base // 4, base + base // 4 + 1, size=n)
+            codes = rng.bytes(int(sizes.sum()))
+        ends = np.cumsum(sizes).tolist()
+        return [codes[begin:end] for begin, end in zip([0] + ends[:-1], ends)]
+
+    def __make_track(self, rng: np.random.Generator, media_type: str, sample_rate: float,
+                     mov_time_scale: int) -> tuple[TrackComponent, MediaData]:
+        # 1サンプル = 1000 (メディアのタイムスケールを sample_rate * 1000 にする)
+        sample_delta = 1000
+        media_time_scale = int(round(sample_rate * sample_delta))
+        n = int(self.duration * sample_rate)
+        chunks: list[ChunkData] = []
+        samples = self.__make_samples(rng, media_type, n)
+        for begin in range(0, n, self.samples_per_chunk):
+            chunk_samples = [SampleData(data, sample_delta) for data in samples[begin:begin + self.samples_per_chunk]]
+            chunks.append(ChunkData(chunk_samples, media_type, begin_time=begin * sample_delta))
+
+        sample_table = SampleTableCreator(chunks, codec=self.codecs[media_type]).make_sample_table()
+        track_box = TrackBoxCreator(
+            track_duration=int(n * sample_delta * mov_time_scale / media_time_scale),
+            media_time_scale=media_time_scale,
+            media_duration=n * sample_delta,
+            component_subtype=media_type,
+            component_name="synthetic",
+            sample_table=sample_table
+        ).create()
+        return TrackComponent(track_box), MediaData(media_type, chunks)
+
+    def create(self) -> FlavMP4:
+        """
+        トラックを追加して再構成済みのFlavMP4を作成する
+        """
+        # 循環importを避けるためここでimportする
+        from flavtool.composer import Composer
+
+        mov_time_scale = 1000
+        rng = np.random.default_rng(self.seed)
+        root = EmptyMp4Creator.create("mp42", ["mp42", "isom"], mov_time_scale, int(self.duration * mov_time_scale))
+        flav_mp4 = FlavMP4(root)
+        composer = Composer(flav_mp4)
+        for media_type, sample_rate in self.sample_rates.items():
+            track, media_data = self.__make_track(rng, media_type, sample_rate, mov_time_scale)
+            composer.set_new_modal(media_type, track, media_data)
+        composer.compose()
+        return flav_mp4
+
+    def write(self, path: str):
+        """
+        作成したFlavMP4をファイルに書き出す
+        """
+        with open(path, "wb") as f:
+            self.create().parsed.write(f)
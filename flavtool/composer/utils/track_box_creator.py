@@ -1,5 +1,6 @@
 from flavtool.parser.boxs.container import ContainerBox
 from flavtool.parser.boxs.leaf import *
+from flavtool.tracer import tracer
 
 
 class TrackBoxCreator:
@@ -112,6 +113,6 @@ class TrackBoxCreator:
                 )
             ]
         )
-        track_box.print()
+        tracer.tree(track_box)
         return track_box
 
@@ -1,2 +1,2 @@
 from ._parser import Parser
-
+from .boxs.box import register_box, box_registry
@@ -1,5 +1,7 @@
 import os
 from flavtool.parser.boxs.container import ContainerBox
+from flavtool.parser.boxs.box import Box
+from flavtool.parser.boxs.leaf import FreeBox
 from typing import BinaryIO
 import io
 class Parser :
@@ -11,19 +13,107 @@ class Parser :
         if isinstance(fp, io.BufferedIOBase):
             self.f = fp
 
-    def parse(self, read_mdat_bytes=True):
+    def parse(self, read_mdat_bytes=True, use_mmap=False, lazy=False):
+        """
+        MP4ファイルをパースする
+        Parameters
+        ----------
+        read_mdat_bytes : bool
+            mdatの中身を読み込むか
+        use_mmap : bool
+            read_mdat_bytes=True のとき、mdatをコピーせずmmap上のmemoryviewとして保持する。
+            mmapはパース結果(MdatBox)が保持し、ツリーと同じ寿命になる
+        lazy : bool
+            LeafBoxは位置とサイズ、本体のバイト列だけを記録し、最初に属性へアクセスされたときにデコードする。
+            一度もアクセスされなかったBoxは、書き出し時に元のバイト列がそのまま使われる
+        """
         if self.f is  None:
             with open(self.path, "rb") as f:
-                self.parsed_box = ContainerBox("root").parse(f, self.size, read_mdat_bytes)
+                self.parsed_box = ContainerBox("root").parse(f, self.size, read_mdat_bytes, use_mmap, lazy)
         else:
-            self.parsed_box = ContainerBox("root").parse(self.f, self.size, read_mdat_bytes)
+            self.parsed_box = ContainerBox("root").parse(self.f, self.size, read_mdat_bytes, use_mmap, lazy)
         return self.parsed_box
 
+    def scan(self) -> list[tuple[str, int, int]]:
+        """
+        トップレベルのBoxをヘッダだけ読んで辿り、(box_type, offset, size) のリストを返す
+        """
+        with open(self.path, "rb", buffering=0) as f:
+            return [(box_type, offset, box_size) for box_type, offset, box_size, _ in self.__hop(f)]
+
+    def probe(self, lazy=False):
+        """
+        メタデータだけを読んでFlavMP4を作る。トップレベルのBoxはヘッダだけで辿り、
+        mdat, free, skip 以外のBox(moov等)はそれぞれ1回の読み込みでメモリに読んでからパースする。
+        free, skip は本体を読まずにサイズだけを記録する(書き出すと0で埋められる)。
+        mdatの中身は読まないので、サンプルは StreamingSampleData になる(read_mdat_bytes=False と同じ)
+        Parameters
+        ----------
+        lazy : bool
+            parse() の lazy と同じ
+        Returns
+        -------
+        flav_mp4 : FlavMP4
+        """
+        # 循環importを避けるためここでimportする
+        from flavtool.analyzer import analyze
+
+        root = ContainerBox("root")
+        with open(self.path, "rb", buffering=0) as f:
+            for box_type, offset, box_size, header in self.__hop(f):
+                if box_type in ("free", "skip"):
+                    # 空き領域(追記で古いmoovを置き換えたもの等)は本体を読まず、サイズだけを記録する
+                    box = FreeBox(box_type, read_bytes=False)
+                    box.parse(_OffsetBuffer(header, offset, self.path), box_size - len(header))
+                    root.children.append(box)
+                    continue
+                if box_type == "mdat":
+                    # ヘッダだけを渡し、本体は読まずに位置とサイズを記録させる
+                    body = header
+                else:
+                    f.seek(offset)
+                    body = f.read(box_size)
+                root.parse(_OffsetBuffer(body, offset, self.path), box_size, read_mdat_bytes=False, lazy=lazy)
+        self.parsed_box = root
+        return analyze(root)
+
+    def __hop(self, f: BinaryIO):
+        """
+        トップレベルのBoxを順に (box_type, offset, size, ヘッダのバイト列) で返す
+        """
+        offset = 0
+        while offset + 8 <= self.size:
+            f.seek(offset)
+            header = f.read(16)
+            box_type, box_size, body_size, is_extended = Box.get_type_and_size(io.BytesIO(header))
+            if box_size == 0:
+                # size 0 はファイル末尾まで続くBox
+                box_size = self.size - offset
+            if box_size < 8:
+                raise Exception(f"invalid box size {box_size} at {offset}")
+            yield box_type, offset, box_size, header[:16 if is_extended else 8]
+            offset += box_size
+
     def write(self, path:str):
         with open(path, "wb") as f:
             self.parsed_box.write(f)
 
 
+class _OffsetBuffer(io.BytesIO):
+    """
+    ファイルの一部を読み込んだバッファ。tell/seek はファイル上の位置で扱うので、
+    パース結果に記録されるオフセット(mdatの位置、moofの位置等)がファイル上の位置になる
+    """
 
+    def __init__(self, data: bytes, base: int, name: str):
+        super().__init__(data)
+        self.base = base
+        self.name = name
 
+    def tell(self) -> int:
+        return super().tell() + self.base
 
+    def seek(self, pos: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            pos -= self.base
+        return super().seek(pos, whence) + self.base
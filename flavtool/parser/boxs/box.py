@@ -1,8 +1,19 @@
-from typing import BinaryIO
+import io
+import struct
+from typing import BinaryIO, Callable
 
+import numpy as np
+
+# バイト数ごとの符号なし整数(ビッグエンディアン)のStruct
+int_structs = {1: struct.Struct(">B"), 2: struct.Struct(">H"), 4: struct.Struct(">I"), 8: struct.Struct(">Q")}
+box_header = struct.Struct(">I4s")
+extended_box_header = struct.Struct(">I4sQ")
 
 
 class Mp4Component:
+    # スロットを持つサブクラス(テーブルのエントリ等)が __dict__ を持たないように空にしておく
+    __slots__ = ()
+
     def __init__(self):
         pass
 
@@ -13,12 +24,30 @@ class Mp4Component:
     def write(self, f: BinaryIO):
         raise NotImplemented
 
+    def pack_into(self, buffer: bytearray, offset: int) -> int:
+        """
+        buffer の offset の位置に書き込み、書き込んだ末尾の位置を返す
+        独自の pack_into を持たないコンポーネントは、write() の結果をコピーする
+        """
+        data = io.BytesIO()
+        self.write(data)
+        return self.pack_bytes(buffer, offset, data.getbuffer())
+
     def read_ascii(self, f, n):
         return f.read(n).decode("ascii")
 
     def read_int(self, f, n):
         return int.from_bytes(f.read(n), byteorder='big')
 
+    def read_array(self, f, dtype, n) -> np.ndarray:
+        """
+        n個の要素を一度の読み込みで配列として読む(書き込み可能な配列を返す)
+        """
+        dtype = np.dtype(dtype)
+        buffer = bytearray(dtype.itemsize * n)
+        f.readinto(buffer)
+        return np.frombuffer(buffer, dtype=dtype)
+
     def print_with_indent(self, word, depth):
         for d in range(depth):
             print("\t", end="")
@@ -38,17 +67,19 @@ class Mp4Component:
 
         return decimal_value
 
-    def write_fixed_float32(self, f, float_value):
+    @staticmethod
+    def fixed_float32_bits(float_value) -> int:
         # 整数部と小数部に分ける
         integer_part = int(float_value)
         fraction_part = float_value - integer_part
 
         # 小数部分を2^16倍して16ビットの固定小数点に変換
         fraction_part_fixed = round(fraction_part * (2 ** 16))
+        return ((integer_part & 0xFFFF) << 16) | (fraction_part_fixed & 0xFFFF)
 
+    def write_fixed_float32(self, f, float_value):
         # 4バイトのバイト列に変換
-        fixed_point_bytes = ((integer_part & 0xFFFF) << 16) | (fraction_part_fixed & 0xFFFF)
-        byte_array = fixed_point_bytes.to_bytes(4, byteorder='big')
+        byte_array = self.fixed_float32_bits(float_value).to_bytes(4, byteorder='big')
 
         # BinaryIOに書き込む
         f.write(byte_array)
@@ -65,17 +96,19 @@ class Mp4Component:
 
         return decimal_value
 
-    def write_fixed_float16(self, f, float_value):
+    @staticmethod
+    def fixed_float16_bits(float_value) -> int:
         # 整数部と小数部に分ける
         integer_part = int(float_value)
         fraction_part = float_value - integer_part
 
         # 小数部分を2^8倍して8ビットの固定小数点に変換
         fraction_part_fixed = round(fraction_part * (2 ** 8))
+        return ((integer_part & 0xFF) << 8) | (fraction_part_fixed & 0xFF)
 
+    def write_fixed_float16(self, f, float_value):
         # 2バイトのバイト列に変換
-        fixed_point_bytes = ((integer_part & 0xFF) << 8) | (fraction_part_fixed & 0xFF)
-        byte_array = fixed_point_bytes.to_bytes(2, byteorder='big')
+        byte_array = self.fixed_float16_bits(float_value).to_bytes(2, byteorder='big')
 
         # BinaryIOに書き込む
         f.write(byte_array)
@@ -86,12 +119,280 @@ class Mp4Component:
     def write_ascii(self, f: BinaryIO, s: str):
         f.write(s.encode("ascii"))
 
+    def pack_int(self, buffer: bytearray, offset: int, n: int, length=4) -> int:
+        if length in int_structs:
+            int_structs[length].pack_into(buffer, offset, n)
+            return offset + length
+        return self.pack_bytes(buffer, offset, n.to_bytes(length, 'big'))
+
+    def pack_bytes(self, buffer: bytearray, offset: int, data) -> int:
+        """
+        bytes や配列をそのままコピーする(長さが合わない場合は例外になり、buffer の長さは変わらない)
+        """
+        if isinstance(data, EntryTable):
+            data = data.array
+        if isinstance(data, np.ndarray):
+            data = np.ascontiguousarray(data)
+        view = memoryview(data)
+        if view.format != "B" or view.ndim != 1:
+            view = view.cast("B")
+        end = offset + view.nbytes
+        memoryview(buffer)[offset:end] = view
+        return end
+
+    def pack_ascii(self, buffer: bytearray, offset: int, s: str) -> int:
+        return self.pack_bytes(buffer, offset, s.encode("ascii"))
+
+    def pack_fixed_float32(self, buffer: bytearray, offset: int, float_value) -> int:
+        return self.pack_int(buffer, offset, self.fixed_float32_bits(float_value), 4)
+
+    def pack_fixed_float16(self, buffer: bytearray, offset: int, float_value) -> int:
+        return self.pack_int(buffer, offset, self.fixed_float16_bits(float_value), 2)
+
 
 
     def get_size(self) -> int:
         raise NotImplementedError
 
 
+def fixed_float32_value(bits: int) -> float:
+    """
+    16.16 固定小数点のビット列を小数に変換する(read_fixed_float32 と同じ)
+    """
+    return ((bits >> 16) & 0xFFFF) + (bits & 0xFFFF) / (2 ** 16)
+
+
+def fixed_float16_value(bits: int) -> float:
+    """
+    8.8 固定小数点のビット列を小数に変換する(read_fixed_float16 と同じ)
+    """
+    return ((bits >> 8) & 0xFF) + (bits & 0xFF) / (2 ** 8)
+
+
+class FieldLayout:
+    """
+    固定長のフィールドの並びの宣言。1つの struct.Struct にコンパイルしておき、
+    unpack_from / pack_into の1回の呼び出しでコンポーネントの属性をまとめて読み書きする
+
+    fields は (属性名, 型) または (属性名, 型, 個数) のリスト。型は
+    u8, u16, u32, u64, i32, i64 (整数), fixed16 (8.8 固定小数点), fixed32 (16.16 固定小数点),
+    bytesN (N バイトの bytes), asciiN (N 文字の str)。個数を指定した属性はリストになる
+
+    >>> layout = FieldLayout([("version", "bytes1"), ("flags", "bytes3"), ("balance", "u16"), ("reserved", "bytes2")])
+    >>> end = layout.unpack_from(box, body)
+    """
+    int_formats = {"u8": "B", "u16": "H", "u32": "I", "u64": "Q", "i32": "i", "i64": "q"}
+    # 型 -> (structのフォーマット, 読み込み時の変換, 書き込み時の変換)
+    converters = {
+        "fixed16": ("H", fixed_float16_value, Mp4Component.fixed_float16_bits),
+        "fixed32": ("I", fixed_float32_value, Mp4Component.fixed_float32_bits),
+    }
+
+    def __init__(self, fields: list[tuple]):
+        formats = []
+        # (属性名, 個数(None なら単一の値), 読み込み時の変換, 書き込み時の変換)
+        self.fields: list[tuple[str, int | None, Callable | None, Callable | None]] = []
+        for field in fields:
+            name, field_type = field[0], field[1]
+            count = field[2] if len(field) > 2 else None
+            decode = encode = None
+            if field_type in self.int_formats:
+                field_format = self.int_formats[field_type]
+            elif field_type in self.converters:
+                field_format, decode, encode = self.converters[field_type]
+            elif field_type.startswith("bytes"):
+                field_format = f"{int(field_type[5:])}s"
+            elif field_type.startswith("ascii"):
+                field_format = f"{int(field_type[5:])}s"
+                decode, encode = self.decode_ascii, self.encode_ascii
+            else:
+                raise Exception(f"unknown field type {field_type}")
+            formats.append(field_format * (1 if count is None else count))
+            self.fields.append((name, count, decode, encode))
+        self.struct = struct.Struct(">" + "".join(formats))
+        self.size = self.struct.size
+
+    @staticmethod
+    def decode_ascii(value: bytes) -> str:
+        return value.decode("ascii")
+
+    @staticmethod
+    def encode_ascii(value: str) -> bytes:
+        return value.encode("ascii")
+
+    @classmethod
+    def versioned(cls, fields: list[tuple]) -> dict[bytes, 'FieldLayout']:
+        """
+        version 0/1 のレイアウトを作る。型 "time" のフィールドは version 0 では u32, version 1 では u64 になる
+        Returns
+        -------
+        layouts : dict[bytes, FieldLayout]
+            version(1バイトのbytes) -> レイアウト
+        """
+        return {
+            version: cls([(field[0], time_type if field[1] == "time" else field[1], *field[2:]) for field in fields])
+            for version, time_type in ((b'\x00', "u32"), (b'\x01', "u64"))
+        }
+
+    def unpack_from(self, component: Mp4Component, buffer, offset: int = 0) -> int:
+        """
+        buffer の offset からフィールドを読み、component の属性に設定する。読み終わった位置を返す
+        """
+        if len(buffer) < offset + self.size:
+            raise Exception(f"{type(component).__name__}: needs {self.size} bytes but only "
+                            f"{len(buffer) - offset} bytes remain")
+        values = self.struct.unpack_from(buffer, offset)
+        i = 0
+        for name, count, decode, _ in self.fields:
+            if count is None:
+                value = values[i] if decode is None else decode(values[i])
+                i += 1
+            else:
+                value = [v if decode is None else decode(v) for v in values[i:i + count]]
+                i += count
+            setattr(component, name, value)
+        return offset + self.size
+
+    def pack_into(self, component: Mp4Component, buffer: bytearray, offset: int) -> int:
+        """
+        component の属性を buffer の offset に書き込み、書き込んだ末尾の位置を返す
+        """
+        values = []
+        for name, count, _, encode in self.fields:
+            value = getattr(component, name)
+            if count is None:
+                values.append(value if encode is None else encode(value))
+            else:
+                values.extend(v if encode is None else encode(v) for v in value)
+        self.struct.pack_into(buffer, offset, *values)
+        return offset + self.size
+
+    def read(self, component: Mp4Component, f: BinaryIO):
+        """
+        f から1回の読み込みでフィールドを読み、component の属性に設定する
+        """
+        self.unpack_from(component, f.read(self.size))
+
+
+# fourcc -> Boxクラス。ContainerBox.parse はここに登録されていないBoxを UnknownBox として扱う
+box_registry: dict[str, type['Box']] = {}
+
+
+class EntryTable:
+    """
+    サンプルテーブル(stts, stsc, stsz, stco等)のエントリの配列。MP4上と同じビッグエンディアンの配列として持つ
+        列(tbl.first_chunk)・要素・スライスへのアクセスや astype, tolist 等は配列と同じように使え、
+        np.asarray(tbl) で配列になる。append / extend / += ではリストと同じようにエントリを追加でき、
+        追加すると持ち主のBoxのサイズのキャッシュを破棄する
+
+    >>> stts.time_to_sample_table.append(TimeToSample(1, 1000))
+    >>> stco.chunk_to_offset_table += [4096, 8192]
+    """
+    __slots__ = ("dtype", "owner", "buffer", "length")
+
+    def __init__(self, entries, dtype, owner: 'Box | None' = None):
+        """
+        Parameters
+        ----------
+        entries : EntryTable | np.ndarray | list
+            エントリ。リストの要素は、フィールドと同じ名前の属性を持つコンポーネント(TimeToSample等)、タプル、整数
+        dtype
+            エントリの型
+        owner : Box | None
+            テーブルを持つBox
+        """
+        self.dtype = np.dtype(dtype)
+        self.owner = owner
+        if isinstance(entries, EntryTable):
+            entries = entries.array
+        if not isinstance(entries, np.ndarray):
+            entries = [self.__to_record(entry) for entry in entries]
+        self.buffer = np.asarray(entries, dtype=self.dtype)
+        self.length = len(self.buffer)
+
+    def __to_record(self, entry):
+        if self.dtype.names is None:
+            return entry
+        if isinstance(entry, Mp4Component):
+            return tuple(getattr(entry, name) for name in self.dtype.names)
+        return tuple(entry)
+
+    @property
+    def array(self) -> np.ndarray:
+        """
+        エントリの配列(フィールドを持つ場合はレコード配列)。テーブルと同じメモリを参照する
+        """
+        array = self.buffer[:self.length]
+        return array.view(np.recarray) if self.dtype.names is not None else array
+
+    def __getattr__(self, name):
+        # 初期化前(コピー時等)に自分の属性を探して再帰しないようにする
+        if name in EntryTable.__slots__ or name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self.array, name)
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self.array, dtype=dtype)
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        return iter(self.array)
+
+    def __getitem__(self, item):
+        return self.array[item]
+
+    def __setitem__(self, key, value):
+        if isinstance(value, Mp4Component):
+            value = self.__to_record(value)
+        self.array[key] = value
+
+    def __eq__(self, other):
+        return self.array == (other.array if isinstance(other, EntryTable) else other)
+
+    def __repr__(self):
+        return f"EntryTable({self.array!r})"
+
+    def append(self, entry):
+        self.extend([entry])
+
+    def extend(self, entries):
+        added = EntryTable(entries, self.dtype).array
+        end = self.length + len(added)
+        if end > len(self.buffer):
+            # リストと同じく、容量を倍々に増やして追加を償却O(1)にする
+            buffer = np.empty(max(end, 2 * len(self.buffer)), dtype=self.dtype)
+            buffer[:self.length] = self.buffer[:self.length]
+            self.buffer = buffer
+        self.buffer[self.length:end] = added
+        self.length = end
+        if self.owner is not None:
+            self.owner.invalidate_size()
+
+    def __iadd__(self, entries):
+        self.extend(entries)
+        return self
+
+
+def register_box(*box_types: str):
+    """
+    Boxクラスをfourccに登録するデコレータ。flavtool外で定義したBoxもこれで登録すればパースされる
+    登録するクラスは box_type だけで生成できる必要がある
+
+    Examples
+    --------
+    >>> @register_box("tmet")
+    ... class TasteMetaBox(LeafBox):
+    ...     ...
+    """
+    def decorator(cls):
+        for box_type in box_types:
+            box_registry[box_type] = cls
+        return cls
+    return decorator
+
+
 class Box(Mp4Component):
 
     def __init__(self, box_type):
@@ -112,6 +413,32 @@ class Box(Mp4Component):
     def get_size(self) -> int:
         raise NotImplementedError
 
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        # 親へのリンク以外の属性が変わったら、自分と祖先のキャッシュしたサイズを破棄する
+        if name != "parent":
+            self.invalidate_size()
+
+    def invalidate_size(self):
+        """
+        自分と祖先(parent をたどる)のキャッシュしたサイズを破棄する。
+        属性への代入では自動で呼ばれるので、テーブルのリストをその場で変更した場合などにだけ明示的に呼ぶ
+        """
+        box = self
+        while box is not None:
+            box.__dict__.pop("size_cache", None)
+            box = box.__dict__.get("parent")
+
+    def cached_size(self) -> int:
+        """
+        get_size() の結果をキャッシュして返す(自分か子孫が変更されるまで再計算しない)
+        """
+        size = self.__dict__.get("size_cache")
+        if size is None:
+            size = self.get_size()
+            self.__dict__["size_cache"] = size
+        return size
+
     @staticmethod
     def get_type_and_size(f: BinaryIO):
         box_size: int = int.from_bytes(f.read(4), byteorder='big')
@@ -119,7 +446,6 @@ class Box(Mp4Component):
         body_size: int = box_size - 8
         extended = box_size == 1
         if extended:
-            print("big")
             box_size = int.from_bytes(f.read(8), byteorder="big")
             body_size = box_size - 16
         return box_type, box_size, body_size, extended
@@ -140,4 +466,26 @@ class Box(Mp4Component):
             self.write_int(f, size)
             self.write_ascii(f, box_type)
 
+    def pack_type_and_size(self, buffer: bytearray, offset: int, box_type: str, size: int,
+                           force_extended=False) -> int:
+        """
+        write_type_and_size と同じヘッダを buffer に書き込む
+        """
+        if size >= 4294967296 or force_extended:
+            extended_box_header.pack_into(buffer, offset, 1, box_type.encode("ascii"), size)
+            return offset + extended_box_header.size
+        box_header.pack_into(buffer, offset, size, box_type.encode("ascii"))
+        return offset + box_header.size
+
+    def to_bytes(self) -> bytearray:
+        """
+        Box全体を、サイズ分確保した1つのバッファに書き込んで返す
+        """
+        size = self.cached_size()
+        buffer = bytearray(size)
+        end = self.pack_into(buffer, 0)
+        if end != size:
+            raise Exception(f"{self.box_type}: packed {end} bytes but size is {size}")
+        return buffer
+
 
@@ -1,9 +1,100 @@
 from flavtool.parser.boxs.leaf import *
-from flavtool.parser.boxs.box import Box
+from flavtool.parser.boxs.box import Box, register_box, box_registry
+from flavtool.tracer import tracer
 from typing import Union
-containerNames = ["moov", "trak", "edts", "minf", "stbl", "acv1", "dinf", "mdia"]
+containerNames = ["moov", "trak", "edts", "minf", "stbl", "acv1", "dinf", "mdia", "mvex", "moof", "traf", "mfra"]
 
 
+class BoxList(list):
+    """
+    ContainerBoxの子のリスト。追加されたBoxの親を持ち主にし、変更されると持ち主のサイズのキャッシュを破棄する
+    (子の親へのリンクはこのリストだけが設定するので、呼び出し側で parent を設定する必要はない)
+    """
+
+    def __init__(self, boxes=(), owner: Box | None = None):
+        super().__init__(boxes)
+        self.owner = owner
+        self.adopt(self)
+
+    def adopt(self, boxes):
+        """
+        boxes の親を持ち主にする(親をたどってサイズのキャッシュを破棄できるようにする)
+        """
+        if self.owner is None:
+            return
+        for box in boxes:
+            box.parent = self.owner
+
+    def changed(self):
+        """
+        持ち主のサイズのキャッシュを破棄する
+        """
+        if self.owner is not None:
+            self.owner.invalidate_size()
+
+    def append(self, box):
+        super().append(box)
+        self.adopt([box])
+        self.changed()
+
+    def extend(self, boxes):
+        # イテレータは一度しか読めないので、リストにしてから追加する
+        boxes = list(boxes)
+        super().extend(boxes)
+        self.adopt(boxes)
+        self.changed()
+
+    def __iadd__(self, boxes):
+        self.extend(boxes)
+        return self
+
+    def insert(self, i, box):
+        super().insert(i, box)
+        self.adopt([box])
+        self.changed()
+
+    def __setitem__(self, key, value):
+        if isinstance(key, slice):
+            value = list(value)
+            super().__setitem__(key, value)
+            self.adopt(value)
+        else:
+            super().__setitem__(key, value)
+            self.adopt([value])
+        self.changed()
+
+    def remove(self, box):
+        super().remove(box)
+        self.changed()
+
+    def pop(self, i=-1):
+        box = super().pop(i)
+        self.changed()
+        return box
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.changed()
+
+    def clear(self):
+        super().clear()
+        self.changed()
+
+    def sort(self, *, key=None, reverse=False):
+        super().sort(key=key, reverse=reverse)
+        self.changed()
+
+    def reverse(self):
+        super().reverse()
+        self.changed()
+
+    def __imul__(self, n):
+        super().__imul__(n)
+        self.changed()
+        return self
+
+
+@register_box(*containerNames)
 class ContainerBox(Box):
     def __init__(self, box_type, children:list[Box]=None):
         super().__init__(box_type)
@@ -11,6 +102,13 @@ class ContainerBox(Box):
             self.children: list[Box] = []
         else:
             self.children = children
+        # パース時のファイル上の開始位置(ヘッダを含む)。moofを基準とするオフセットの解決に使う
+        self.box_offset: int | None = None
+
+    def __setattr__(self, name, value):
+        if name == "children" and not (isinstance(value, BoxList) and value.owner is self):
+            value = BoxList(value, owner=self)
+        super().__setattr__(name, value)
 
     def __getitem__(self, item) -> Union['ContainerBox',  LeafBox]:
         for child in self.children:
@@ -19,81 +117,112 @@ class ContainerBox(Box):
 
 
 
-    def parse(self, f, body_size: int, read_mdat_bytes=True):
+    def parse(self, f, body_size: int, read_mdat_bytes=True, use_mmap=False, lazy=False):
+        """
+        子Boxをパースする
+        Parameters
+        ----------
+        read_mdat_bytes : bool
+            mdatの中身を読み込むか
+        use_mmap : bool
+            mdatをmmap上のmemoryviewとして保持するか
+        lazy : bool
+            LeafBoxの本体を読み込むだけにとどめ、最初に属性へアクセスされたときにデコードする
+        """
         begin_byte = f.tell()
 
         while f.tell() < begin_byte + body_size:
+            child_offset = f.tell()
+            # 子のパース中にトレースが切り替えられても対応がずれないように、1回だけ読む
+            tracing = tracer.enabled
+            if tracing:
+                trace_begin = tracer.now()
             child_box_type, child_box_size, child_body_size, is_extended = self.get_type_and_size(f)
-            print(f.tell(), child_box_type, child_box_size, child_body_size)
-            if child_box_type in containerNames:
-                box = ContainerBox(child_box_type)
-            elif child_box_type == "ftyp":
-                box = FtypBox(child_box_type)
-            elif child_box_type == "free":
-                box = FreeBox(child_box_type)
-            elif child_box_type == "mdat":
-                box = MdatBox(child_box_type,is_extended, f.tell(), read_mdat_bytes)
-            elif child_box_type == "mvhd":
-                box = MvhdBox(child_box_type)
-            elif child_box_type == "tkhd":
-                box = TkhdBox(child_box_type)
-            elif child_box_type == "mdhd":
-                box = MdhdBox(child_box_type)
-            elif child_box_type == "hdlr":
-                box = HdlrBox(child_box_type)
-            elif child_box_type == "vmhd":
-                box = VmhdBox(child_box_type)
-            elif child_box_type == "smhd":
-                box = SmhdBox(child_box_type)
-            elif child_box_type == "dref":
-                box = DrefBox(child_box_type)
-            elif child_box_type == "stsd":
-                box = StsdBox(child_box_type)
-            elif child_box_type == "stts":
-                box = SttsBox(child_box_type)
-            elif child_box_type == "stsc":
-                box = StscBox(child_box_type)
-            elif child_box_type == "stsz":
-                box = StszBox(child_box_type)
-            elif child_box_type == "stco":
-                box = StcoBox(child_box_type)
-            elif child_box_type == "elst":
-                box = ElstBox(child_box_type)
+            if child_box_size == 0:
+                # size 0 は親(トップレベルではファイル)の末尾まで続くBox
+                child_body_size = begin_byte + body_size - f.tell()
+                child_box_size = f.tell() - child_offset + child_body_size
+            box_class = box_registry.get(child_box_type, UnknownBox)
+            if box_class is MdatBox:
+                box = MdatBox(child_box_type, is_extended, f.tell(), read_mdat_bytes, use_mmap)
             else:
-                box = UnknownBox(child_box_type)
+                box = box_class(child_box_type)
             box.parent = self
-            box.parse(f, child_body_size)
+            if isinstance(box, ContainerBox):
+                box.box_offset = child_offset
+                if tracing:
+                    tracer.depth += 1
+                box.parse(f, child_body_size, read_mdat_bytes, use_mmap, lazy)
+                if tracing:
+                    tracer.depth -= 1
+            elif lazy and isinstance(box, LeafBox) and not isinstance(box, MdatBox):
+                box.defer(f.read(child_body_size), f.tell() - child_body_size)
+            else:
+                box.parse(f, child_body_size)
+            if tracing:
+                tracer.box(child_box_type, child_offset, child_box_size, trace_begin)
 
             self.children.append(box)
 
         return self
 
+    def get_children(self, box_type: str) -> list[Box]:
+        """
+        指定したタイプの子Boxをすべて返す(moof, trafなど同じタイプが複数並ぶもの用)
+        """
+        return [child for child in self.children if child.box_type == box_type]
+
     def get_mdat_offset(self) -> (MdatBox, int):
         size = 0
         for child in self.children:
             if child.box_type == "mdat":
                 child : MdatBox
-                if child.is_size_extended:
-                    size += 16
-                else:
-                    size += 8
+                size += child.header_size
                 return child, size
-            size += child.get_size()
+            size += child.cached_size()
 
 
     def get_size(self) -> int:
         size = 0
         for child in self.children:
-            size += child.get_size()
+            size += child.cached_size()
         return self.get_overall_size(size)
 
     def write(self, f: BinaryIO):
+        """
+        ルート(とmdatを含むBox)は子を順に書き出し、それ以外(moov, moof等)はBox全体を1つのバッファに
+        まとめてから1回で書き出す
+        """
+        if self.box_type == "root" or any(isinstance(child, MdatBox) for child in self.children):
+            self.write_each(f)
+        else:
+            f.write(self.to_bytes())
+
+    def write_each(self, f: BinaryIO):
+        """
+        ヘッダと子Boxを1つずつ f に書き出す(バッファにまとめない)
+        """
         if self.box_type != "root":
-            size = self.get_size()
+            size = self.cached_size()
             box_type = self.box_type
             self.write_type_and_size(f, box_type, size)
         for child in self.children:
-            child.write(f)
+            if isinstance(child, LeafBox) and not child.is_loaded:
+                child.write_raw(f)
+            elif isinstance(child, ContainerBox):
+                child.write_each(f)
+            else:
+                child.write(f)
+
+    def pack_into(self, buffer: bytearray, offset: int) -> int:
+        if self.box_type != "root":
+            offset = self.pack_type_and_size(buffer, offset, self.box_type, self.cached_size())
+        for child in self.children:
+            if isinstance(child, LeafBox) and not child.is_loaded:
+                offset = child.pack_raw(buffer, offset)
+            else:
+                offset = child.pack_into(buffer, offset)
+        return offset
 
     def print(self, depth=0):
         for d in range(depth):
@@ -1,13 +1,96 @@
+import io
+import mmap
 import os
+import struct
 from typing import BinaryIO
 from datetime import datetime, timedelta
-from flavtool.parser.boxs.box import Box, Mp4Component
+
+import numpy as np
+from flavtool.parser.boxs.box import Box, Mp4Component, FieldLayout, EntryTable, register_box
+from flavtool.parser.range_writer import RangeWriter
 from flavtool.codec.codec_options import MixInfo
 epoch_1904 = datetime(1904, 1, 1)
 
+# サンプルテーブルはMP4上と同じビッグエンディアンの配列として保持する
+time_to_sample_dtype = np.dtype([("sample_count", ">u4"), ("sample_delta", ">u4")])
+sample_to_chunk_dtype = np.dtype([("first_chunk", ">u4"), ("samples_per_chunk", ">u4"),
+                                  ("sample_description_id", ">u4")])
+# version, flags
+full_box_header = struct.Struct(">1s3s")
+# version, flags, エントリ数(テーブルを持つBoxの先頭)
+table_box_header = struct.Struct(">1s3sI")
+
 
 class LeafBox(Box):
 
+    def __getattr__(self, name):
+        # 遅延パースされたBoxは、未設定の属性に初めてアクセスされたときに本体をデコードする
+        if "lazy_body" not in self.__dict__ or name.startswith("__"):
+            raise AttributeError(name)
+        self.load()
+        return getattr(self, name)
+
+    def defer(self, body: bytes, body_offset: int):
+        """
+        本体のデコードを遅延させる。属性へのアクセスまたは load() でデコードされる
+        Parameters
+        ----------
+        body : bytes
+            Boxの本体(ヘッダを除く)
+        body_offset : int
+            ファイル上の本体の開始位置
+        """
+        box_type, parent = self.box_type, self.parent
+        self.__dict__.clear()
+        self.box_type = box_type
+        self.parent = parent
+        self.body_offset = body_offset
+        self.lazy_body = body
+        return self
+
+    @property
+    def is_loaded(self) -> bool:
+        return "lazy_body" not in self.__dict__
+
+    def load(self):
+        """
+        遅延されている本体をデコードする
+        """
+        if self.is_loaded:
+            return self
+        body = self.__dict__.pop("lazy_body")
+        box_type, parent, body_offset = self.box_type, self.parent, self.body_offset
+        type(self).__init__(self, box_type)
+        self.parent = parent
+        self.body_offset = body_offset
+        self.parse(io.BytesIO(body), len(body))
+        return self
+
+    def cached_size(self) -> int:
+        if not self.is_loaded:
+            return self.get_raw_size()
+        return super().cached_size()
+
+    def get_raw_size(self) -> int:
+        """
+        未デコードのBoxのサイズ(デコードせずに元のバイト列から求める)
+        """
+        return self.get_overall_size(len(self.lazy_body))
+
+    def write_raw(self, f: BinaryIO):
+        """
+        未デコードのBoxを元のバイト列のまま書き出す
+        """
+        self.write_type_and_size(f, self.box_type, self.get_raw_size())
+        f.write(self.lazy_body)
+
+    def pack_raw(self, buffer: bytearray, offset: int) -> int:
+        """
+        未デコードのBoxを元のバイト列のまま buffer に書き込む
+        """
+        offset = self.pack_type_and_size(buffer, offset, self.box_type, self.get_raw_size())
+        return self.pack_bytes(buffer, offset, self.lazy_body)
+
     def parse(self, f: BinaryIO, body_size: int):
         raise NotImplemented
 
@@ -15,11 +98,21 @@ class LeafBox(Box):
         raise NotImplemented
 
     def write(self, f: BinaryIO):
-        raise NotImplemented
+        # 独自の write を持たないBoxは pack_into で1つのバッファに書き込んでから書き出す
+        f.write(self.to_bytes())
 
     def get_size(self) -> int:
         raise NotImplementedError
 
+    def layout_of_version(self, layouts: dict[bytes, FieldLayout], version: bytes) -> FieldLayout:
+        """
+        version に対応するレイアウトを返す(FieldLayout.versioned で作ったもの)
+        """
+        layout = layouts.get(bytes(version))
+        if layout is None:
+            raise Exception(f"{self.box_type}: unsupported version {bytes(version).hex()}")
+        return layout
+
 
 class UnknownBox(LeafBox):
 
@@ -29,7 +122,6 @@ class UnknownBox(LeafBox):
         self.box_type = box_type
 
     def parse(self, f: BinaryIO, body_size: int):
-        print("parse: ", body_size)
         self.body_data = f.read(body_size)
         return self
 
@@ -39,13 +131,18 @@ class UnknownBox(LeafBox):
         print(f"Unknown - {self.box_type}")
 
     def write(self, f: BinaryIO):
-        self.write_type_and_size(f, self.box_type, self.get_size())
+        self.write_type_and_size(f, self.box_type, self.cached_size())
         f.write(self.body_data)
 
+    def pack_into(self, buffer: bytearray, offset: int) -> int:
+        offset = self.pack_type_and_size(buffer, offset, self.box_type, self.cached_size())
+        return self.pack_bytes(buffer, offset, self.body_data)
+
     def get_size(self) -> int:
         return self.get_overall_size(len(self.body_data))
 
 
+@register_box("ftyp")
 class FtypBox(LeafBox):
 
     def __init__(self, box_type: str, major_brand="", compatible_brands=None):
@@ -65,12 +162,18 @@ class FtypBox(LeafBox):
         return self
 
     def write(self, f: BinaryIO):
-        self.write_type_and_size(f, "ftyp", self.get_size())
+        self.write_type_and_size(f, "ftyp", self.cached_size())
         self.write_ascii(f, self.major_brand)
         f.write(self.minor_version)
         for brand in self.compatible_brands:
             self.write_ascii(f, brand)
 
+    def pack_into(self, buffer: bytearray, offset: int) -> int:
+        offset = self.pack_type_and_size(buffer, offset, "ftyp", self.cached_size())
+        offset = self.pack_ascii(buffer, offset, self.major_brand)
+        offset = self.pack_bytes(buffer, offset, self.minor_version)
+        return self.pack_ascii(buffer, offset, "".join(self.compatible_brands))
+
     def get_size(self) -> int:
         return self.get_overall_size(4 + 4 + len(self.compatible_brands) * 4)
 
@@ -81,56 +184,168 @@ class FtypBox(LeafBox):
         self.print_with_indent(f" - compatible_brands:{self.compatible_brands}", depth)
 
 
+@register_box("free")
 class FreeBox(LeafBox):
-    def __init__(self, box_type: str):
+    def __init__(self, box_type: str, read_bytes=True):
+        """
+        Parameters
+        ----------
+        read_bytes : bool
+            False なら本体を読まずにサイズだけを記録する(中身は意味を持たないので、書き出すときは0で埋める)
+        """
         super().__init__(box_type)
         self.space: bytes = b''
+        self.read_bytes = read_bytes
+        # read_bytes=False でパースした場合の本体のサイズ
+        self.space_size: int | None = None
 
     def parse(self, f: BinaryIO, body_size: int):
-        self.space = f.read(body_size)
+        if self.read_bytes:
+            self.space = f.read(body_size)
+        else:
+            f.seek(body_size, os.SEEK_CUR)
+            self.space_size = body_size
         return self
 
     def print(self, depth=0):
         self.print_with_indent("free", depth)
-        self.print_with_indent(f" - space {self.space}", depth)
+        if self.space_size is None:
+            self.print_with_indent(f" - space {self.space}", depth)
+        else:
+            self.print_with_indent(f" - space ({self.space_size} bytes, not read)", depth)
 
     def write(self, f: BinaryIO):
-        self.write_type_and_size(f, "free", self.get_size())
-        f.write(self.space)
+        self.write_type_and_size(f, "free", self.cached_size())
+        f.write(self.space if self.space_size is None else bytes(self.space_size))
+
+    def pack_into(self, buffer: bytearray, offset: int) -> int:
+        offset = self.pack_type_and_size(buffer, offset, "free", self.cached_size())
+        return self.pack_bytes(buffer, offset, self.space if self.space_size is None else bytes(self.space_size))
 
     def get_size(self) -> int:
-        return self.get_overall_size(len(self.space))
+        return self.get_overall_size(len(self.space) if self.space_size is None else self.space_size)
 
 
+@register_box("mdat")
 class MdatBox(LeafBox):
-    def __init__(self, box_type: str, is_extended: bool, begin_point: int|None, read_bytes=True):
+    def __init__(self, box_type: str, is_extended: bool, begin_point: int|None, read_bytes=True, use_mmap=False):
         super().__init__(box_type)
-        self.body: bytes = b''
+        self.body: bytes | memoryview = b''
         self.is_size_extended = is_extended
         self.begin_point = begin_point
         self.read_bytes = read_bytes
+        self.use_mmap = use_mmap
+        self.mapping: mmap.mmap | None = None
+        # mmap上の本体のビュー(compose() で body が置き換えられても close() で解放できるように持っておく)
+        self.mapped_body: memoryview | None = None
+        self.source_path: str | None = None
+        self.chunks: list | None = None
+        self.chunks_size: int = 0
 
     def parse(self, f: BinaryIO, body_size: int):
-        if self.read_bytes:
+        name = getattr(f, "name", None)
+        self.source_path = os.path.abspath(name) if isinstance(name, str) else None
+        if self.read_bytes and self.use_mmap:
+            self.mapping = self.__map_file(f)
+        if self.mapping is not None:
+            # ファイル全体をmmapし、mdat部分だけをゼロコピーのmemoryviewとして持つ
+            begin = f.tell()
+            self.mapped_body = memoryview(self.mapping)[begin: begin + body_size]
+            self.body = self.mapped_body
+            f.seek(body_size, os.SEEK_CUR)
+        elif self.read_bytes:
             self.body = f.read(body_size)
         else:
             f.seek(body_size, os.SEEK_CUR)
         return self
 
+    @staticmethod
+    def __map_file(f: BinaryIO) -> mmap.mmap | None:
+        """
+        ファイルを読み取り専用でmmapする。fileno を持たない(BytesIO等)場合は None を返す
+        """
+        try:
+            fileno = f.fileno()
+        except (AttributeError, OSError):
+            return None
+        return mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        """
+        mmapを解放する。SampleData.data 等のビューが残っている場合は、それらが破棄されるまで解放されない
+        """
+        if self.mapped_body is not None:
+            self.mapped_body.release()
+            if self.body is self.mapped_body:
+                self.body = b''
+            self.mapped_body = None
+        if self.mapping is not None:
+            try:
+                self.mapping.close()
+            except BufferError:
+                return
+            self.mapping = None
+
     def print(self, depth=0):
         self.print_with_indent("mdat", depth)
         self.print_with_indent(f" - begin {self.begin_point}", depth)
-        self.print_with_indent(f" - body {self.body[:10]}", depth)
+        self.print_with_indent(f" - body {bytes(self.body[:10])}", depth)
+
+    def set_chunks(self, chunks: list):
+        """
+        本体をメモリ上に持たず、書き出し時にチャンク(ChunkData)から直接ストリーミングするよう設定する。
+        StreamingSampleData のサンプルは source_path のファイルから読み込まれる
+        Parameters
+        ----------
+        chunks : list[ChunkData]
+            mdatに並べるチャンク
+        """
+        self.chunks = chunks
+        self.chunks_size = sum(chunk.get_size() for chunk in chunks)
+        self.body = b''
 
     def write(self, f: BinaryIO):
-        self.write_type_and_size(f, "mdat", self.get_size(), force_extended=self.is_size_extended)
-        f.write(self.body)
+        self.write_type_and_size(f, "mdat", self.cached_size(), force_extended=self.is_size_extended)
+        if self.chunks is None:
+            f.write(self.body)
+            return
+        source = open(self.source_path, "rb") if self.source_path is not None else None
+        try:
+            # 元ファイル上で連続するサンプルはチャンクをまたいでまとめ、カーネル内でコピーする
+            writer = RangeWriter(f, source)
+            for chunk in self.chunks:
+                chunk.write(writer)
+            writer.flush()
+        finally:
+            if source is not None:
+                source.close()
+
+    @property
+    def body_size(self) -> int:
+        return self.chunks_size if self.chunks is not None else len(self.body)
+
+    @property
+    def header_size(self) -> int:
+        """
+        ヘッダ(size, type, 拡張size)のバイト数。本体が4GiBを超える場合は拡張サイズになる
+        """
+        return self.cached_size() - self.body_size
 
     def get_size(self) -> int:
-        return self.get_overall_size(len(self.body) + (8 if self.is_size_extended else 0))
+        if self.is_size_extended:
+            return self.body_size + 16
+        return self.get_overall_size(self.body_size)
 
 
+@register_box("mvhd")
 class MvhdBox(LeafBox):
+    # predefines(可変長)と next_track_id の前までの固定長部分
+    layouts = FieldLayout.versioned([
+        ("version", "bytes1"), ("flags", "bytes3"), ("creation_time", "time"), ("modification_time", "time"),
+        ("time_scale", "u32"), ("duration", "time"), ("preferred_rate", "fixed32"), ("preferred_volume", "fixed16"),
+        ("reserved", "bytes10"), ("matrix", "bytes36"),
+    ])
+
     def __init__(self, box_type: str = '', version: bytes = b'\x00', flags: bytes = b'\x00\x00\x00',
                  creation_time: int = 0, modification_time: int = 0, time_scale: int = 0,
                  duration: int = 0, preferred_rate: float = 1.0, preferred_volume: float = 1.0,
@@ -151,20 +366,10 @@ class MvhdBox(LeafBox):
         self.next_track_id = next_track_id
 
     def parse(self, f: BinaryIO, body_size: int):
-        begin = f.tell()
-        self.version = f.read(1)
-        self.flags = f.read(3)
-        self.creation_time = self.read_int(f, 4)
-        self.modification_time = self.read_int(f, 4)
-        self.time_scale = self.read_int(f, 4)
-        self.duration = self.read_int(f, 4)
-        self.preferred_rate = self.read_fixed_float32(f)
-        self.preferred_volume = self.read_fixed_float16(f)
-        self.reserved = f.read(10)
-        self.matrix = f.read(36)
-        offset = f.tell() - begin
-        self.predefines = f.read(body_size - 4 - offset)
-        self.next_track_id = f.read(4)
+        body = f.read(body_size)
+        offset = self.layout_of_version(self.layouts, body[:1]).unpack_from(self, body)
+        self.predefines = body[offset:-4]
+        self.next_track_id = body[-4:]
         return self
 
     def print(self, depth=0):
@@ -189,29 +394,25 @@ class MvhdBox(LeafBox):
         self.print_with_indent(f" - predefines: {self.predefines.hex()}", depth)
         self.print_with_indent(f" - next_track_id: {self.next_track_id.hex()}", depth)
 
-    def write(self, f: BinaryIO):
-        self.write_type_and_size(f, "mvhd", self.get_size())
-
-        f.write(self.version)
-        f.write(self.flags)
-        self.write_int(f, self.creation_time)
-        self.write_int(f, self.modification_time)
-        self.write_int(f, self.time_scale)
-        self.write_int(f, self.duration)
-
-        self.write_fixed_float32(f, self.preferred_rate)
-        self.write_fixed_float16(f, self.preferred_volume)
-
-        f.write(self.reserved)
-        f.write(self.matrix)
-        f.write(self.predefines)
-        f.write(self.next_track_id)
+    def pack_into(self, buffer: bytearray, offset: int) -> int:
+        offset = self.pack_type_and_size(buffer, offset, "mvhd", self.cached_size())
+        offset = self.layout_of_version(self.layouts, self.version).pack_into(self, buffer, offset)
+        offset = self.pack_bytes(buffer, offset, self.predefines)
+        return self.pack_bytes(buffer, offset, self.next_track_id)
 
     def get_size(self) -> int:
-        return self.get_overall_size(1 + 3 + 4 * 4 + 4 + 2 + 10 + 36 + 4 + len(self.predefines))
+        layout = self.layout_of_version(self.layouts, self.version)
+        return self.get_overall_size(layout.size + len(self.predefines) + len(self.next_track_id))
 
 
+@register_box("tkhd")
 class TkhdBox(LeafBox):
+    layouts = FieldLayout.versioned([
+        ("version", "bytes1"), ("flags", "bytes3"), ("creation_time", "time"), ("modification_time", "time"),
+        ("track_id", "u32"), ("reserved1", "bytes4"), ("duration", "time"), ("reserved2", "bytes8"),
+        ("layer", "u16"), ("alternative_group", "bytes2"), ("volume", "fixed16"), ("reserved3", "bytes2"),
+        ("matrix", "bytes36"), ("track_width", "fixed32"), ("track_height", "fixed32"),
+    ])
 
     def __init__(self, box_type: str, version: bytes = b'\x00', flags: bytes = b'\x00\x00\x00', creation_time: int = 0,
                  modification_time: int = 0, track_id: int = 0, reserved1: bytes = bytes(4), duration: int = 0,
@@ -236,21 +437,8 @@ class TkhdBox(LeafBox):
         self.track_height: float = track_height
 
     def parse(self, f: BinaryIO, body_size: int):
-        self.version = f.read(1)
-        self.flags = f.read(3)
-        self.creation_time = self.read_int(f, 4)
-        self.modification_time = self.read_int(f, 4)
-        self.track_id = self.read_int(f, 4)
-        self.reserved1 = f.read(4)
-        self.duration = self.read_int(f, 4)
-        self.reserved2 = f.read(8)
-        self.layer = self.read_int(f, 2)
-        self.alternative_group = f.read(2)
-        self.volume = self.read_fixed_float16(f)
-        self.reserved3 = f.read(2)
-        self.matrix = f.read(36)
-        self.track_width = self.read_fixed_float32(f)
-        self.track_height = self.read_fixed_float32(f)
+        body = f.read(body_size)
+        self.layout_of_version(self.layouts, body[:1]).unpack_from(self, body)
         return self
 
     def print(self, depth=0):
@@ -278,30 +466,22 @@ class TkhdBox(LeafBox):
         self.print_with_indent(f" - track_width: {self.track_width}", depth)
         self.print_with_indent(f" - track_height: {self.track_height}", depth)
 
-    def write(self, f: BinaryIO):
-        self.write_type_and_size(f, "tkhd", self.get_size())
-
-        f.write(self.version)
-        f.write(self.flags)
-        self.write_int(f, self.creation_time)
-        self.write_int(f, self.modification_time)
-        self.write_int(f, self.track_id)
-        f.write(self.reserved1)
-        self.write_int(f, self.duration)
-        f.write(self.reserved2)
-        self.write_int(f, self.layer, length=2)
-        f.write(self.alternative_group)
-        self.write_fixed_float16(f, self.volume)
-        f.write(self.reserved3)
-        f.write(self.matrix)
-        self.write_fixed_float32(f, self.track_width)
-        self.write_fixed_float32(f, self.track_height)
+    def pack_into(self, buffer: bytearray, offset: int) -> int:
+        offset = self.pack_type_and_size(buffer, offset, "tkhd", self.cached_size())
+        return self.layout_of_version(self.layouts, self.version).pack_into(self, buffer, offset)
 
     def get_size(self) -> int:
-        return self.get_overall_size(1 + 3 + 4 * 5 + 8 + 2 * 4 + 36 + 8)
+        return self.get_overall_size(self.layout_of_version(self.layouts, self.version).size)
 
 
+@register_box("mdhd")
 class MdhdBox(LeafBox):
+    # predefines(可変長)の前までの固定長部分
+    layouts = FieldLayout.versioned([
+        ("version", "bytes1"), ("flags", "bytes3"), ("creation_time", "time"), ("modification_time", "time"),
+        ("time_scale", "u32"), ("duration", "time"), ("language", "u16"),
+    ])
+
     def __init__(self, box_type: str, version: bytes = b'\x00', flags: bytes = b'\x00\x00\x00', creation_time: int = 0,
                  modification_time: int = 0, time_scale: int = 0, duration: int = 0, language: int = 0,
                  predefines: bytes = bytes(4)):
@@ -316,15 +496,9 @@ class MdhdBox(LeafBox):
         self.predefines = predefines
 
     def parse(self, f: BinaryIO, body_size: int):
-        begin = f.tell()
-        self.version = f.read(1)
-        self.flags = f.read(3)
-        self.creation_time = self.read_int(f, 4)
-        self.modification_time = self.read_int(f, 4)
-        self.time_scale = self.read_int(f, 4)
-        self.duration = self.read_int(f, 4)
-        self.language = self.read_int(f, 2)
-        self.predefines = f.read(body_size - (f.tell() - begin))
+        body = f.read(body_size)
+        offset = self.layout_of_version(self.layouts, body[:1]).unpack_from(self, body)
+        self.predefines = body[offset:]
         return self
 
     def print(self, depth=0):
@@ -345,22 +519,22 @@ class MdhdBox(LeafBox):
         self.print_with_indent(f" - language: {self.language}", depth)
         self.print_with_indent(f" - predefines: {self.predefines.hex()}", depth)
 
-    def write(self, f: BinaryIO):
-        self.write_type_and_size(f, "mdhd", self.get_size())
-        f.write(self.version)
-        f.write(self.flags)
-        self.write_int(f, self.creation_time)
-        self.write_int(f, self.modification_time)
-        self.write_int(f, self.time_scale)
-        self.write_int(f, self.duration)
-        self.write_int(f, self.language, length=2)
-        f.write(self.predefines)
+    def pack_into(self, buffer: bytearray, offset: int) -> int:
+        offset = self.pack_type_and_size(buffer, offset, "mdhd", self.cached_size())
+        offset = self.layout_of_version(self.layouts, self.version).pack_into(self, buffer, offset)
+        return self.pack_bytes(buffer, offset, self.predefines)
 
     def get_size(self) -> int:
-        return self.get_overall_size(1 + 3 + 4 * 4 + 2 + len(self.predefines))
+        return self.get_overall_size(self.layout_of_version(self.layouts, self.version).size + len(self.predefines))
 
 
+@register_box("hdlr")
 class HdlrBox(LeafBox):
+    # component_name(可変長)の前までの固定長部分
+    layout = FieldLayout([
+        ("version", "bytes1"), ("flags", "bytes3"), ("component_type", "ascii4"), ("component_subtype", "ascii4"),
+    ])
+
     def __init__(self, box_type: str, version: bytes = b'\x00', flags: bytes = b'\x00\x00\x00',
                  component_type: str = "", component_subtype: str = "", component_name: bytes = bytes(4)):
         super().__init__(box_type)
@@ -371,12 +545,9 @@ class HdlrBox(LeafBox):
         self.component_name: bytes = component_name
 
     def parse(self, f: BinaryIO, body_size: int):
-        begin = f.tell()
-        self.version = f.read(1)
-        self.flags = f.read(3)
-        self.component_type = self.read_ascii(f, 4)
-        self.component_subtype = self.read_ascii(f, 4)
-        self.component_name = f.read(body_size - (f.tell() - begin))
+        body = f.read(body_size)
+        offset = self.layout.unpack_from(self, body)
+        self.component_name = body[offset:]
         return self
 
     def print(self, depth=0):
@@ -388,31 +559,28 @@ class HdlrBox(LeafBox):
         self.print_with_indent(f" - componentSubtype: {self.component_subtype}", depth)
         self.print_with_indent(f" - componentName: {self.component_name.decode('ascii')}", depth)
 
-    def write(self, f: BinaryIO):
-        self.write_type_and_size(f, "hdlr", self.get_size())
-        f.write(self.version)
-        f.write(self.flags)
-        self.write_ascii(f, self.component_type)
-        self.write_ascii(f, self.component_subtype)
-        f.write(self.component_name)
+    def pack_into(self, buffer: bytearray, offset: int) -> int:
+        offset = self.pack_type_and_size(buffer, offset, "hdlr", self.cached_size())
+        offset = self.layout.pack_into(self, buffer, offset)
+        return self.pack_bytes(buffer, offset, self.component_name)
 
     def get_size(self) -> int:
-        return self.get_overall_size(1 + 3 + 4 * 2 + len(self.component_name))
+        return self.get_overall_size(self.layout.size + len(self.component_name))
 
 
+@register_box("vmhd")
 class VmhdBox(LeafBox):
+    layout = FieldLayout([("version", "bytes1"), ("flags", "bytes3"), ("graphics_mode", "u16"), ("opcolor", "u16", 3)])
+
     def __init__(self, box_type: str):
         super().__init__(box_type)
         self.version: bytes = b''
         self.flags: bytes = b''
         self.graphics_mode: int = 0
-        self.opcolor: list[int] = []
+        self.opcolor: list[int] = [0, 0, 0]
 
     def parse(self, f: BinaryIO, body_size: int):
-        self.version = f.read(1)
-        self.flags = f.read(3)
-        self.graphics_mode = self.read_int(f, 2)
-        self.opcolor = [self.read_int(f, 2), self.read_int(f, 2), self.read_int(f, 2)]
+        self.layout.read(self, f)
         return self
 
     def print(self, depth=0):
@@ -423,19 +591,18 @@ class VmhdBox(LeafBox):
         self.print_with_indent(f" - graphics_mode: {self.graphics_mode}", depth)
         self.print_with_indent(f" - opcolor: {self.opcolor}", depth)
 
-    def write(self, f: BinaryIO):
-        self.write_type_and_size(f, "vmhd", self.get_size())
-        f.write(self.version)
-        f.write(self.flags)
-        self.write_int(f, self.graphics_mode, 2)
-        for i in range(3):
-            self.write_int(f, self.opcolor[i], 2)
+    def pack_into(self, buffer: bytearray, offset: int) -> int:
+        offset = self.pack_type_and_size(buffer, offset, "vmhd", self.cached_size())
+        return self.layout.pack_into(self, buffer, offset)
 
     def get_size(self) -> int:
-        return self.get_overall_size(1 + 3 + 2 * 4)
+        return self.get_overall_size(self.layout.size)
 
 
+@register_box("smhd")
 class SmhdBox(LeafBox):
+    layout = FieldLayout([("version", "bytes1"), ("flags", "bytes3"), ("balance", "u16"), ("reserved", "bytes2")])
+
     def __init__(self, box_type: str):
         super().__init__(box_type)
         self.version: bytes = b''
@@ -444,10 +611,7 @@ class SmhdBox(LeafBox):
         self.reserved: bytes = b''
 
     def parse(self, f: BinaryIO, body_size: int):
-        self.version = f.read(1)
-        self.flags = f.read(3)
-        self.balance = self.read_int(f, 2)
-        self.reserved = f.read(2)
+        self.layout.read(self, f)
         return self
 
     def print(self, depth=0):
@@ -458,15 +622,12 @@ class SmhdBox(LeafBox):
         self.print_with_indent(f" - balance: {self.balance}", depth)
         self.print_with_indent(f" - reserved: {self.reserved}", depth)
 
-    def write(self, f: BinaryIO):
-        self.write_type_and_size(f, "smhd", self.get_size())
-        f.write(self.version)
-        f.write(self.flags)
-        self.write_int(f, self.balance, 2)
-        f.write(self.reserved)
+    def pack_into(self, buffer: bytearray, offset: int) -> int:
+        offset = self.pack_type_and_size(buffer, offset, "smhd", self.cached_size())
+        return self.layout.pack_into(self, buffer, offset)
 
     def get_size(self) -> int:
-        return self.get_overall_size(1 + 3 + 2 * 2)
+        return self.get_overall_size(self.layout.size)
 
 
 class TmhdBox(LeafBox):
@@ -494,12 +655,18 @@ class TmhdBox(LeafBox):
         self.print_with_indent(f" - reserved: {self.reserved}", depth)
 
     def write(self, f: BinaryIO):
-        self.write_type_and_size(f, "tmhd", self.get_size())
+        self.write_type_and_size(f, "tmhd", self.cached_size())
         f.write(self.version)
         f.write(self.flags)
         self.write_int(f, self.balance, 2)
         f.write(self.reserved)
 
+    def pack_into(self, buffer: bytearray, offset: int) -> int:
+        offset = self.pack_type_and_size(buffer, offset, "tmhd", self.cached_size())
+        full_box_header.pack_into(buffer, offset, self.version, self.flags)
+        offset = self.pack_int(buffer, offset + full_box_header.size, self.balance, 2)
+        return self.pack_bytes(buffer, offset, self.reserved)
+
     def get_size(self) -> int:
         return self.get_overall_size(1 + 3 + 2 * 2)
 
@@ -525,15 +692,21 @@ class UrlBox(LeafBox):
         self.print_with_indent(f" - data: {self.data.hex()}", depth)
 
     def write(self, f: BinaryIO):
-        self.write_type_and_size(f, self.box_type, self.get_size())
+        self.write_type_and_size(f, self.box_type, self.cached_size())
         f.write(self.version)
         f.write(self.flags)
         f.write(self.data)
 
+    def pack_into(self, buffer: bytearray, offset: int) -> int:
+        offset = self.pack_type_and_size(buffer, offset, self.box_type, self.cached_size())
+        full_box_header.pack_into(buffer, offset, self.version, self.flags)
+        return self.pack_bytes(buffer, offset + full_box_header.size, self.data)
+
     def get_size(self) -> int:
         return self.get_overall_size(1 + 3 + len(self.data))
 
 
+@register_box("dref")
 class DrefBox(LeafBox):
     def __init__(self, box_type: str, version: bytes = b'\x00', flags: bytes = b'\x00\x00\x00',
                  number_of_entries: int = 0, data_references=None):
@@ -565,13 +738,21 @@ class DrefBox(LeafBox):
             ref.print(depth + 1)
 
     def write(self, f: BinaryIO):
-        self.write_type_and_size(f, "dref", self.get_size())
+        self.write_type_and_size(f, "dref", self.cached_size())
         f.write(self.version)
         f.write(self.flags)
         self.write_int(f, self.number_of_entries)
         for ref in self.data_references:
             ref.write(f)
 
+    def pack_into(self, buffer: bytearray, offset: int) -> int:
+        offset = self.pack_type_and_size(buffer, offset, "dref", self.cached_size())
+        table_box_header.pack_into(buffer, offset, self.version, self.flags, self.number_of_entries)
+        offset += table_box_header.size
+        for ref in self.data_references:
+            offset = ref.pack_into(buffer, offset)
+        return offset
+
     def get_size(self) -> int:
         url_all_size = 0
         for ref in self.data_references:
@@ -580,6 +761,7 @@ class DrefBox(LeafBox):
 
 
 
+@register_box("stsd")
 class StsdBox(LeafBox):
     def __init__(self, box_type: str, version: bytes = b'\x00', flags: bytes = b'\x00\x00\x00',
                  number_of_entries: int = 0, sample_description_table=None):
@@ -610,13 +792,21 @@ class StsdBox(LeafBox):
             sample_description.print(depth + 1)
 
     def write(self, f: BinaryIO):
-        self.write_type_and_size(f, "stsd", self.get_size())
+        self.write_type_and_size(f, "stsd", self.cached_size())
         f.write(self.version)
         f.write(self.flags)
         self.write_int(f, self.number_of_entries)
         for sample_description in self.sample_description_table:
             sample_description.write(f)
 
+    def pack_into(self, buffer: bytearray, offset: int) -> int:
+        offset = self.pack_type_and_size(buffer, offset, "stsd", self.cached_size())
+        table_box_header.pack_into(buffer, offset, self.version, self.flags, self.number_of_entries)
+        offset += table_box_header.size
+        for sample_description in self.sample_description_table:
+            offset = sample_description.pack_into(buffer, offset)
+        return offset
+
     def get_size(self) -> int:
         table_all_size = 0
         for sample_description in self.sample_description_table:
@@ -669,6 +859,16 @@ class RawMixCodec(Mp4Component):
             self.write_fixed_float32(f, info.concentration)
             self.write_fixed_float32(f, info.max_amount)
 
+    def pack_into(self, buffer: bytearray, offset: int) -> int:
+        if self.number_of_entries == 0:
+            return self.pack_int(buffer, offset, 0)
+        offset = self.pack_int(buffer, offset, self.number_of_entries)
+        for info in self.infos:
+            offset = self.pack_ascii(buffer, offset, info.name)
+            offset = self.pack_fixed_float32(buffer, offset, info.concentration)
+            offset = self.pack_fixed_float32(buffer, offset, info.max_amount)
+        return offset
+
 
     def get_size(self) -> int:
         if self.number_of_entries == 0:
@@ -677,6 +877,9 @@ class RawMixCodec(Mp4Component):
 
 
 class SampleDescription(Mp4Component):
+    # sample_description_size の後の固定長部分
+    layout = FieldLayout([("data_format", "ascii4"), ("reserved1", "bytes6"), ("data_reference_index", "u16")])
+
     def __init__(self, sample_description_size: int = None, data_format: str = "", reserved1: bytes = bytes(6),
                  data_reference_index: int = 0, rest: bytes = b'', mix_info : RawMixCodec | None = None):
         super().__init__()
@@ -688,21 +891,17 @@ class SampleDescription(Mp4Component):
         self.rest: bytes = rest
 
     def parse(self, f: BinaryIO):
-        begin = f.tell()
         self.sample_description_size = self.read_int(f, 4)
         if self.sample_description_size == 0:
             return self
-        self.data_format = self.read_ascii(f, 4)
-
-
-        self.reserved1 = f.read(6)
-        self.data_reference_index = self.read_int(f, 2)
+        body = f.read(self.sample_description_size - 4)
+        offset = self.layout.unpack_from(self, body)
 
         if self.data_format == "rmix":
             self.mix_info = RawMixCodec()
-            self.mix_info.parse(f)
+            self.mix_info.parse(io.BytesIO(body[offset:]))
         else:
-            self.rest = f.read(self.sample_description_size - (f.tell() - begin))
+            self.rest = body[offset:]
         return self
 
     def print(self, depth=0):
@@ -719,45 +918,62 @@ class SampleDescription(Mp4Component):
 
 
     def write(self, f: BinaryIO):
+        buffer = bytearray(self.get_size())
+        self.pack_into(buffer, 0)
+        f.write(buffer)
+
+    def pack_into(self, buffer: bytearray, offset: int) -> int:
         if self.sample_description_size == 0:
-            self.write_int(f, 0)
-            return
+            return self.pack_int(buffer, offset, 0)
         if self.sample_description_size is None:
             self.sample_description_size = self.get_size() + 8
-        self.write_int(f, self.get_size())
-        self.write_ascii(f, self.data_format)
-        f.write(self.reserved1)
-        self.write_int(f, self.data_reference_index, length=2)
-
+        offset = self.pack_int(buffer, offset, self.get_size())
+        offset = self.layout.pack_into(self, buffer, offset)
         if self.data_format == "rmix":
-            self.mix_info.write(f)
-        else:
-            f.write(self.rest)
+            return self.mix_info.pack_into(buffer, offset)
+        return self.pack_bytes(buffer, offset, self.rest)
 
     def get_size(self) -> int:
         if self.sample_description_size == 0:
             return 4
         body_len =  self.mix_info.get_size() if self.data_format == "rmix" else len(self.rest)
-        return 4 + 4 + 6 + 2 + body_len
+        return 4 + self.layout.size + body_len
 
 
+@register_box("stts")
 class SttsBox(LeafBox):
     def __init__(self, box_type: str, version: bytes = b'\x00', flags: bytes = b'\x00\x00\x00',
                  number_of_entries: int = 0, time_to_sample_table=None):
         super().__init__(box_type)
         if time_to_sample_table is None:
-            time_to_sample_table = []
+            time_to_sample_table = np.zeros(number_of_entries, dtype=time_to_sample_dtype)
         self.version: bytes = version
         self.flags: bytes = flags
-        self.number_of_entries: int = number_of_entries
-        self.time_to_sample_table: list[TimeToSample] = time_to_sample_table
+        self.time_to_sample_table = time_to_sample_table
+
+    @property
+    def number_of_entries(self) -> int:
+        """
+        エントリ数(テーブルの長さ)
+        """
+        return len(self.time_to_sample_table)
+
+    @property
+    def time_to_sample_table(self) -> EntryTable:
+        """
+        sample_count, sample_delta を持つエントリのテーブル
+        """
+        return self._time_to_sample_table
+
+    @time_to_sample_table.setter
+    def time_to_sample_table(self, table: list['TimeToSample'] | np.ndarray | EntryTable):
+        self._time_to_sample_table = EntryTable(table, time_to_sample_dtype, owner=self)
 
     def parse(self, f: BinaryIO, body_size: int):
         self.version = f.read(1)
         self.flags = f.read(3)
-        self.number_of_entries = self.read_int(f, 4)
-        for i in range(self.number_of_entries):
-            self.time_to_sample_table.append(TimeToSample().parse(f))
+        number_of_entries = self.read_int(f, 4)
+        self.time_to_sample_table = self.read_array(f, time_to_sample_dtype, number_of_entries)
         return self
 
     def print(self, depth=0):
@@ -768,24 +984,29 @@ class SttsBox(LeafBox):
         self.print_with_indent(f" - number of entries: {self.number_of_entries}", depth)
         self.print_with_indent(f" - time to sample data:", depth)
         for time_to_sample in self.time_to_sample_table:
-            time_to_sample.print(depth + 1)
+            self.print_with_indent(
+                f" - sample_count: {time_to_sample.sample_count}, sample_delta: {time_to_sample.sample_delta}",
+                depth + 1)
 
     def write(self, f: BinaryIO):
-        self.write_type_and_size(f, "stts", self.get_size())
+        self.write_type_and_size(f, "stts", self.cached_size())
         f.write(self.version)
         f.write(self.flags)
         self.write_int(f, self.number_of_entries)
-        for sample_description in self.time_to_sample_table:
-            sample_description.write(f)
+        f.write(self.time_to_sample_table.tobytes())
+
+    def pack_into(self, buffer: bytearray, offset: int) -> int:
+        offset = self.pack_type_and_size(buffer, offset, "stts", self.cached_size())
+        table_box_header.pack_into(buffer, offset, self.version, self.flags, self.number_of_entries)
+        return self.pack_bytes(buffer, offset + table_box_header.size, self.time_to_sample_table)
 
     def get_size(self) -> int:
-        all_size = 0
-        for time_to_sample in self.time_to_sample_table:
-            all_size += time_to_sample.get_size()
-        return self.get_overall_size(1 + 3 + 4 + all_size)
+        return self.get_overall_size(1 + 3 + 4 + time_to_sample_dtype.itemsize * len(self.time_to_sample_table))
 
 
 class TimeToSample(Mp4Component):
+    __slots__ = ("sample_count", "sample_delta")
+
     def __init__(self, sample_count: int = 0, sample_delta: int = 0):
         super().__init__()
         self.sample_count = sample_count
@@ -807,24 +1028,40 @@ class TimeToSample(Mp4Component):
         return 8
 
 
+@register_box("stsc")
 class StscBox(LeafBox):
     def __init__(self, box_type: str, version: bytes = b'\x00', flags: bytes = b'\x00\x00\x00',
                  number_of_entries: int = 0, sample_to_chunk_table=None):
         super().__init__(box_type)
         if sample_to_chunk_table is None:
-            sample_to_chunk_table = []
+            sample_to_chunk_table = np.zeros(number_of_entries, dtype=sample_to_chunk_dtype)
         self.version: bytes = version
         self.flags: bytes = flags
-        self.number_of_entries: int = number_of_entries
-        self.sample_to_chunk_table: list[SampleToChunk] = sample_to_chunk_table
+        self.sample_to_chunk_table = sample_to_chunk_table
+
+    @property
+    def number_of_entries(self) -> int:
+        """
+        エントリ数(テーブルの長さ)
+        """
+        return len(self.sample_to_chunk_table)
+
+    @property
+    def sample_to_chunk_table(self) -> EntryTable:
+        """
+        first_chunk, samples_per_chunk, sample_description_id を持つエントリのテーブル
+        """
+        return self._sample_to_chunk_table
+
+    @sample_to_chunk_table.setter
+    def sample_to_chunk_table(self, table: list['SampleToChunk'] | np.ndarray | EntryTable):
+        self._sample_to_chunk_table = EntryTable(table, sample_to_chunk_dtype, owner=self)
 
     def parse(self, f: BinaryIO, body_size: int):
         self.version = f.read(1)
         self.flags = f.read(3)
-        self.number_of_entries = self.read_int(f, 4)
-        for i in range(self.number_of_entries):
-            self.sample_to_chunk_table.append(SampleToChunk().parse(f))
-
+        number_of_entries = self.read_int(f, 4)
+        self.sample_to_chunk_table = self.read_array(f, sample_to_chunk_dtype, number_of_entries)
         return self
 
     def print(self, depth=0):
@@ -835,24 +1072,29 @@ class StscBox(LeafBox):
         self.print_with_indent(f" - number of entries: {self.number_of_entries}", depth)
         self.print_with_indent(f" - sample to chunk data:", depth)
         for sample_to_chunk in self.sample_to_chunk_table:
-            sample_to_chunk.print(depth + 1)
+            self.print_with_indent(
+                f" - first_chunk: {sample_to_chunk.first_chunk}, samples_per_chunk: {sample_to_chunk.samples_per_chunk}, sample_description_id:{sample_to_chunk.sample_description_id}",
+                depth + 1)
 
     def write(self, f: BinaryIO):
-        self.write_type_and_size(f, "stsc", self.get_size())
+        self.write_type_and_size(f, "stsc", self.cached_size())
         f.write(self.version)
         f.write(self.flags)
         self.write_int(f, self.number_of_entries)
-        for sample_description in self.sample_to_chunk_table:
-            sample_description.write(f)
+        f.write(self.sample_to_chunk_table.tobytes())
+
+    def pack_into(self, buffer: bytearray, offset: int) -> int:
+        offset = self.pack_type_and_size(buffer, offset, "stsc", self.cached_size())
+        table_box_header.pack_into(buffer, offset, self.version, self.flags, self.number_of_entries)
+        return self.pack_bytes(buffer, offset + table_box_header.size, self.sample_to_chunk_table)
 
     def get_size(self) -> int:
-        all_size = 0
-        for sample_to_chunk in self.sample_to_chunk_table:
-            all_size += sample_to_chunk.get_size()
-        return self.get_overall_size(1 + 3 + 4 + all_size)
+        return self.get_overall_size(1 + 3 + 4 + sample_to_chunk_dtype.itemsize * len(self.sample_to_chunk_table))
 
 
 class SampleToChunk(Mp4Component):
+    __slots__ = ("first_chunk", "samples_per_chunk", "sample_description_id")
+
     def __init__(self, first_chunk: int = 0, samples_per_chunk: int = 0, sample_description_id: int = 0):
         super().__init__()
         self.first_chunk = first_chunk
@@ -879,25 +1121,47 @@ class SampleToChunk(Mp4Component):
         return 12
 
 
+@register_box("stsz")
 class StszBox(LeafBox):
     def __init__(self, box_type: str, version: bytes = b'\x00', flags: bytes = b'\x00\x00\x00', sample_size: int = 0,
                  number_of_entries: int = 0, sample_size_table=None):
         super().__init__(box_type)
         if sample_size_table is None:
-            sample_size_table = []
+            sample_size_table = np.zeros(number_of_entries if sample_size == 0 else 0, dtype=">u4")
         self.version: bytes = version
         self.flags: bytes = flags
         self.sample_size: int = sample_size
-        self.number_of_entries: int = number_of_entries
-        self.sample_size_table: list[int] = sample_size_table
+        # 全サンプルが同じサイズ(sample_size が0でない)場合のサンプル数
+        self.sample_count: int = number_of_entries if sample_size != 0 else 0
+        self.sample_size_table = sample_size_table
+
+    @property
+    def number_of_entries(self) -> int:
+        """
+        サンプル数(sample_size が0の場合はテーブルの長さ)
+        """
+        if self.sample_size == 0:
+            return len(self.sample_size_table)
+        return self.sample_count
+
+    @property
+    def sample_size_table(self) -> EntryTable:
+        return self._sample_size_table
+
+    @sample_size_table.setter
+    def sample_size_table(self, table: list[int] | np.ndarray | EntryTable):
+        self._sample_size_table = EntryTable(table, ">u4", owner=self)
 
     def parse(self, f: BinaryIO, body_size: int):
         self.version = f.read(1)
         self.flags = f.read(3)
         self.sample_size = self.read_int(f, 4)
-        self.number_of_entries = self.read_int(f, 4)
-        for i in range(self.number_of_entries):
-            self.sample_size_table.append(self.read_int(f, 4))
+        number_of_entries = self.read_int(f, 4)
+        # sample_size が0でない場合(全サンプルが同じサイズ)はテーブルは存在しない
+        if self.sample_size == 0:
+            self.sample_size_table = self.read_array(f, ">u4", number_of_entries)
+        else:
+            self.sample_count = number_of_entries
         return self
 
     def print(self, depth=0):
@@ -910,39 +1174,63 @@ class StszBox(LeafBox):
         self.print_with_indent(f" - sample to size data:{self.sample_size_table}", depth)
 
     def write(self, f: BinaryIO):
-        self.write_type_and_size(f, "stsz", self.get_size())
+        self.write_type_and_size(f, "stsz", self.cached_size())
         f.write(self.version)
         f.write(self.flags)
         self.write_int(f, self.sample_size)
         self.write_int(f, self.number_of_entries)
-        for sample_size in self.sample_size_table:
-            self.write_int(f, sample_size)
+        f.write(self.sample_size_table.tobytes())
+
+    def pack_into(self, buffer: bytearray, offset: int) -> int:
+        offset = self.pack_type_and_size(buffer, offset, "stsz", self.cached_size())
+        full_box_header.pack_into(buffer, offset, self.version, self.flags)
+        offset = self.pack_int(buffer, offset + full_box_header.size, self.sample_size)
+        offset = self.pack_int(buffer, offset, self.number_of_entries)
+        return self.pack_bytes(buffer, offset, self.sample_size_table)
 
     def get_size(self) -> int:
-        return self.get_overall_size(1 + 3 + 4 + 4 + 4 * self.number_of_entries)
+        return self.get_overall_size(1 + 3 + 4 + 4 + 4 * len(self.sample_size_table))
 
 
+@register_box("stco")
 class StcoBox(LeafBox):
+    # チャンクオフセットの型(co64では64bit)
+    offset_dtype = np.dtype(">u4")
+
     def __init__(self, box_type: str, version: bytes = b'\x00', flags: bytes = b'\x00\x00\x00',
                  number_of_entries: int = 0, chunk_to_offset_table=None):
         super().__init__(box_type)
         if chunk_to_offset_table is None:
-            chunk_to_offset_table = []
+            # エントリ数だけを指定した場合は、オフセットが決まるまで0で埋めておく
+            chunk_to_offset_table = np.zeros(number_of_entries, dtype=self.offset_dtype)
         self.version: bytes = version
         self.flags: bytes = flags
-        self.number_of_entries: int = number_of_entries
-        self.chunk_to_offset_table: list[int] = chunk_to_offset_table
+        self.chunk_to_offset_table = chunk_to_offset_table
+
+    @property
+    def number_of_entries(self) -> int:
+        """
+        エントリ数(テーブルの長さ)
+        """
+        return len(self.chunk_to_offset_table)
+
+    @property
+    def chunk_to_offset_table(self) -> EntryTable:
+        return self._chunk_to_offset_table
+
+    @chunk_to_offset_table.setter
+    def chunk_to_offset_table(self, table: list[int] | np.ndarray | EntryTable):
+        self._chunk_to_offset_table = EntryTable(table, self.offset_dtype, owner=self)
 
     def parse(self, f: BinaryIO, body_size: int):
         self.version = f.read(1)
         self.flags = f.read(3)
-        self.number_of_entries = self.read_int(f, 4)
-        for i in range(self.number_of_entries):
-            self.chunk_to_offset_table.append(self.read_int(f, 4))
+        number_of_entries = self.read_int(f, 4)
+        self.chunk_to_offset_table = self.read_array(f, self.offset_dtype, number_of_entries)
         return self
 
     def print(self, depth=0):
-        self.print_with_indent("stco", depth)
+        self.print_with_indent(self.box_type, depth)
         depth += 1  # Increase the depth for nested printing
         self.print_with_indent(f" - version: {self.version.hex()}", depth)
         self.print_with_indent(f" - flags: {self.flags.hex()}", depth)
@@ -950,17 +1238,37 @@ class StcoBox(LeafBox):
         self.print_with_indent(f" - chunk to offset data:{self.chunk_to_offset_table}", depth)
 
     def write(self, f: BinaryIO):
-        self.write_type_and_size(f, "stco", self.get_size())
+        self.write_type_and_size(f, self.box_type, self.cached_size())
         f.write(self.version)
         f.write(self.flags)
         self.write_int(f, self.number_of_entries)
-        for sample_size in self.chunk_to_offset_table:
-            self.write_int(f, sample_size)
+        f.write(self.chunk_to_offset_table.tobytes())
+
+    def pack_into(self, buffer: bytearray, offset: int) -> int:
+        offset = self.pack_type_and_size(buffer, offset, self.box_type, self.cached_size())
+        table_box_header.pack_into(buffer, offset, self.version, self.flags, self.number_of_entries)
+        return self.pack_bytes(buffer, offset + table_box_header.size, self.chunk_to_offset_table)
 
     def get_size(self) -> int:
-        return self.get_overall_size(1 + 3 + 4 + 4 * self.number_of_entries)
+        return self.get_overall_size(1 + 3 + 4 + self.offset_dtype.itemsize * len(self.chunk_to_offset_table))
+
 
+@register_box("co64")
+class Co64Box(StcoBox):
+    """
+    64bitのチャンクオフセット(4GiBを超えるファイル用)
+    """
+    offset_dtype = np.dtype(">u8")
+
+    def __init__(self, box_type: str = "co64", version: bytes = b'\x00', flags: bytes = b'\x00\x00\x00',
+                 number_of_entries: int = 0, chunk_to_offset_table=None):
+        super().__init__(box_type, version, flags, number_of_entries, chunk_to_offset_table)
+
+
+@register_box("elst")
 class ElstBox(LeafBox):
+    layout = FieldLayout([("version", "bytes1"), ("flags", "bytes3"), ("number_of_entries", "u32")])
+
     def __init__(self, box_type: str, version: bytes = b'\x00', flags: bytes = b'\x00\x00\x00',
                  number_of_entries: int = 0, edit_list_table=None):
         super().__init__(box_type)
@@ -972,11 +1280,13 @@ class ElstBox(LeafBox):
         self.edit_list_table: list[EditList] = edit_list_table
 
     def parse(self, f: BinaryIO, body_size: int):
-        self.version = f.read(1)
-        self.flags = f.read(3)
-        self.number_of_entries = self.read_int(f, 4)
+        body = f.read(body_size)
+        offset = self.layout.unpack_from(self, body)
+        entry_layout = self.layout_of_version(EditList.layouts, self.version)
         for i in range(self.number_of_entries):
-            self.edit_list_table.append(EditList().parse(f))
+            entry = EditList()
+            offset = entry_layout.unpack_from(entry, body, offset)
+            self.edit_list_table.append(entry)
         return self
 
     def print(self, depth=0):
@@ -989,32 +1299,32 @@ class ElstBox(LeafBox):
         for sample_to_chunk in self.edit_list_table:
             sample_to_chunk.print(depth + 1)
 
-    def write(self, f: BinaryIO):
-        self.write_type_and_size(f, "elst", self.get_size())
-        f.write(self.version)
-        f.write(self.flags)
-        self.write_int(f, self.number_of_entries)
-        for sample_description in self.edit_list_table:
-            sample_description.write(f)
+    def pack_into(self, buffer: bytearray, offset: int) -> int:
+        offset = self.pack_type_and_size(buffer, offset, "elst", self.cached_size())
+        offset = self.layout.pack_into(self, buffer, offset)
+        entry_layout = self.layout_of_version(EditList.layouts, self.version)
+        for edit_list in self.edit_list_table:
+            offset = entry_layout.pack_into(edit_list, buffer, offset)
+        return offset
 
     def get_size(self) -> int:
-        all_size = 0
-        for sample_to_chunk in self.edit_list_table:
-            all_size += sample_to_chunk.get_size()
-        return self.get_overall_size(1 + 3 + 4 + all_size)
+        entry_layout = self.layout_of_version(EditList.layouts, self.version)
+        return self.get_overall_size(self.layout.size + entry_layout.size * len(self.edit_list_table))
 
 
 class EditList(Mp4Component):
+    __slots__ = ("track_duration", "media_time", "media_rate")
+    # elstのversionごとのエントリのレイアウト
+    layouts = FieldLayout.versioned([("track_duration", "time"), ("media_time", "time"), ("media_rate", "fixed32")])
+
     def __init__(self, track_duration: int = 0, media_time: int = 0, media_rate: float = 0):
         super().__init__()
         self.track_duration = track_duration
         self.media_time = media_time
         self.media_rate = media_rate
 
-    def parse(self, f: BinaryIO):
-        self.track_duration = self.read_int(f, 4)
-        self.media_time = self.read_int(f, 4)
-        self.media_rate = self.read_fixed_float32(f)
+    def parse(self, f: BinaryIO, version: bytes = b'\x00'):
+        self.layouts[version].read(self, f)
         return self
 
     def print(self, depth=0):
@@ -1022,10 +1332,450 @@ class EditList(Mp4Component):
             f" - track_duration: {self.track_duration}, media_time: {self.media_time}, media_rate:{self.media_rate}",
             depth)
 
+    def write(self, f: BinaryIO, version: bytes = b'\x00'):
+        buffer = bytearray(self.get_size(version))
+        self.layouts[version].pack_into(self, buffer, 0)
+        f.write(buffer)
+
+    def get_size(self, version: bytes = b'\x00') -> int:
+        return self.layouts[version].size
+
+@register_box("mfhd")
+class MfhdBox(LeafBox):
+    def __init__(self, box_type: str, version: bytes = b'\x00', flags: bytes = b'\x00\x00\x00',
+                 sequence_number: int = 0):
+        super().__init__(box_type)
+        self.version: bytes = version
+        self.flags: bytes = flags
+        self.sequence_number: int = sequence_number
+
+    def parse(self, f: BinaryIO, body_size: int):
+        self.version = f.read(1)
+        self.flags = f.read(3)
+        self.sequence_number = self.read_int(f, 4)
+        return self
+
+    def print(self, depth=0):
+        self.print_with_indent("mfhd", depth)
+        depth += 1
+        self.print_with_indent(f" - version: {self.version.hex()}", depth)
+        self.print_with_indent(f" - flags: {self.flags.hex()}", depth)
+        self.print_with_indent(f" - sequence_number: {self.sequence_number}", depth)
+
+    def write(self, f: BinaryIO):
+        self.write_type_and_size(f, "mfhd", self.cached_size())
+        f.write(self.version)
+        f.write(self.flags)
+        self.write_int(f, self.sequence_number)
+
+    def pack_into(self, buffer: bytearray, offset: int) -> int:
+        offset = self.pack_type_and_size(buffer, offset, "mfhd", self.cached_size())
+        table_box_header.pack_into(buffer, offset, self.version, self.flags, self.sequence_number)
+        return offset + table_box_header.size
+
+    def get_size(self) -> int:
+        return self.get_overall_size(1 + 3 + 4)
+
+
+@register_box("tfhd")
+class TfhdBox(LeafBox):
+    base_data_offset_present = 0x000001
+    sample_description_index_present = 0x000002
+    default_sample_duration_present = 0x000008
+    default_sample_size_present = 0x000010
+    default_sample_flags_present = 0x000020
+    duration_is_empty = 0x010000
+    default_base_is_moof = 0x020000
+
+    def __init__(self, box_type: str, version: bytes = b'\x00', flags: bytes = b'\x02\x00\x00', track_id: int = 0,
+                 base_data_offset: int | None = None, sample_description_index: int | None = None,
+                 default_sample_duration: int | None = None, default_sample_size: int | None = None,
+                 default_sample_flags: int | None = None):
+        super().__init__(box_type)
+        self.version: bytes = version
+        self.flags: bytes = flags
+        self.track_id: int = track_id
+        self.base_data_offset = base_data_offset
+        self.sample_description_index = sample_description_index
+        self.default_sample_duration = default_sample_duration
+        self.default_sample_size = default_sample_size
+        self.default_sample_flags = default_sample_flags
+
+    def __optional_fields(self) -> list[tuple[int, str, int]]:
+        return [
+            (self.base_data_offset_present, "base_data_offset", 8),
+            (self.sample_description_index_present, "sample_description_index", 4),
+            (self.default_sample_duration_present, "default_sample_duration", 4),
+            (self.default_sample_size_present, "default_sample_size", 4),
+            (self.default_sample_flags_present, "default_sample_flags", 4),
+        ]
+
+    @property
+    def flag_bits(self) -> int:
+        """
+        フラグ(存在するオプションフィールドのビットは値から決める)
+        """
+        bits = int.from_bytes(self.flags, 'big')
+        for flag, name, _ in self.__optional_fields():
+            bits = bits | flag if getattr(self, name) is not None else bits & ~flag
+        return bits
+
+    def parse(self, f: BinaryIO, body_size: int):
+        self.version = f.read(1)
+        self.flags = f.read(3)
+        self.track_id = self.read_int(f, 4)
+        bits = int.from_bytes(self.flags, 'big')
+        for flag, name, length in self.__optional_fields():
+            setattr(self, name, self.read_int(f, length) if bits & flag else None)
+        return self
+
+    def print(self, depth=0):
+        self.print_with_indent("tfhd", depth)
+        depth += 1
+        self.print_with_indent(f" - version: {self.version.hex()}", depth)
+        self.print_with_indent(f" - flags: {self.flag_bits:06x}", depth)
+        self.print_with_indent(f" - track_id: {self.track_id}", depth)
+        for _, name, _ in self.__optional_fields():
+            if getattr(self, name) is not None:
+                self.print_with_indent(f" - {name}: {getattr(self, name)}", depth)
+
+    def write(self, f: BinaryIO):
+        self.write_type_and_size(f, "tfhd", self.cached_size())
+        f.write(self.version)
+        self.write_int(f, self.flag_bits, length=3)
+        self.write_int(f, self.track_id)
+        for _, name, length in self.__optional_fields():
+            if getattr(self, name) is not None:
+                self.write_int(f, getattr(self, name), length=length)
+
+    def pack_into(self, buffer: bytearray, offset: int) -> int:
+        offset = self.pack_type_and_size(buffer, offset, "tfhd", self.cached_size())
+        offset = self.pack_bytes(buffer, offset, self.version)
+        offset = self.pack_int(buffer, offset, self.flag_bits, length=3)
+        offset = self.pack_int(buffer, offset, self.track_id)
+        for _, name, length in self.__optional_fields():
+            if getattr(self, name) is not None:
+                offset = self.pack_int(buffer, offset, getattr(self, name), length=length)
+        return offset
+
+    def get_size(self) -> int:
+        optional_size = sum(length for _, name, length in self.__optional_fields() if getattr(self, name) is not None)
+        return self.get_overall_size(1 + 3 + 4 + optional_size)
+
+
+@register_box("tfdt")
+class TfdtBox(LeafBox):
+    def __init__(self, box_type: str, version: bytes = b'\x01', flags: bytes = b'\x00\x00\x00',
+                 base_media_decode_time: int = 0):
+        super().__init__(box_type)
+        self.version: bytes = version
+        self.flags: bytes = flags
+        self.base_media_decode_time: int = base_media_decode_time
+
+    def parse(self, f: BinaryIO, body_size: int):
+        self.version = f.read(1)
+        self.flags = f.read(3)
+        self.base_media_decode_time = self.read_int(f, 8 if self.version == b'\x01' else 4)
+        return self
+
+    def print(self, depth=0):
+        self.print_with_indent("tfdt", depth)
+        depth += 1
+        self.print_with_indent(f" - version: {self.version.hex()}", depth)
+        self.print_with_indent(f" - flags: {self.flags.hex()}", depth)
+        self.print_with_indent(f" - base_media_decode_time: {self.base_media_decode_time}", depth)
+
+    def write(self, f: BinaryIO):
+        self.write_type_and_size(f, "tfdt", self.cached_size())
+        f.write(self.version)
+        f.write(self.flags)
+        self.write_int(f, self.base_media_decode_time, length=8 if self.version == b'\x01' else 4)
+
+    def pack_into(self, buffer: bytearray, offset: int) -> int:
+        offset = self.pack_type_and_size(buffer, offset, "tfdt", self.cached_size())
+        full_box_header.pack_into(buffer, offset, self.version, self.flags)
+        return self.pack_int(buffer, offset + full_box_header.size, self.base_media_decode_time,
+                             length=8 if self.version == b'\x01' else 4)
+
+    def get_size(self) -> int:
+        return self.get_overall_size(1 + 3 + (8 if self.version == b'\x01' else 4))
+
+
+@register_box("trun")
+class TrunBox(LeafBox):
+    # data_offset は符号付き
+    signed_int = struct.Struct(">i")
+    data_offset_present = 0x000001
+    first_sample_flags_present = 0x000004
+    # (フラグ, フィールド名) サンプルごとに存在するフィールド
+    sample_fields = [
+        (0x000100, "sample_duration"),
+        (0x000200, "sample_size"),
+        (0x000400, "sample_flags"),
+        (0x000800, "sample_composition_time_offset"),
+    ]
+
+    def __init__(self, box_type: str, version: bytes = b'\x00', flags: bytes = b'\x00\x03\x01',
+                 data_offset: int | None = None, first_sample_flags: int | None = None, entries=None):
+        super().__init__(box_type)
+        self.version: bytes = version
+        self.flags: bytes = flags
+        self.data_offset: int | None = data_offset
+        self.first_sample_flags: int | None = first_sample_flags
+        if entries is None:
+            entries = np.zeros(0, dtype=self.entries_dtype(int.from_bytes(flags, 'big'), version))
+        self.entries: np.ndarray = entries
+
+    @classmethod
+    def entries_dtype(cls, flag_bits: int, version: bytes) -> np.dtype:
+        """
+        フラグに応じたサンプルエントリの構造化dtype
+        """
+        fields = []
+        for flag, name in cls.sample_fields:
+            if flag_bits & flag:
+                signed = name == "sample_composition_time_offset" and version != b'\x00'
+                fields.append((name, ">i4" if signed else ">u4"))
+        return np.dtype(fields)
+
+    @property
+    def sample_count(self) -> int:
+        return len(self.entries)
+
+    @property
+    def flag_bits(self) -> int:
+        bits = int.from_bytes(self.flags, 'big') & 0xFF00FA
+        if self.data_offset is not None:
+            bits |= self.data_offset_present
+        if self.first_sample_flags is not None:
+            bits |= self.first_sample_flags_present
+        for flag, name in self.sample_fields:
+            if self.entries.dtype.names is not None and name in self.entries.dtype.names:
+                bits |= flag
+        return bits
+
+    def parse(self, f: BinaryIO, body_size: int):
+        self.version = f.read(1)
+        self.flags = f.read(3)
+        bits = int.from_bytes(self.flags, 'big')
+        sample_count = self.read_int(f, 4)
+        self.data_offset = None
+        if bits & self.data_offset_present:
+            self.data_offset = int.from_bytes(f.read(4), byteorder='big', signed=True)
+        self.first_sample_flags = self.read_int(f, 4) if bits & self.first_sample_flags_present else None
+        self.entries = self.read_array(f, self.entries_dtype(bits, self.version), sample_count)
+        return self
+
+    def print(self, depth=0):
+        self.print_with_indent("trun", depth)
+        depth += 1
+        self.print_with_indent(f" - version: {self.version.hex()}", depth)
+        self.print_with_indent(f" - flags: {self.flag_bits:06x}", depth)
+        self.print_with_indent(f" - sample_count: {self.sample_count}", depth)
+        self.print_with_indent(f" - data_offset: {self.data_offset}", depth)
+        self.print_with_indent(f" - first_sample_flags: {self.first_sample_flags}", depth)
+        self.print_with_indent(f" - entries: {self.entries}", depth)
+
+    def write(self, f: BinaryIO):
+        self.write_type_and_size(f, "trun", self.cached_size())
+        f.write(self.version)
+        self.write_int(f, self.flag_bits, length=3)
+        self.write_int(f, self.sample_count)
+        if self.data_offset is not None:
+            f.write(self.data_offset.to_bytes(4, 'big', signed=True))
+        if self.first_sample_flags is not None:
+            self.write_int(f, self.first_sample_flags)
+        f.write(self.entries.tobytes())
+
+    def pack_into(self, buffer: bytearray, offset: int) -> int:
+        offset = self.pack_type_and_size(buffer, offset, "trun", self.cached_size())
+        offset = self.pack_bytes(buffer, offset, self.version)
+        offset = self.pack_int(buffer, offset, self.flag_bits, length=3)
+        offset = self.pack_int(buffer, offset, self.sample_count)
+        if self.data_offset is not None:
+            self.signed_int.pack_into(buffer, offset, self.data_offset)
+            offset += self.signed_int.size
+        if self.first_sample_flags is not None:
+            offset = self.pack_int(buffer, offset, self.first_sample_flags)
+        return self.pack_bytes(buffer, offset, self.entries)
+
+    def get_size(self) -> int:
+        optional_size = (4 if self.data_offset is not None else 0) + (4 if self.first_sample_flags is not None else 0)
+        return self.get_overall_size(1 + 3 + 4 + optional_size + self.entries.dtype.itemsize * self.sample_count)
+
+
+@register_box("trex")
+class TrexBox(LeafBox):
+    # track_id から default_sample_flags まで
+    trex_fields = struct.Struct(">5I")
+
+    def __init__(self, box_type: str, version: bytes = b'\x00', flags: bytes = b'\x00\x00\x00', track_id: int = 0,
+                 default_sample_description_index: int = 1, default_sample_duration: int = 0,
+                 default_sample_size: int = 0, default_sample_flags: int = 0):
+        super().__init__(box_type)
+        self.version: bytes = version
+        self.flags: bytes = flags
+        self.track_id: int = track_id
+        self.default_sample_description_index: int = default_sample_description_index
+        self.default_sample_duration: int = default_sample_duration
+        self.default_sample_size: int = default_sample_size
+        self.default_sample_flags: int = default_sample_flags
+
+    def parse(self, f: BinaryIO, body_size: int):
+        self.version = f.read(1)
+        self.flags = f.read(3)
+        self.track_id = self.read_int(f, 4)
+        self.default_sample_description_index = self.read_int(f, 4)
+        self.default_sample_duration = self.read_int(f, 4)
+        self.default_sample_size = self.read_int(f, 4)
+        self.default_sample_flags = self.read_int(f, 4)
+        return self
+
+    def print(self, depth=0):
+        self.print_with_indent("trex", depth)
+        depth += 1
+        self.print_with_indent(f" - version: {self.version.hex()}", depth)
+        self.print_with_indent(f" - flags: {self.flags.hex()}", depth)
+        self.print_with_indent(f" - track_id: {self.track_id}", depth)
+        self.print_with_indent(f" - default_sample_description_index: {self.default_sample_description_index}", depth)
+        self.print_with_indent(f" - default_sample_duration: {self.default_sample_duration}", depth)
+        self.print_with_indent(f" - default_sample_size: {self.default_sample_size}", depth)
+        self.print_with_indent(f" - default_sample_flags: {self.default_sample_flags}", depth)
+
     def write(self, f: BinaryIO):
-        self.write_int(f, self.track_duration)
-        self.write_int(f, self.media_time)
-        self.write_fixed_float32(f, self.media_rate)
+        self.write_type_and_size(f, "trex", self.cached_size())
+        f.write(self.version)
+        f.write(self.flags)
+        self.write_int(f, self.track_id)
+        self.write_int(f, self.default_sample_description_index)
+        self.write_int(f, self.default_sample_duration)
+        self.write_int(f, self.default_sample_size)
+        self.write_int(f, self.default_sample_flags)
+
+    def pack_into(self, buffer: bytearray, offset: int) -> int:
+        offset = self.pack_type_and_size(buffer, offset, "trex", self.cached_size())
+        full_box_header.pack_into(buffer, offset, self.version, self.flags)
+        self.trex_fields.pack_into(buffer, offset + full_box_header.size, self.track_id,
+                                   self.default_sample_description_index, self.default_sample_duration,
+                                   self.default_sample_size, self.default_sample_flags)
+        return offset + full_box_header.size + self.trex_fields.size
+
+    def get_size(self) -> int:
+        return self.get_overall_size(1 + 3 + 4 * 5)
+
+
+@register_box("tfra")
+class TfraBox(LeafBox):
+    # version, flags, track_id, 番号の長さ, エントリ数
+    tfra_header = struct.Struct(">1s3sIII")
+    # 長さ(バイト数) -> structのフォーマット(3バイトの番号は bytes として書く)
+    entry_formats = {1: "B", 2: "H", 3: "3s", 4: "I", 8: "Q"}
+
+    def __init__(self, box_type: str, version: bytes = b'\x01', flags: bytes = b'\x00\x00\x00', track_id: int = 0,
+                 length_size_of_traf_num: int = 0, length_size_of_trun_num: int = 0,
+                 length_size_of_sample_num: int = 0, entries: list[tuple[int, int, int, int, int]] = None):
+        """
+        entries : list[tuple[int, int, int, int, int]]
+            (time, moof_offset, traf_number, trun_number, sample_number) のリスト
+        """
+        super().__init__(box_type)
+        self.version: bytes = version
+        self.flags: bytes = flags
+        self.track_id: int = track_id
+        self.length_size_of_traf_num = length_size_of_traf_num
+        self.length_size_of_trun_num = length_size_of_trun_num
+        self.length_size_of_sample_num = length_size_of_sample_num
+        self.entries: list[tuple[int, int, int, int, int]] = [] if entries is None else entries
+
+    def __lengths(self) -> list[int]:
+        time_length = 8 if self.version == b'\x01' else 4
+        return [time_length, time_length, self.length_size_of_traf_num + 1, self.length_size_of_trun_num + 1,
+                self.length_size_of_sample_num + 1]
+
+    def parse(self, f: BinaryIO, body_size: int):
+        self.version = f.read(1)
+        self.flags = f.read(3)
+        self.track_id = self.read_int(f, 4)
+        length_sizes = self.read_int(f, 4)
+        self.length_size_of_traf_num = (length_sizes >> 4) & 0b11
+        self.length_size_of_trun_num = (length_sizes >> 2) & 0b11
+        self.length_size_of_sample_num = length_sizes & 0b11
+        number_of_entries = self.read_int(f, 4)
+        lengths = self.__lengths()
+        self.entries = [tuple(self.read_int(f, length) for length in lengths) for _ in range(number_of_entries)]
+        return self
+
+    def print(self, depth=0):
+        self.print_with_indent("tfra", depth)
+        depth += 1
+        self.print_with_indent(f" - version: {self.version.hex()}", depth)
+        self.print_with_indent(f" - track_id: {self.track_id}", depth)
+        self.print_with_indent(f" - entries: {self.entries}", depth)
+
+    def write(self, f: BinaryIO):
+        self.write_type_and_size(f, "tfra", self.cached_size())
+        f.write(self.version)
+        f.write(self.flags)
+        self.write_int(f, self.track_id)
+        self.write_int(f, (self.length_size_of_traf_num << 4) | (self.length_size_of_trun_num << 2)
+                       | self.length_size_of_sample_num)
+        self.write_int(f, len(self.entries))
+        lengths = self.__lengths()
+        for entry in self.entries:
+            for value, length in zip(entry, lengths):
+                self.write_int(f, value, length=length)
+
+    def pack_into(self, buffer: bytearray, offset: int) -> int:
+        offset = self.pack_type_and_size(buffer, offset, "tfra", self.cached_size())
+        length_sizes = (self.length_size_of_traf_num << 4) | (self.length_size_of_trun_num << 2) \
+            | self.length_size_of_sample_num
+        self.tfra_header.pack_into(buffer, offset, self.version, self.flags, self.track_id, length_sizes,
+                                   len(self.entries))
+        offset += self.tfra_header.size
+        lengths = self.__lengths()
+        entry_struct = struct.Struct(">" + "".join(self.entry_formats[length] for length in lengths))
+        three_byte = [i for i, length in enumerate(lengths) if length == 3]
+        for entry in self.entries:
+            if three_byte:
+                entry = list(entry)
+                for i in three_byte:
+                    entry[i] = entry[i].to_bytes(3, 'big')
+            entry_struct.pack_into(buffer, offset, *entry)
+            offset += entry_struct.size
+        return offset
+
+    def get_size(self) -> int:
+        return self.get_overall_size(1 + 3 + 4 + 4 + 4 + sum(self.__lengths()) * len(self.entries))
+
+
+@register_box("mfro")
+class MfroBox(LeafBox):
+    def __init__(self, box_type: str, version: bytes = b'\x00', flags: bytes = b'\x00\x00\x00', size: int = 0):
+        super().__init__(box_type)
+        self.version: bytes = version
+        self.flags: bytes = flags
+        self.size: int = size
+
+    def parse(self, f: BinaryIO, body_size: int):
+        self.version = f.read(1)
+        self.flags = f.read(3)
+        self.size = self.read_int(f, 4)
+        return self
+
+    def print(self, depth=0):
+        self.print_with_indent("mfro", depth)
+        self.print_with_indent(f" - size: {self.size}", depth + 1)
+
+    def write(self, f: BinaryIO):
+        self.write_type_and_size(f, "mfro", self.cached_size())
+        f.write(self.version)
+        f.write(self.flags)
+        self.write_int(f, self.size)
+
+    def pack_into(self, buffer: bytearray, offset: int) -> int:
+        offset = self.pack_type_and_size(buffer, offset, "mfro", self.cached_size())
+        table_box_header.pack_into(buffer, offset, self.version, self.flags, self.size)
+        return offset + table_box_header.size
 
     def get_size(self) -> int:
-        return 12
\ No newline at end of file
+        return self.get_overall_size(1 + 3 + 4)
@@ -0,0 +1,129 @@
+import errno
+import io
+import os
+from typing import BinaryIO
+
+# カーネル内コピーがこのファイル(の組み合わせ)では使えないことを示すエラー
+unsupported_errnos = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP, errno.ENOTSOCK,
+                      errno.EBADF}
+
+
+class RangeWriter:
+    """
+    書き込み先に、bytes と元ファイルの範囲 (start, length) を順に書き出す
+        連続する範囲はまとめてから、os.copy_file_range → os.sendfile → 読み書きのループ の順に、
+        使える方法でコピーする。前の2つはカーネル内でコピーするので、バイト列がPythonを通らない
+    """
+    # 使うカーネル内コピーの方法(空にすると常に読み書きでコピーする)
+    methods = ("copy_file_range", "sendfile")
+    # これより短い範囲は、システムコールと書き込み先のフラッシュを避けて読み書きでコピーする
+    min_kernel_copy = 64 * 1024
+    # 読み書きでコピーするときのバッファの最大サイズ
+    buffer_size = 8 * 1024 * 1024
+
+    def __init__(self, dst: BinaryIO, source: BinaryIO | None = None):
+        """
+        Parameters
+        ----------
+        dst : BinaryIO
+            書き込み先(ファイルでない場合は読み書きでコピーする)
+        source : BinaryIO | None
+            範囲の読み込み元ファイル
+        """
+        self.dst = dst
+        self.source = source
+        self.pending_start = 0
+        self.pending_length = 0
+        # 方法ごとのコピーしたバイト数
+        self.copied: dict[str, int] = {"copy_file_range": 0, "sendfile": 0, "read": 0}
+        self.__dst_fd = self.__fileno(dst)
+        self.__source_fd = self.__fileno(source)
+        self.__methods = [method for method in self.methods if hasattr(os, method)]
+        if self.__dst_fd is None or self.__source_fd is None:
+            self.__methods = []
+
+    @staticmethod
+    def __fileno(f: BinaryIO | None) -> int | None:
+        if f is None:
+            return None
+        try:
+            return f.fileno()
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            return None
+
+    def write(self, data: bytes):
+        if len(data) == 0:
+            return
+        self.flush()
+        self.dst.write(data)
+
+    def copy(self, start: int, length: int):
+        """
+        元ファイルの start から length バイトを書き出す(直前の範囲と連続していればまとめる)
+        """
+        if length == 0:
+            return
+        if self.source is None:
+            raise Exception("source file of streaming sample data is unknown")
+        if self.pending_length > 0 and self.pending_start + self.pending_length == start:
+            self.pending_length += length
+            return
+        self.flush()
+        self.pending_start, self.pending_length = start, length
+
+    def flush(self):
+        """
+        まとめている範囲をコピーする
+        """
+        if self.pending_length == 0:
+            return
+        start, length = self.pending_start, self.pending_length
+        self.pending_length = 0
+        if length >= self.min_kernel_copy:
+            while self.__methods and length > 0:
+                done = self.__kernel_copy(self.__methods[0], start, length)
+                start, length = start + done, length - done
+        if length > 0:
+            self.__copy_by_read(start, length)
+
+    def __kernel_copy(self, method: str, start: int, length: int) -> int:
+        """
+        method でコピーし、コピーできたバイト数を返す。method が使えなかった場合は以後使わない
+        """
+        self.dst.flush()
+        position = self.dst.tell()
+        done = 0
+        try:
+            if method == "sendfile":
+                # sendfile は書き込み先のファイル位置に書き込む
+                os.lseek(self.__dst_fd, position, os.SEEK_SET)
+            while done < length:
+                if method == "copy_file_range":
+                    n = os.copy_file_range(self.__source_fd, self.__dst_fd, length - done, start + done,
+                                           position + done)
+                else:
+                    n = os.sendfile(self.__dst_fd, self.__source_fd, start + done, length - done)
+                if n == 0:
+                    raise Exception(f"source file ended before {start + length}")
+                done += n
+        except OSError as e:
+            if e.errno not in unsupported_errnos:
+                raise
+            self.__methods.remove(method)
+        finally:
+            # ファイル位置を直接動かしたので、書き込み先(バッファ付きの場合も)の位置を合わせる
+            self.dst.seek(position + done)
+        self.copied[method] += done
+        return done
+
+    def __copy_by_read(self, start: int, length: int):
+        buffer = memoryview(bytearray(min(self.buffer_size, length)))
+        self.source.seek(start)
+        done = 0
+        while done < length:
+            n = self.source.readinto(buffer[:min(len(buffer), length - done)])
+            if not n:
+                raise Exception(f"source file ended before {start + length}")
+            self.dst.write(buffer[:n])
+            done += n
+        self.copied["read"] += done
@@ -0,0 +1 @@
+from .player import FlavPlayer
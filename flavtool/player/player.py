@@ -0,0 +1,211 @@
+import asyncio
+from typing import Any, AsyncIterator
+
+import numpy as np
+
+from flavtool.analyzer.flavMp4 import media_types
+from flavtool.reader import FlavReader
+
+
+class FlavPlayer:
+    """
+    FlavMP4のトラックのサンプルを、メディアの時刻に合わせて非同期に取り出すプレイヤー
+        各サンプルの時刻は再生開始時の単調時計(イベントループの時計)を基準に決めるので、
+        sleepを積み重ねる場合のように遅れが蓄積しない。読み込みはスレッドプールで先読みする。
+        1つのイベントループで複数のプレイヤーを同時に再生できる
+
+    >>> async for t, frame in FlavPlayer("input.mp4").play(start=10.0):
+    ...     apply_taste(frame)
+    """
+
+    def __init__(self, path: str | None = None, media_type: media_types = "tast", reader: FlavReader | None = None,
+                 decode: bool = True, read_ahead: int = 32, max_lateness: float | None = None):
+        """
+        Parameters
+        ----------
+        path : str | None
+            FlavMP4ファイルのパス(reader を渡す場合は不要)
+        media_type : media_types
+            再生するトラック
+        reader : FlavReader | None
+            共有するリーダー(None なら path から作る)
+        decode : bool
+            True ならトラックのコーデックでデコードした配列を、False ならサンプルのバイト列を返す
+        read_ahead : int
+            先読みするサンプル数
+        max_lateness : float | None
+            予定時刻からこの秒数以上遅れたサンプルは捨てる(None なら遅れても必ず返す)
+        """
+        if reader is None:
+            if path is None:
+                raise Exception("path or reader is required")
+            reader = FlavReader(path)
+            self.__owns_reader = True
+        else:
+            self.__owns_reader = False
+        self.reader = reader
+        self.media_type = media_type
+        self.decode = decode
+        self.read_ahead = read_ahead
+        self.max_lateness = max_lateness
+
+        index = reader.index(media_type)
+        time_scale = reader.flav_mp4.tracks[media_type].media.header.time_scale
+        self.times: np.ndarray = index.decode_times / time_scale
+        self.duration: float = index.duration / time_scale
+
+        self.__loop: asyncio.AbstractEventLoop | None = None
+        self.__queue: asyncio.Queue | None = None
+        self.__producer: asyncio.Task | None = None
+        self.__changed = asyncio.Event()
+        self.__generation = 0
+        # 再生中は、メディア時刻 m のサンプルの予定時刻が origin + m になる
+        self.__origin = 0.0
+        self.__position = 0.0
+        self.__paused = False
+        self.__stopped = False
+
+    @property
+    def position(self) -> float:
+        """
+        現在のメディア時刻(秒)
+        """
+        if self.__loop is None or self.__paused:
+            return self.__position
+        return self.__loop.time() - self.__origin
+
+    @property
+    def paused(self) -> bool:
+        return self.__paused
+
+    def seek(self, t: float):
+        """
+        メディア時刻 t (秒) に移動する。再生中でも先読みし直すだけで、play() は止まらない
+        """
+        self.__position = min(max(t, 0.0), self.duration)
+        self.__generation += 1
+        if self.__loop is not None:
+            self.__origin = self.__loop.time() - self.__position
+            self.__start_producer()
+        self.__changed.set()
+
+    def pause(self):
+        if self.__paused:
+            return
+        self.__position = self.position
+        self.__paused = True
+        self.__changed.set()
+
+    def resume(self):
+        if not self.__paused:
+            return
+        self.__paused = False
+        if self.__loop is not None:
+            self.__origin = self.__loop.time() - self.__position
+        self.__changed.set()
+
+    def stop(self):
+        """
+        再生を終了する(play() のループが終わる)
+        """
+        self.__stopped = True
+        self.__changed.set()
+
+    def close(self):
+        self.stop()
+        self.__cancel_producer()
+        if self.__owns_reader:
+            self.reader.close()
+
+    async def play(self, start: float | None = None) -> AsyncIterator[tuple[float, Any]]:
+        """
+        (メディア時刻(秒), サンプル) を、その時刻になったときに順に返す
+        Parameters
+        ----------
+        start : float | None
+            開始するメディア時刻(None なら現在の position から)
+        """
+        self.__loop = asyncio.get_running_loop()
+        self.__stopped = False
+        self.seek(self.__position if start is None else start)
+        pending = None
+        try:
+            while not self.__stopped:
+                self.__changed.clear()
+                if self.__paused:
+                    await self.__changed.wait()
+                    continue
+                if pending is None or pending[0] != self.__generation:
+                    pending = await self.__next_item()
+                    if pending is None or pending[0] != self.__generation:
+                        continue
+                _, t, frame = pending
+                if t is None:
+                    return
+                delay = self.__origin + t - self.__loop.time()
+                if delay > 0:
+                    if await self.__wait_changed(delay):
+                        # 一時停止なら同じサンプルを再開後にもう一度待ち、シークなら捨てる
+                        continue
+                elif self.max_lateness is not None and -delay > self.max_lateness:
+                    pending = None
+                    continue
+                pending = None
+                yield t, frame
+        finally:
+            self.__cancel_producer()
+
+    async def __next_item(self):
+        """
+        先読みキューから次のサンプルを取り出す。待っている間に操作があった場合は None を返す
+        """
+        queue = self.__queue
+        if not queue.empty():
+            return queue.get_nowait()
+        get = asyncio.ensure_future(queue.get())
+        changed = asyncio.ensure_future(self.__changed.wait())
+        done, _ = await asyncio.wait({get, changed}, return_when=asyncio.FIRST_COMPLETED)
+        changed.cancel()
+        if get in done:
+            return get.result()
+        get.cancel()
+        return None
+
+    async def __wait_changed(self, timeout: float) -> bool:
+        """
+        timeout 秒待つ。その間に操作(seek, pause, stop)があれば True を返す
+        """
+        try:
+            await asyncio.wait_for(self.__changed.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def __start_producer(self):
+        self.__cancel_producer()
+        self.__queue = asyncio.Queue(maxsize=self.read_ahead)
+        first = int(np.searchsorted(self.times, self.__position, side="left"))
+        self.__producer = self.__loop.create_task(self.__produce(self.__queue, self.__generation, first))
+
+    def __cancel_producer(self):
+        if self.__producer is not None:
+            self.__producer.cancel()
+            self.__producer = None
+
+    async def __produce(self, queue: asyncio.Queue, generation: int, first: int):
+        """
+        サンプルを read_ahead 個ずつスレッドプールで読み込み、キューに入れる
+        """
+        loop = asyncio.get_running_loop()
+        sample_n = len(self.times)
+        for begin in range(first, sample_n, self.read_ahead):
+            samples = range(begin, min(begin + self.read_ahead, sample_n))
+            frames = await loop.run_in_executor(None, self.__read, samples)
+            for i, frame in zip(samples, frames):
+                await queue.put((generation, float(self.times[i]), frame))
+        await queue.put((generation, None, None))
+
+    def __read(self, samples: range) -> list:
+        if self.decode:
+            return [self.reader.decode_sample(self.media_type, i) for i in samples]
+        return [self.reader.read_sample(self.media_type, i) for i in samples]
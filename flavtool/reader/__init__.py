@@ -0,0 +1 @@
+from .reader import FlavReader
@@ -0,0 +1,138 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from flavtool.analyzer import FlavMP4
+from flavtool.analyzer.flavMp4 import media_types
+from flavtool.analyzer.media_data import SampleIndex
+from flavtool.codec import get_decoder
+from flavtool.parser import Parser
+
+
+class FlavReader:
+    """
+    FlavMP4の任意のトラックの任意のサンプルを読み出すクラス
+        ファイルディスクリプタを共有して os.pread で読み込み、チャンク単位でLRUキャッシュする。
+        連続再生ではサンプルごとではなくチャンクごとに1回の読み込みになる
+    """
+
+    def __init__(self, path: str, cache_chunks: int = 16, flav_mp4: FlavMP4 | None = None):
+        """
+        Parameters
+        ----------
+        path : str
+            FlavMP4ファイルのパス
+        cache_chunks : int
+            キャッシュするチャンクの最大数
+        flav_mp4 : FlavMP4 | None
+            解析済みのFlavMP4(None ならメタデータだけを読む Parser.probe で作る)
+        """
+        self.path = path
+        if flav_mp4 is None:
+            flav_mp4 = Parser(path).probe(lazy=True)
+        self.flav_mp4: FlavMP4 = flav_mp4
+        self.cache_chunks = cache_chunks
+        # (メディアタイプ, チャンク番号) -> (チャンクのファイル上の位置, チャンクのバイト列)
+        self.__cache: OrderedDict[tuple[str, int], tuple[int, bytes]] = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        if self.__fd is not None:
+            os.close(self.__fd)
+            self.__fd = None
+        self.__cache.clear()
+
+    def index(self, media_type: media_types) -> SampleIndex:
+        media_data = self.flav_mp4.media_datas[media_type]
+        if media_data is None:
+            raise Exception(f"track {media_type} does not exist")
+        return media_data.index
+
+    def sample_count(self, media_type: media_types) -> int:
+        return len(self.index(media_type))
+
+    def read_sample(self, media_type: media_types, i: int) -> bytes:
+        """
+        サンプル i のバイト列を返す(チャンクごとキャッシュされる)
+        """
+        index = self.index(media_type)
+        chunk_id = int(index.chunk_ids[i])
+        chunk_offset, chunk = self.__get_chunk(media_type, index, chunk_id)
+        begin = int(index.offsets[i]) - chunk_offset
+        return chunk[begin: begin + int(index.sizes[i])]
+
+    def decode_sample(self, media_type: media_types, i: int) -> np.ndarray:
+        """
+        サンプル i を、トラックのコーデックでデコードした配列を返す
+        """
+        return self.decoder(media_type)(self.read_sample(media_type, i))
+
+    def decoder(self, media_type: media_types):
+        sample_table = self.flav_mp4.sample_tables[media_type]
+        codec = sample_table.sample_description.sample_description_table[0].data_format
+        return get_decoder(codec)
+
+    def read_chunk(self, media_type: media_types, chunk_id: int) -> bytes:
+        """
+        チャンク chunk_id (0始まり) のバイト列を返す
+        """
+        return self.__get_chunk(media_type, self.index(media_type), chunk_id)[1]
+
+    def __get_chunk(self, media_type: media_types, index: SampleIndex, chunk_id: int) -> tuple[int, bytes]:
+        key = (media_type, chunk_id)
+        with self.__lock:
+            cached = self.__cache.get(key)
+            if cached is not None:
+                self.__cache.move_to_end(key)
+                return cached
+        first = int(np.searchsorted(index.chunk_ids, chunk_id, side="left"))
+        last = int(np.searchsorted(index.chunk_ids, chunk_id, side="right")) - 1
+        if first > last:
+            return 0, b''
+        chunk_offset = int(index.offsets[first])
+        if chunk_offset < 0:
+            raise Exception(f"chunk {chunk_id} of {media_type} is not stored in the file")
+        size = int(index.offsets[last] + index.sizes[last]) - chunk_offset
+        entry = (chunk_offset, self.__pread(size, chunk_offset))
+        with self.__lock:
+            self.__cache[key] = entry
+            self.__cache.move_to_end(key)
+            while len(self.__cache) > self.cache_chunks:
+                self.__cache.popitem(last=False)
+        return entry
+
+    def __pread(self, size: int, offset: int) -> bytes:
+        """
+        offset から size バイトを読む。1回の読み込みで足りない場合は読み足し、途中でファイルが終われば例外を出す
+        """
+        data = self.__read_at(size, offset)
+        if len(data) == size:
+            return data
+        parts = [data]
+        done = len(data)
+        while done < size:
+            part = self.__read_at(size - done, offset + done)
+            if len(part) == 0:
+                raise Exception(f"{self.path} ended at {offset + done} while reading {size} bytes from {offset}")
+            parts.append(part)
+            done += len(part)
+        return b"".join(parts)
+
+    def __read_at(self, size: int, offset: int) -> bytes:
+        if self.__fd is None:
+            raise Exception("reader is already closed")
+        if hasattr(os, "pread"):
+            return os.pread(self.__fd, size, offset)
+        # os.pread がない環境(Windows)ではシークと読み込みをまとめてロックする
+        with self.__lock:
+            os.lseek(self.__fd, offset, os.SEEK_SET)
+            return os.read(self.__fd, size)
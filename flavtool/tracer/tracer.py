@@ -0,0 +1,78 @@
+import time
+
+
+class BoxTrace:
+    """
+    1つのBoxのパース記録
+    """
+
+    def __init__(self, box_type: str, offset: int, size: int, elapsed: float, depth: int):
+        self.box_type = box_type
+        self.offset = offset
+        self.size = size
+        self.elapsed = elapsed
+        self.depth = depth
+
+    def __str__(self):
+        return f"{'  ' * self.depth}{self.box_type} offset:{self.offset} size:{self.size} " \
+               f"elapsed:{self.elapsed * 1000:.3f}ms"
+
+
+class Tracer:
+    """
+    パース・合成の処理を記録するトレーサ(デフォルトは無効)
+        無効の時は呼び出し側が enabled を確認するだけで、何も記録しない
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.dump_trees = False
+        self.records: list[BoxTrace] = []
+        self.depth = 0
+
+    def enable(self, dump_trees=False):
+        """
+        トレースを有効にする
+        Parameters
+        ----------
+        dump_trees : bool
+            合成・生成したBoxツリーを print() で出力する
+        """
+        self.enabled = True
+        self.dump_trees = dump_trees
+
+    def disable(self):
+        self.enabled = False
+        self.dump_trees = False
+
+    def clear(self):
+        self.records = []
+
+    def now(self) -> float:
+        return time.perf_counter()
+
+    def box(self, box_type: str, offset: int, size: int, begin: float):
+        """
+        Boxのパース結果を記録する(begin は now() で取得した開始時刻)
+        """
+        self.records.append(BoxTrace(box_type, offset, size, time.perf_counter() - begin, self.depth))
+
+    def tree(self, box):
+        """
+        dump_trees が有効なら、Boxツリーを出力する
+        """
+        if self.enabled and self.dump_trees:
+            box.print()
+
+    def summary(self) -> dict[str, tuple[int, int, float]]:
+        """
+        Boxタイプごとの (個数, 合計サイズ, 合計パース時間) を返す
+        """
+        result: dict[str, tuple[int, int, float]] = {}
+        for record in self.records:
+            count, size, elapsed = result.get(record.box_type, (0, 0, 0.0))
+            result[record.box_type] = (count + 1, size + record.size, elapsed + record.elapsed)
+        return result
+
+
+tracer = Tracer()
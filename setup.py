@@ -13,6 +13,11 @@ setup(
     long_description_content_type="text/markdown",
     url="https://github.com/hmwri/flavtool",
     packages=find_packages(),
+    entry_points={
+        "console_scripts": [
+            "flavtool=flavtool.cli:main",
+        ],
+    },
     classifiers=[
         "Programming Language :: Python :: 3.7",
         "License :: OSI Approved :: MIT License",
@@ -0,0 +1,64 @@
+import pytest
+
+from flavtool.analyzer import analyze, FlavMP4
+from flavtool.analyzer.media_data import StreamingSampleData
+from flavtool.composer import Composer
+from flavtool.composer.utils import SyntheticMp4Creator
+from flavtool.parser import Parser
+
+
+def samples_of(flav_mp4: FlavMP4, path: str | None = None) -> dict[str, list[tuple[bytes, int]]]:
+    """
+    トラックごとの (サンプルのバイト列, 長さ) のリスト。StreamingSampleData は path のファイルから読む
+    """
+    raw = None
+    result = {}
+    for media_type, media_data in flav_mp4.media_datas.items():
+        if media_data is None:
+            continue
+        samples = []
+        for chunk in media_data.data:
+            for sample in chunk.samples:
+                if isinstance(sample, StreamingSampleData):
+                    if raw is None:
+                        with open(path, "rb") as f:
+                            raw = f.read()
+                    samples.append((bytes(raw[sample.start:sample.start + sample.length]), sample.delta))
+                else:
+                    samples.append((bytes(sample.data), sample.delta))
+        result[media_type] = samples
+    return result
+
+
+def read_samples(path: str, **parse_options) -> dict[str, list[tuple[bytes, int]]]:
+    """
+    path をパースし直して、トラックごとのサンプルを返す
+    """
+    return samples_of(analyze(Parser(path).parse(**parse_options)), path)
+
+
+@pytest.fixture
+def synthetic_path(tmp_path) -> str:
+    """
+    映像・味トラックを持つ合成MP4のファイル
+    """
+    path = str(tmp_path / "synthetic.mp4")
+    SyntheticMp4Creator(2, sample_rates={"vide": 30, "soun": 20, "tast": 10}).write(path)
+    return path
+
+
+@pytest.fixture
+def moov_last_path(tmp_path) -> str:
+    """
+    synthetic_path と同じ構成で、moovをmdatの後ろに置いたMP4のファイル
+    """
+    flav_mp4 = SyntheticMp4Creator(2, sample_rates={"vide": 30, "soun": 20, "tast": 10}).create()
+    children = flav_mp4.parsed.children
+    moov = flav_mp4.parsed["moov"]
+    children.remove(moov)
+    children.append(moov)
+    composer = Composer(flav_mp4)
+    composer.compose()
+    path = str(tmp_path / "moov_last.mp4")
+    composer.write(path)
+    return path
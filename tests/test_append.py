@@ -0,0 +1,77 @@
+import shutil
+
+import numpy as np
+import pytest
+
+from flavtool.analyzer import analyze
+from flavtool.analyzer.components import TrackComponent
+from flavtool.analyzer.media_data import MediaData, ChunkData, SampleData
+from flavtool.codec import encode_batch
+from flavtool.composer import Composer
+from flavtool.composer.utils import SyntheticMp4Creator, SampleTableCreator, TrackBoxCreator
+from flavtool.parser import Parser
+from flavtool.parser.boxs.leaf import FreeBox
+
+from conftest import read_samples
+
+
+def taste_track(n: int) -> tuple[TrackComponent, MediaData, list[tuple[bytes, int]]]:
+    """
+    n サンプル(1サンプル200)の味トラック
+    """
+    codes, sizes = encode_batch("raw5", np.arange(n * 5, dtype=np.uint8).reshape(n, 5))
+    ends = np.cumsum(sizes).tolist()
+    samples = [(codes[begin:end], 200) for begin, end in zip([0] + ends[:-1], ends)]
+    chunks = [ChunkData([SampleData(data, delta) for data, delta in samples[begin:begin + 7]], "tast",
+                        begin_time=begin * 200) for begin in range(0, n, 7)]
+    sample_table = SampleTableCreator(chunks, codec="raw5").make_sample_table()
+    track = TrackBoxCreator(track_duration=n * 200, media_time_scale=1000, media_duration=n * 200,
+                            component_subtype="tast", component_name="taste", sample_table=sample_table).create()
+    return TrackComponent(track), MediaData("tast", chunks), samples
+
+
+def video_only(path: str, moov_last: bool = False, free_size: int = 0):
+    flav_mp4 = SyntheticMp4Creator(2, sample_rates={"vide": 30}).create()
+    children = flav_mp4.parsed.children
+    if moov_last:
+        moov = flav_mp4.parsed["moov"]
+        children.remove(moov)
+        children.append(moov)
+    if free_size > 0:
+        free = FreeBox("free")
+        free.space = bytes(free_size - 8)
+        children.insert(children.index(flav_mp4.parsed["moov"]) + 1, free)
+    composer = Composer(flav_mp4)
+    composer.compose()
+    composer.write(path)
+
+
+@pytest.mark.parametrize("moov_last, free_size, n", [
+    (False, 0, 50),      # moovが大きくなるのでファイル末尾に移る
+    (True, 0, 50),       # moovを書き直して末尾に置く
+    (False, 4096, 50),   # moovの後ろのfreeに収まる
+    (False, 0, 2000),
+])
+def test_append_taste_track(tmp_path, moov_last, free_size, n):
+    source = str(tmp_path / "source.mp4")
+    video_only(source, moov_last, free_size)
+    path = str(tmp_path / "appended.mp4")
+    shutil.copy(source, path)
+    expected = read_samples(source)
+    video_mdat = [(offset, size) for box_type, offset, size in Parser(source).scan() if box_type == "mdat"][0]
+
+    composer = Composer(analyze(Parser(path).parse(read_mdat_bytes=False)))
+    track, media_data, samples = taste_track(n)
+    composer.set_new_modal("tast", track, media_data)
+    composer.append(["tast"])
+
+    with open(source, "rb") as before, open(path, "rb") as after:
+        offset, size = video_mdat
+        before.seek(offset)
+        after.seek(offset)
+        assert before.read(size) == after.read(size)
+    result = read_samples(path)
+    assert result["vide"] == expected["vide"]
+    assert result["tast"] == samples
+    with open(path, "rb") as f:
+        assert sum(size for _, _, size in Parser(path).scan()) == len(f.read())
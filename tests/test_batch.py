@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+from flavtool.batch import process_file, collect_inputs, run_batch
+from flavtool.composer.utils import SyntheticMp4Creator
+from flavtool.parser.boxs.leaf import MdatBox
+
+from conftest import read_samples
+
+
+@pytest.fixture
+def closed_mdats(monkeypatch) -> list[MdatBox]:
+    """
+    close() が呼ばれたMdatBoxのリスト
+    """
+    closed = []
+    close = MdatBox.close
+
+    def recording_close(self):
+        closed.append(self)
+        close(self)
+    monkeypatch.setattr(MdatBox, "close", recording_close)
+    return closed
+
+
+def test_run_batch(tmp_path):
+    source = tmp_path / "in"
+    os.makedirs(source / "sub")
+    for i, name in enumerate(["a.mp4", "sub/b.mp4"]):
+        SyntheticMp4Creator(1, seed=i).write(str(source / name))
+    (source / "notes.txt").write_text("not an mp4")
+
+    pairs = collect_inputs(str(source), str(tmp_path / "out"))
+    assert [os.path.relpath(output, tmp_path / "out") for _, output in pairs] == ["a.mp4", os.path.join("sub", "b.mp4")]
+    report = run_batch(pairs, workers=1)
+    assert len(report.succeeded) == 2
+    for input_path, output_path in pairs:
+        assert read_samples(output_path) == read_samples(input_path)
+
+
+def test_process_file_closes_mdat_on_success(synthetic_path, tmp_path, closed_mdats):
+    result = process_file(synthetic_path, str(tmp_path / "out.mp4"), read_mdat_bytes=True)
+    assert result.ok
+    assert len(closed_mdats) == 1
+
+
+def test_process_file_closes_mdat_on_failure(synthetic_path, tmp_path, closed_mdats):
+    # 出力先の親がファイルなので書き出しに失敗する
+    (tmp_path / "file").write_text("")
+    result = process_file(synthetic_path, str(tmp_path / "file" / "out.mp4"), read_mdat_bytes=True)
+    assert not result.ok
+    assert len(closed_mdats) == 1
+
+
+def test_process_file_parse_failure(tmp_path, closed_mdats):
+    path = tmp_path / "broken.mp4"
+    path.write_bytes(b"\x00\x00\x00\x10ftypmp42")
+    result = process_file(str(path), str(tmp_path / "out.mp4"))
+    assert not result.ok
+    assert result.error is not None
+    assert closed_mdats == []
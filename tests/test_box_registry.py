@@ -0,0 +1,69 @@
+from typing import BinaryIO
+
+import pytest
+
+from flavtool.analyzer import analyze
+from flavtool.composer import Composer
+from flavtool.parser import Parser, register_box, box_registry
+from flavtool.parser.boxs.container import ContainerBox
+from flavtool.parser.boxs.leaf import LeafBox, UnknownBox, MvhdBox, StszBox
+
+
+class TasteMetaBox(LeafBox):
+    def __init__(self, box_type: str = "tmet", level: int = 0):
+        super().__init__(box_type)
+        self.level = level
+
+    def parse(self, f: BinaryIO, body_size: int):
+        self.level = self.read_int(f, 4)
+        return self
+
+    def write(self, f: BinaryIO):
+        self.write_type_and_size(f, self.box_type, self.cached_size())
+        self.write_int(f, self.level)
+
+    def get_size(self) -> int:
+        return self.get_overall_size(4)
+
+
+@pytest.fixture
+def tmet_path(synthetic_path, tmp_path) -> str:
+    flav_mp4 = analyze(Parser(synthetic_path).parse())
+    tmet = UnknownBox("tmet")
+    tmet.body_data = (7).to_bytes(4, "big")
+    flav_mp4.parsed["moov"].children.append(tmet)
+    composer = Composer(flav_mp4)
+    composer.compose()
+    path = str(tmp_path / "tmet.mp4")
+    composer.write(path)
+    return path
+
+
+@pytest.fixture
+def registered_tmet():
+    register_box("tmet")(TasteMetaBox)
+    yield TasteMetaBox
+    del box_registry["tmet"]
+
+
+def test_builtin_registry():
+    assert box_registry["mvhd"] is MvhdBox
+    assert box_registry["stsz"] is StszBox
+    assert box_registry["moov"] is ContainerBox
+
+
+def test_unknown_box_round_trip(tmet_path, tmp_path):
+    parser = Parser(tmet_path)
+    tmet = parser.parse()["moov"]["tmet"]
+    assert type(tmet) is UnknownBox
+    path = str(tmp_path / "out.mp4")
+    parser.write(path)
+    with open(tmet_path, "rb") as source, open(path, "rb") as out:
+        assert out.read() == source.read()
+
+
+def test_registered_box(tmet_path, registered_tmet):
+    tmet = Parser(tmet_path).parse()["moov"]["tmet"]
+    assert isinstance(tmet, registered_tmet)
+    assert tmet.level == 7
+    assert tmet.parent["mvhd"] is not None
@@ -0,0 +1,77 @@
+from flavtool.analyzer import analyze
+from flavtool.composer import Composer
+from flavtool.composer.utils import SyntheticMp4Creator, EmptyMp4Creator
+from flavtool.parser import Parser
+from flavtool.parser.boxs.container import ContainerBox
+from flavtool.parser.boxs.leaf import FreeBox
+
+from conftest import samples_of, read_samples
+
+
+def test_created_tree_has_parent_links():
+    root = EmptyMp4Creator.create("mp42", ["mp42", "isom"], 1000, 1000)
+    moov = root["moov"]
+    assert moov.parent is root
+    assert moov["mvhd"].parent is moov
+
+    free = FreeBox("free")
+    moov.children.append(free)
+    assert free.parent is moov
+    other = FreeBox("free")
+    moov.children[moov.children.index(free)] = other
+    assert other.parent is moov
+    extra = [FreeBox("free"), FreeBox("free")]
+    moov.children.extend(iter(extra))
+    assert all(box.parent is moov for box in extra)
+    assert moov.children[-2:] == extra
+
+
+def test_leaf_change_invalidates_created_ancestors():
+    flav_mp4 = SyntheticMp4Creator(1).create()
+    moov = flav_mp4.parsed["moov"]
+    size = moov.cached_size()
+    stsz = flav_mp4.tracks["vide"].media.media_info.sample_table.parsed["stsz"]
+    stsz.sample_size_table = stsz.sample_size_table[:-1]
+    assert moov.cached_size() == size - 4
+    assert moov.cached_size() == ContainerBox("moov", list(moov.children)).get_size()
+
+
+def test_created_tree_round_trip(tmp_path):
+    flav_mp4 = SyntheticMp4Creator(2, sample_rates={"vide": 30, "tast": 10}).create()
+    expected = samples_of(flav_mp4)
+    path = str(tmp_path / "out.mp4")
+    composer = Composer(flav_mp4)
+    composer.compose()
+    composer.write(path)
+
+    layout = Parser(path).scan()
+    with open(path, "rb") as f:
+        size = len(f.read())
+    assert sum(box_size for _, _, box_size in layout) == size
+    assert read_samples(path) == expected
+
+
+def test_every_list_change_invalidates_the_owner():
+    root = EmptyMp4Creator.create("mp42", ["mp42", "isom"], 1000, 1000)
+    moov = root["moov"]
+    children = moov.children
+    changes = [
+        lambda: children.append(FreeBox("free")),
+        lambda: children.extend([FreeBox("free")]),
+        lambda: children.__iadd__([FreeBox("free")]),
+        lambda: children.insert(0, FreeBox("free")),
+        lambda: children.__setitem__(slice(0, 1), [FreeBox("free"), FreeBox("free")]),
+        lambda: children.pop(0),
+        lambda: children.remove(children[0]),
+        lambda: children.__delitem__(0),
+        lambda: children.reverse(),
+        lambda: children.sort(key=lambda box: box.box_type),
+    ]
+    for change in changes:
+        root.cached_size()
+        change()
+        assert "size_cache" not in root.__dict__
+        assert all(box.parent is moov for box in children)
+        assert moov.cached_size() == 8 + sum(child.get_size() for child in children)
+    children.clear()
+    assert moov.cached_size() == 8
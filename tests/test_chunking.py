@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+
+from flavtool.analyzer import analyze
+from flavtool.composer import Composer
+from flavtool.composer.utils import SyntheticMp4Creator, ChunkingPolicy
+from flavtool.parser import Parser
+
+from conftest import samples_of, read_samples
+
+policies = [ChunkingPolicy(samples=2), ChunkingPolicy(size=10000), ChunkingPolicy(duration=0.25),
+            ChunkingPolicy(duration=1.0, samples=7)]
+
+
+def check_chunks(flav_mp4, policy: ChunkingPolicy):
+    for media_type, media_data in flav_mp4.media_datas.items():
+        if media_data is None:
+            continue
+        time_scale = flav_mp4.tracks[media_type].media.header.time_scale
+        for chunk in media_data.data:
+            deltas, sizes = chunk.sample_arrays()
+            if len(sizes) == 1:
+                continue
+            if policy.samples is not None:
+                assert len(sizes) <= policy.samples
+            if policy.size is not None:
+                assert sizes.sum() <= policy.size
+            if policy.duration is not None:
+                assert deltas.sum() <= policy.duration * time_scale
+
+
+def compose_and_reparse(flav_mp4, path, chunking):
+    composer = Composer(flav_mp4, chunking=chunking)
+    composer.compose()
+    composer.write(path)
+    with open(path, "rb") as f:
+        assert sum(size for _, _, size in Parser(path).scan()) == len(f.read())
+    return analyze(Parser(path).parse())
+
+
+@pytest.mark.parametrize("policy", policies)
+@pytest.mark.parametrize("parse_options", [{}, {"use_mmap": True}, {"read_mdat_bytes": False}])
+def test_parsed_round_trip(synthetic_path, tmp_path, policy, parse_options):
+    expected = read_samples(synthetic_path)
+    flav_mp4 = analyze(Parser(synthetic_path).parse(**parse_options))
+    path = str(tmp_path / "chunked.mp4")
+    result = compose_and_reparse(flav_mp4, path, policy)
+    assert samples_of(result) == expected
+    check_chunks(result, policy)
+
+
+@pytest.mark.parametrize("policy", policies)
+def test_created_round_trip(tmp_path, policy):
+    flav_mp4 = SyntheticMp4Creator(2, sample_rates={"vide": 30, "soun": 20, "tast": 10}).create()
+    expected = samples_of(flav_mp4)
+    path = str(tmp_path / "chunked.mp4")
+    result = compose_and_reparse(flav_mp4, path, policy)
+    assert samples_of(result) == expected
+    check_chunks(result, policy)
+
+
+def test_policy_per_media_type(synthetic_path, tmp_path):
+    expected = read_samples(synthetic_path)
+    source_chunks = {media_type: len(media_data.data)
+                     for media_type, media_data in analyze(Parser(synthetic_path).parse()).media_datas.items()
+                     if media_data is not None}
+    flav_mp4 = analyze(Parser(synthetic_path).parse())
+    path = str(tmp_path / "chunked.mp4")
+    result = compose_and_reparse(flav_mp4, path, {"tast": ChunkingPolicy(samples=1)})
+    assert samples_of(result) == expected
+    assert len(result.media_datas["tast"].data) == len(expected["tast"])
+    assert len(result.media_datas["vide"].data) == source_chunks["vide"]
+
+
+def test_rechunk_does_not_create_source_samples(synthetic_path):
+    flav_mp4 = analyze(Parser(synthetic_path).parse(read_mdat_bytes=False))
+    chunks = flav_mp4.media_datas["vide"].data
+    deltas, sizes = chunks[0].sample_arrays()
+    assert chunks[0].materialized is None
+    assert sizes.tolist() == [len(s) for s in chunks[0].samples]
+
+
+def test_boundaries():
+    policy = ChunkingPolicy(size=10)
+    deltas = np.ones(6, dtype=np.int64)
+    sizes = np.array([4, 4, 4, 20, 1, 1])
+    descriptions = np.array([1, 1, 1, 1, 1, 2])
+    # 上限を超えるサンプルは単独のチャンクになり、サンプル記述が変わる位置でも区切る
+    assert policy.boundaries(deltas, sizes, descriptions).tolist() == [0, 2, 3, 4, 5, 6]
+    with pytest.raises(Exception):
+        ChunkingPolicy(duration=1).boundaries(deltas, sizes, descriptions)
+    with pytest.raises(Exception):
+        ChunkingPolicy()
+
+
+@pytest.mark.parametrize("parse_options", [{}, {"read_mdat_bytes": False}])
+def test_rechunk_keeps_source_chunks_lazy(synthetic_path, tmp_path, parse_options):
+    expected = read_samples(synthetic_path)
+    flav_mp4 = analyze(Parser(synthetic_path).parse(**parse_options))
+    views = [chunk for media_data in flav_mp4.media_datas.values() if media_data is not None
+             for chunk in media_data.data]
+    path = str(tmp_path / "chunked.mp4")
+    result = compose_and_reparse(flav_mp4, path, ChunkingPolicy(samples=3))
+    assert all(view.materialized is None for view in views)
+    assert samples_of(result) == expected
@@ -0,0 +1,56 @@
+import numpy as np
+
+from flavtool.analyzer import analyze
+from flavtool.composer import Composer
+from flavtool.parser import Parser
+from flavtool.parser.boxs.leaf import Co64Box
+
+from conftest import read_samples
+
+
+def test_co64_round_trip(moov_last_path, tmp_path):
+    expected = read_samples(moov_last_path)
+    root = Parser(moov_last_path).parse()
+    flav_mp4 = analyze(root)
+    for sample_table in flav_mp4.sample_tables.values():
+        if sample_table is not None:
+            sample_table.chunk_offset = Co64Box(chunk_to_offset_table=sample_table.chunk_offset.chunk_to_offset_table)
+    # moovはmdatの後ろにあるので、大きくなってもオフセットは変わらない
+    path = str(tmp_path / "co64.mp4")
+    with open(path, "wb") as f:
+        root.write(f)
+    assert read_samples(path) == expected
+
+    composer = Composer(analyze(Parser(path).parse()), faststart=True)
+    composer.compose()
+    out = str(tmp_path / "out.mp4")
+    composer.write(out)
+    result = analyze(Parser(out).parse())
+    assert all(isinstance(sample_table.chunk_offset, Co64Box)
+               for sample_table in result.sample_tables.values() if sample_table is not None)
+    assert read_samples(out) == expected
+
+
+def test_large_offsets_are_promoted(synthetic_path):
+    flav_mp4 = analyze(Parser(synthetic_path).parse())
+    root = flav_mp4.parsed
+    get_mdat_offset = root.get_mdat_offset
+
+    def far_mdat_offset():
+        # mdatが4GiBより後ろにある場合と同じオフセットにする
+        mdat, offset = get_mdat_offset()
+        return mdat, offset + 2 ** 32
+    root.get_mdat_offset = far_mdat_offset
+
+    Composer(flav_mp4).compose()
+    moov = root["moov"]
+    assert moov.cached_size() == len(moov.to_bytes())
+    for sample_table in flav_mp4.sample_tables.values():
+        if sample_table is None:
+            continue
+        co64 = sample_table.chunk_offset
+        assert isinstance(co64, Co64Box)
+        assert sample_table.parsed["stco"] is None
+        offsets = np.asarray(co64.chunk_to_offset_table)
+        assert offsets.min() >= 2 ** 32
+        assert co64.number_of_entries == len(offsets)
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from flavtool.codec import encode_batch, decode_batch, get_encoder, get_decoder
+
+
+@pytest.mark.parametrize("codec", ["raw5", "rmix"])
+def test_batch_round_trip(codec):
+    data = np.random.default_rng(0).integers(0, 256, size=(50, 5), dtype=np.uint8)
+    data[10:20] = data[9]
+    codes, sizes = encode_batch(codec, data)
+    assert len(sizes) == len(data) and int(np.sum(sizes)) == len(codes)
+    assert np.array_equal(decode_batch(codec, codes, sizes), data)
+
+    ends = np.cumsum(sizes).tolist()
+    separated = [codes[begin:end] for begin, end in zip([0] + ends[:-1], ends)]
+    assert np.array_equal(decode_batch(codec, separated), data)
+    assert all(np.array_equal(get_decoder(codec)(get_encoder(codec)(row)), row) for row in data[:5])
+
+
+def test_concatenated_codes_require_sizes():
+    data = np.arange(15, dtype=np.uint8).reshape(3, 5)
+    codes, sizes = encode_batch("rmix", data)
+    with pytest.raises(Exception):
+        decode_batch("rmix", codes)
+    with pytest.raises(Exception):
+        decode_batch("rmix", codes, sizes[:-1])
+
+
+@pytest.mark.parametrize("width", [5, 300])
+def test_rmix_batch_codes_decode_per_frame(width):
+    data = np.random.default_rng(1).integers(0, 4, size=(40, width), dtype=np.uint8)
+    data[5:15] = data[4]
+    codes, sizes = encode_batch("rmix", data)
+    ends = np.cumsum(sizes).tolist()
+    decoder = get_decoder("rmix")
+    assert all(np.array_equal(decoder(codes[begin:end]), row)
+               for begin, end, row in zip([0] + ends[:-1], ends, data))
+
+
+def test_rmix_batch_decode_rejects_frames_of_different_lengths():
+    encoder = get_encoder("rmix")
+    codes = [encoder(np.zeros(5, dtype=np.uint8)), encoder(np.zeros(6, dtype=np.uint8))]
+    assert len(get_decoder("rmix")(codes[1])) == 6
+    with pytest.raises(Exception, match="Decode Error"):
+        decode_batch("rmix", codes)
@@ -0,0 +1,43 @@
+import pytest
+
+from flavtool.analyzer import analyze
+from flavtool.analyzer.media_data import ColumnarMediaData
+from flavtool.composer import Composer
+from flavtool.parser import Parser
+
+from conftest import samples_of, read_samples
+
+
+@pytest.mark.parametrize("parse_options", [{}, {"use_mmap": True}, {"read_mdat_bytes": False}])
+def test_views_match_sample_table(synthetic_path, parse_options):
+    flav_mp4 = analyze(Parser(synthetic_path).parse(**parse_options))
+    assert all(isinstance(media_data, ColumnarMediaData)
+               for media_data in flav_mp4.media_datas.values() if media_data is not None)
+    expected = read_samples(synthetic_path)
+    assert samples_of(flav_mp4, synthetic_path) == expected
+    flav_mp4.mdat.close()
+
+
+@pytest.mark.parametrize("faststart", [False, True])
+def test_compose_twice(moov_last_path, tmp_path, faststart):
+    expected = read_samples(moov_last_path)
+    flav_mp4 = analyze(Parser(moov_last_path).parse())
+    composer = Composer(flav_mp4, faststart=faststart)
+    composer.compose()
+    composer.compose()
+    path = str(tmp_path / "twice.mp4")
+    composer.write(path)
+    assert read_samples(path) == expected
+
+
+def test_subset_compose_keeps_other_views(synthetic_path, tmp_path):
+    expected = read_samples(synthetic_path)
+    flav_mp4 = analyze(Parser(synthetic_path).parse())
+    composer = Composer(flav_mp4)
+    composer.compose(["vide", "soun"])
+    assert samples_of(flav_mp4)["tast"] == expected["tast"]
+
+    composer.compose()
+    path = str(tmp_path / "subset.mp4")
+    composer.write(path)
+    assert read_samples(path) == expected
@@ -0,0 +1,20 @@
+import pytest
+
+from flavtool.analyzer import analyze
+from flavtool.composer import Composer
+from flavtool.parser import Parser
+
+from conftest import read_samples
+
+
+@pytest.mark.parametrize("read_mdat_bytes", [True, False])
+@pytest.mark.parametrize("faststart, order", [(True, ["ftyp", "moov", "mdat"]), (False, ["ftyp", "mdat", "moov"])])
+def test_faststart(moov_last_path, tmp_path, read_mdat_bytes, faststart, order):
+    expected = read_samples(moov_last_path)
+    composer = Composer(analyze(Parser(moov_last_path).parse(read_mdat_bytes=read_mdat_bytes)), faststart=faststart)
+    composer.compose()
+    path = str(tmp_path / "out.mp4")
+    composer.write(path)
+    assert [box_type for box_type, _, _ in Parser(path).scan()] == order
+    assert read_samples(path) == expected
+    assert read_samples(path, read_mdat_bytes=False) == expected
@@ -0,0 +1,122 @@
+import io
+
+import pytest
+
+from flavtool.analyzer import analyze
+from flavtool.composer import Composer
+from flavtool.parser import Parser
+from flavtool.parser.boxs.box import FieldLayout, Mp4Component
+from flavtool.parser.boxs.leaf import MvhdBox, TkhdBox, MdhdBox, HdlrBox, VmhdBox, SmhdBox, ElstBox, EditList
+
+from conftest import read_samples
+
+# 32bitに収まらない時刻(version 1 でだけ書ける)
+large_time = 2 ** 32 + 12345
+
+
+class Fields(Mp4Component):
+    pass
+
+
+def reparse(box):
+    """
+    box を書き出したバイト列から、同じ種類の Box をパースし直す
+    """
+    data = bytes(box.to_bytes())
+    assert len(data) == box.cached_size()
+    parsed = type(box)(box.box_type).parse(io.BytesIO(data[8:]), len(data) - 8)
+    assert bytes(parsed.to_bytes()) == data
+    return parsed
+
+
+def test_field_types_round_trip():
+    layout = FieldLayout([("a", "u8"), ("b", "i32"), ("c", "u64"), ("rate", "fixed32"), ("volume", "fixed16"),
+                          ("name", "ascii4"), ("raw", "bytes3"), ("values", "u16", 3)])
+    assert layout.size == 1 + 4 + 8 + 4 + 2 + 4 + 3 + 6
+    source = Fields()
+    source.a, source.b, source.c = 7, -2, large_time
+    source.rate, source.volume = 1.5, 0.25
+    source.name, source.raw, source.values = "vide", b"\x01\x02\x03", [1, 2, 65535]
+    buffer = bytearray(layout.size + 2)
+    assert layout.pack_into(source, buffer, 2) == len(buffer)
+
+    target = Fields()
+    assert layout.unpack_from(target, buffer, 2) == len(buffer)
+    assert (target.a, target.b, target.c) == (7, -2, large_time)
+    assert (target.rate, target.volume) == (1.5, 0.25)
+    assert (target.name, target.raw, target.values) == ("vide", b"\x01\x02\x03", [1, 2, 65535])
+    with pytest.raises(Exception):
+        layout.unpack_from(target, buffer, 3)
+    with pytest.raises(Exception):
+        FieldLayout([("x", "float")])
+
+
+@pytest.mark.parametrize("version, time", [(b"\x00", 3000), (b"\x01", large_time)])
+def test_versioned_header_boxes_round_trip(version, time):
+    mvhd = reparse(MvhdBox("mvhd", version=version, creation_time=time, modification_time=time + 1, time_scale=600,
+                           duration=time + 2, preferred_rate=1.0, preferred_volume=0.5))
+    assert (mvhd.version, mvhd.creation_time, mvhd.modification_time, mvhd.duration) == \
+           (version, time, time + 1, time + 2)
+    assert (mvhd.time_scale, mvhd.preferred_rate, mvhd.preferred_volume) == (600, 1.0, 0.5)
+    assert mvhd.next_track_id == b"\x00\x00\x00\x01"
+
+    tkhd = reparse(TkhdBox("tkhd", version=version, creation_time=time, track_id=3, duration=time + 2, layer=1,
+                           volume=1.0, track_width=1920.0, track_height=1080.5))
+    assert (tkhd.version, tkhd.creation_time, tkhd.duration, tkhd.track_id) == (version, time, time + 2, 3)
+    assert (tkhd.volume, tkhd.track_width, tkhd.track_height) == (1.0, 1920.0, 1080.5)
+
+    mdhd = reparse(MdhdBox("mdhd", version=version, modification_time=time, time_scale=48000, duration=time + 2,
+                           language=21956, predefines=bytes(2)))
+    assert (mdhd.version, mdhd.modification_time, mdhd.duration) == (version, time, time + 2)
+    assert (mdhd.time_scale, mdhd.language) == (48000, 21956)
+
+    elst = ElstBox("elst", version=version, number_of_entries=2,
+                   edit_list_table=[EditList(time, 0, 1.0), EditList(100, time + 1, 0.5)])
+    elst = reparse(elst)
+    assert [(e.track_duration, e.media_time, e.media_rate) for e in elst.edit_list_table] == \
+           [(time, 0, 1.0), (100, time + 1, 0.5)]
+
+    # version 1 は時刻のフィールドが 64bit になる
+    extra = 4 * 3 if version == b"\x01" else 0
+    assert mvhd.cached_size() == 108 + extra
+    assert tkhd.cached_size() == 92 + extra
+    assert mdhd.cached_size() == 32 + extra
+    assert elst.cached_size() == 16 + (12 + (8 if version == b"\x01" else 0)) * 2
+
+
+def test_unversioned_header_boxes_round_trip():
+    hdlr = reparse(HdlrBox("hdlr", component_type="mhlr", component_subtype="tast", component_name=b"\x00taste"))
+    assert (hdlr.component_type, hdlr.component_subtype, hdlr.component_name) == ("mhlr", "tast", b"\x00taste")
+
+    vmhd = VmhdBox("vmhd")
+    vmhd.version, vmhd.flags, vmhd.graphics_mode, vmhd.opcolor = b"\x00", b"\x00\x00\x01", 64, [1, 2, 3]
+    vmhd = reparse(vmhd)
+    assert (vmhd.flags, vmhd.graphics_mode, vmhd.opcolor) == (b"\x00\x00\x01", 64, [1, 2, 3])
+
+    smhd = SmhdBox("smhd")
+    smhd.version, smhd.flags, smhd.balance, smhd.reserved = b"\x00", b"\x00\x00\x00", 256, b"\x00\x00"
+    smhd = reparse(smhd)
+    assert smhd.balance == 256
+
+
+def test_version1_headers_in_a_file(synthetic_path, tmp_path):
+    expected = read_samples(synthetic_path)
+    flav_mp4 = analyze(Parser(synthetic_path).parse())
+    moov = flav_mp4.parsed["moov"]
+    moov["mvhd"].version = b"\x01"
+    moov["mvhd"].creation_time = large_time
+    for track in moov.children:
+        if track.box_type == "trak":
+            track["tkhd"].version = b"\x01"
+            track["mdia"]["mdhd"].version = b"\x01"
+    composer = Composer(flav_mp4)
+    composer.compose()
+    path = str(tmp_path / "version1.mp4")
+    composer.write(path)
+
+    parsed = Parser(path).parse()
+    assert parsed["moov"]["mvhd"].version == b"\x01"
+    assert parsed["moov"]["mvhd"].creation_time == large_time
+    assert all(track["tkhd"].version == b"\x01" and track["mdia"]["mdhd"].version == b"\x01"
+               for track in parsed["moov"].children if track.box_type == "trak")
+    assert read_samples(path) == expected
@@ -0,0 +1,59 @@
+import pytest
+
+from flavtool.analyzer import analyze
+from flavtool.composer import Composer, FragmentWriter
+from flavtool.parser import Parser
+
+from conftest import samples_of, read_samples
+
+
+@pytest.mark.parametrize("read_mdat_bytes", [True, False])
+def test_fragment_round_trip(synthetic_path, tmp_path, read_mdat_bytes):
+    expected = read_samples(synthetic_path)
+    flav_mp4 = analyze(Parser(synthetic_path).parse(read_mdat_bytes=read_mdat_bytes))
+    path = str(tmp_path / "fragmented.mp4")
+    with open(synthetic_path, "rb") as source, FragmentWriter(path, flav_mp4.parsed) as writer:
+        writer.write_media_datas(flav_mp4.media_datas, 0.5, source=source)
+    # サンプルは書き出し中にだけ作られ、チャンクには残らない
+    assert all(chunk.materialized is None
+               for media_data in flav_mp4.media_datas.values() if media_data is not None
+               for chunk in media_data.data)
+
+    fragmented = analyze(Parser(path).parse())
+    assert fragmented.fragmented
+    assert len(fragmented.moofs) == 4
+    assert samples_of(fragmented) == expected
+    for media_type, media_data in fragmented.media_datas.items():
+        if media_data is not None:
+            assert len(media_data.index) == len(expected[media_type])
+
+
+def test_defragment(synthetic_path, tmp_path):
+    expected = read_samples(synthetic_path)
+    flav_mp4 = analyze(Parser(synthetic_path).parse())
+    fragmented_path = str(tmp_path / "fragmented.mp4")
+    with FragmentWriter(fragmented_path, flav_mp4.parsed) as writer:
+        writer.write_media_datas(flav_mp4.media_datas, 0.5)
+
+    composer = Composer(analyze(Parser(fragmented_path).parse()))
+    composer.compose()
+    path = str(tmp_path / "defragmented.mp4")
+    composer.write(path)
+    result = analyze(Parser(path).parse())
+    assert not result.fragmented
+    assert samples_of(result) == expected
+
+
+def test_init_box_is_not_modified(synthetic_path, tmp_path):
+    expected = read_samples(synthetic_path)
+    flav_mp4 = analyze(Parser(synthetic_path).parse())
+    moov_bytes = bytes(flav_mp4.parsed["moov"].to_bytes())
+    with FragmentWriter(str(tmp_path / "fragmented.mp4"), flav_mp4.parsed) as writer:
+        writer.write_media_datas(flav_mp4.media_datas, 0.5)
+    assert bytes(flav_mp4.parsed["moov"].to_bytes()) == moov_bytes
+    # 同じ FlavMP4 をそのまま compose できる
+    composer = Composer(flav_mp4)
+    composer.compose()
+    path = str(tmp_path / "composed.mp4")
+    composer.write(path)
+    assert read_samples(path) == expected
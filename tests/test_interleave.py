@@ -0,0 +1,75 @@
+import pytest
+
+from flavtool.analyzer import analyze
+from flavtool.composer import Composer
+from flavtool.composer.utils import SyntheticMp4Creator
+from flavtool.parser import Parser
+
+from conftest import read_samples
+
+
+def naive_interleave(flav_mp4, criteria, targets):
+    """
+    基準トラックのチャンクごとに対象トラックのチャンクを1つずつ比べて並べる、素朴な配置
+    """
+    criteria_time_scale = flav_mp4.tracks[criteria].media.header.time_scale
+    chunks, offsets = [], {media_type: [] for media_type in [criteria] + targets}
+    positions = {media_type: 0 for media_type in targets}
+    offset = 0
+
+    def put(media_type, chunk):
+        nonlocal offset
+        offsets[media_type].append(offset)
+        chunks.append(chunk)
+        offset += chunk.get_size()
+
+    for criteria_chunk in flav_mp4.media_datas[criteria].data:
+        put(criteria, criteria_chunk)
+        for media_type in targets:
+            target_chunks = flav_mp4.media_datas[media_type].data
+            time_scale = flav_mp4.tracks[media_type].media.header.time_scale
+            while positions[media_type] < len(target_chunks) and \
+                    target_chunks[positions[media_type]].begin_time * criteria_time_scale <= \
+                    criteria_chunk.end_time * time_scale:
+                put(media_type, target_chunks[positions[media_type]])
+                positions[media_type] += 1
+    for media_type in targets:
+        for chunk in flav_mp4.media_datas[media_type].data[positions[media_type]:]:
+            put(media_type, chunk)
+    return chunks, offsets
+
+
+@pytest.mark.parametrize("sample_rates, samples_per_chunk", [
+    ({"vide": 30}, 5),
+    ({"vide": 29.97, "soun": 43, "tast": 10}, 3),
+    ({"soun": 23.976, "tast": 60, "scnt": 5}, 7),
+    ({"vide": 5, "soun": 60, "tast": 23.976, "scnt": 43}, 1),
+])
+@pytest.mark.parametrize("materialize", [False, True])
+def test_interleave_matches_naive_planner(tmp_path, sample_rates, samples_per_chunk, materialize):
+    path = str(tmp_path / "in.mp4")
+    SyntheticMp4Creator(3.3, sample_rates, samples_per_chunk=samples_per_chunk, seed=1).write(path)
+    flav_mp4 = analyze(Parser(path).parse(read_mdat_bytes=False))
+    if materialize:
+        for media_data in flav_mp4.media_datas.values():
+            if media_data is not None:
+                for chunk in media_data.data:
+                    chunk.samples
+    composer = Composer(flav_mp4)
+    criteria, targets = composer._Composer__select_criteria([mt for mt, t in flav_mp4.tracks.items() if t])
+
+    chunks, offsets = composer._Composer__generate_interleave_chunks(criteria, list(targets))
+    expected_chunks, expected_offsets = naive_interleave(flav_mp4, criteria, list(targets))
+    assert [id(chunk) for chunk in chunks] == [id(chunk) for chunk in expected_chunks]
+    assert offsets == expected_offsets
+
+
+def test_interleaved_output_round_trips(tmp_path):
+    path = str(tmp_path / "in.mp4")
+    SyntheticMp4Creator(3.3, {"vide": 29.97, "soun": 43, "tast": 10}, samples_per_chunk=3, seed=1).write(path)
+    expected = read_samples(path)
+    composer = Composer(analyze(Parser(path).parse()))
+    composer.compose()
+    out = str(tmp_path / "out.mp4")
+    composer.write(out)
+    assert read_samples(out) == expected
@@ -0,0 +1,48 @@
+from flavtool.analyzer import analyze
+from flavtool.composer import Composer
+from flavtool.parser import Parser
+from flavtool.parser.boxs.leaf import LeafBox, MdatBox
+
+from conftest import read_samples
+
+
+def leaves(box):
+    for child in getattr(box, "children", []):
+        if isinstance(child, LeafBox):
+            yield child
+        yield from leaves(child)
+
+
+def test_untouched_lazy_tree_writes_source_bytes(synthetic_path, tmp_path):
+    parser = Parser(synthetic_path)
+    root = parser.parse(lazy=True)
+    assert all(not leaf.is_loaded for leaf in leaves(root) if not isinstance(leaf, MdatBox))
+    path = str(tmp_path / "out.mp4")
+    parser.write(path)
+    with open(synthetic_path, "rb") as source, open(path, "rb") as out:
+        assert out.read() == source.read()
+
+
+def test_lazy_leaf_decodes_on_access(synthetic_path, tmp_path):
+    parser = Parser(synthetic_path)
+    root = parser.parse(lazy=True)
+    eager = Parser(synthetic_path).parse()
+    mvhd = root["moov"]["mvhd"]
+    assert not mvhd.is_loaded
+    assert mvhd.time_scale == eager["moov"]["mvhd"].time_scale
+    assert mvhd.is_loaded
+    assert mvhd.parent is root["moov"]
+
+    mvhd.duration += 1
+    path = str(tmp_path / "out.mp4")
+    parser.write(path)
+    assert Parser(path).parse()["moov"]["mvhd"].duration == eager["moov"]["mvhd"].duration + 1
+
+
+def test_lazy_compose_round_trip(synthetic_path, tmp_path):
+    expected = read_samples(synthetic_path)
+    composer = Composer(analyze(Parser(synthetic_path).parse(lazy=True)))
+    composer.compose()
+    path = str(tmp_path / "out.mp4")
+    composer.write(path)
+    assert read_samples(path) == expected
@@ -0,0 +1,47 @@
+import io
+import mmap
+
+from flavtool.analyzer import analyze
+from flavtool.analyzer.media_data import MediaData
+from flavtool.composer import Composer
+from flavtool.parser import Parser
+
+from conftest import samples_of, read_samples
+
+
+def test_mmap_body_is_zero_copy(synthetic_path):
+    flav_mp4 = analyze(Parser(synthetic_path).parse(use_mmap=True))
+    mdat = flav_mp4.mdat
+    assert isinstance(mdat.mapping, mmap.mmap)
+    assert isinstance(mdat.body, memoryview)
+    with open(synthetic_path, "rb") as f:
+        f.seek(mdat.begin_point)
+        assert bytes(mdat.body) == f.read()
+
+    sample = flav_mp4.media_datas["vide"].data[0].samples[0]
+    assert isinstance(sample.data, memoryview)
+    assert sample.data.obj is mdat.mapping
+
+    media_data = MediaData.from_mdat_box(mdat, flav_mp4.sample_tables["tast"], "tast")
+    assert isinstance(media_data.data[0].samples[0].data, memoryview)
+
+
+def test_mmap_compose_round_trip(synthetic_path, tmp_path):
+    expected = read_samples(synthetic_path)
+    flav_mp4 = analyze(Parser(synthetic_path).parse(use_mmap=True))
+    composer = Composer(flav_mp4)
+    composer.compose()
+    path = str(tmp_path / "out.mp4")
+    composer.write(path)
+    flav_mp4.mdat.close()
+    assert flav_mp4.mdat.mapping is None
+    assert read_samples(path) == expected
+
+
+def test_mmap_falls_back_without_fileno(synthetic_path):
+    with open(synthetic_path, "rb") as f:
+        buffer = io.BytesIO(f.read())
+    flav_mp4 = analyze(Parser(synthetic_path, buffer).parse(use_mmap=True))
+    assert flav_mp4.mdat.mapping is None
+    assert isinstance(flav_mp4.mdat.body, bytes)
+    assert samples_of(flav_mp4) == read_samples(synthetic_path)
@@ -0,0 +1,87 @@
+import io
+
+import pytest
+
+from flavtool.analyzer import analyze
+from flavtool.composer import FragmentWriter
+from flavtool.composer.utils import SyntheticMp4Creator
+from flavtool.parser import Parser
+from flavtool.parser.boxs.box import box_registry, Mp4Component
+from flavtool.parser.boxs.container import ContainerBox
+from flavtool.parser.boxs.leaf import TfraBox
+
+
+def containers(box):
+    for child in box.children:
+        if isinstance(child, ContainerBox):
+            yield child
+            yield from containers(child)
+
+
+def assert_packs_like_write_each(root):
+    for box in containers(root):
+        expected = io.BytesIO()
+        box.write_each(expected)
+        packed = box.to_bytes()
+        assert len(packed) == box.cached_size()
+        assert bytes(packed) == expected.getvalue(), box.box_type
+        # バッファの途中に書き込んでも、前後を壊さずにサイズ分だけ進む
+        buffer = bytearray(b"\xff" * (len(packed) + 8))
+        assert box.pack_into(buffer, 3) == 3 + len(packed)
+        assert buffer[:3] == b"\xff" * 3 and buffer[-5:] == b"\xff" * 5
+        assert buffer[3:-5] == packed
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_parsed_tree_packs_like_write_each(synthetic_path, lazy):
+    root = Parser(synthetic_path).parse(lazy=lazy)
+    assert_packs_like_write_each(root)
+    out = io.BytesIO()
+    root.write(out)
+    with open(synthetic_path, "rb") as f:
+        assert out.getvalue() == f.read()
+
+
+def test_created_tree_packs_like_write_each():
+    flav_mp4 = SyntheticMp4Creator(2, sample_rates={"vide": 30, "soun": 20, "tast": 10, "scnt": 5}).create()
+    assert_packs_like_write_each(flav_mp4.parsed)
+    written, each = io.BytesIO(), io.BytesIO()
+    flav_mp4.parsed.write(written)
+    flav_mp4.parsed.write_each(each)
+    assert written.getvalue() == each.getvalue()
+
+
+def test_fragmented_tree_packs_like_write_each(synthetic_path, tmp_path):
+    flav_mp4 = analyze(Parser(synthetic_path).parse())
+    path = str(tmp_path / "fragmented.mp4")
+    with FragmentWriter(path, flav_mp4.parsed) as writer:
+        writer.write_media_datas(flav_mp4.media_datas, 0.5)
+    root = Parser(path).parse()
+    assert any(box.box_type == "moof" for box in containers(root))
+    assert_packs_like_write_each(root)
+    out = io.BytesIO()
+    root.write(out)
+    with open(path, "rb") as f:
+        assert out.getvalue() == f.read()
+
+
+
+def test_every_box_packs_into_the_buffer():
+    # mdat は to_bytes() でまとめずに書き出すので除く
+    assert [box_type for box_type, cls in box_registry.items()
+            if box_type != "mdat" and cls.pack_into is Mp4Component.pack_into] == []
+
+
+@pytest.mark.parametrize("version", [b"\x00", b"\x01"])
+@pytest.mark.parametrize("length_sizes", [(0, 0, 0), (1, 2, 3), (3, 0, 1)])
+def test_tfra_packs_like_write(version, length_sizes):
+    traf, trun, sample = length_sizes
+    tfra = TfraBox("tfra", version=version, track_id=2, length_size_of_traf_num=traf,
+                   length_size_of_trun_num=trun, length_size_of_sample_num=sample,
+                   entries=[(0, 1000, 1, 1, 1), (3000, 70000, 1, 2, 200), (6000, 140000, 2, 1, 255)])
+    expected = io.BytesIO()
+    tfra.write(expected)
+    packed = bytes(tfra.to_bytes())
+    assert packed == expected.getvalue()
+    parsed = TfraBox("tfra").parse(io.BytesIO(packed[8:]), len(packed) - 8)
+    assert parsed.entries == tfra.entries and parsed.track_id == 2
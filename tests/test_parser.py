@@ -0,0 +1,65 @@
+import pytest
+
+from flavtool.analyzer import analyze
+from flavtool.parser import Parser
+from flavtool.parser.boxs.leaf import FreeBox
+
+from conftest import samples_of, read_samples
+
+
+@pytest.fixture
+def mdat_to_end_path(synthetic_path, tmp_path) -> str:
+    """
+    synthetic_path の末尾のmdatのサイズを0(ファイル末尾まで)にしたファイル
+    """
+    box_type, offset, size = Parser(synthetic_path).scan()[-1]
+    assert box_type == "mdat"
+    with open(synthetic_path, "rb") as f:
+        data = bytearray(f.read())
+    data[offset:offset + 4] = bytes(4)
+    path = str(tmp_path / "mdat_to_end.mp4")
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def test_scan(synthetic_path):
+    layout = Parser(synthetic_path).scan()
+    assert [box_type for box_type, _, _ in layout] == ["ftyp", "moov", "mdat"]
+    with open(synthetic_path, "rb") as f:
+        assert sum(size for _, _, size in layout) == len(f.read())
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_probe_matches_parse(synthetic_path, lazy):
+    expected = read_samples(synthetic_path)
+    flav_mp4 = Parser(synthetic_path).probe(lazy=lazy)
+    assert flav_mp4.mdat.begin_point == analyze(Parser(synthetic_path).parse()).mdat.begin_point
+    assert samples_of(flav_mp4, synthetic_path) == expected
+
+
+def test_mdat_to_end_of_file(synthetic_path, mdat_to_end_path):
+    expected = read_samples(synthetic_path)
+    assert Parser(mdat_to_end_path).scan() == Parser(synthetic_path).scan()
+    assert samples_of(Parser(mdat_to_end_path).probe(), mdat_to_end_path) == expected
+    assert read_samples(mdat_to_end_path) == expected
+    assert read_samples(mdat_to_end_path, read_mdat_bytes=False) == expected
+
+
+@pytest.mark.parametrize("box_type", [b"free", b"skip"])
+def test_probe_skips_free_space(synthetic_path, tmp_path, box_type):
+    expected = read_samples(synthetic_path)
+    space = 4 * 1024 * 1024
+    path = str(tmp_path / "with_free.mp4")
+    with open(synthetic_path, "rb") as f:
+        data = f.read()
+    with open(path, "wb") as f:
+        f.write(data + (8 + space).to_bytes(4, "big") + box_type + bytes(space))
+
+    flav_mp4 = Parser(path).probe()
+    free = flav_mp4.parsed.children[-1]
+    assert isinstance(free, FreeBox)
+    assert (free.space, free.space_size, free.cached_size()) == (b"", space, 8 + space)
+    # 書き出すときは0で埋める
+    assert bytes(free.to_bytes()) == (8 + space).to_bytes(4, "big") + b"free" + bytes(space)
+    assert samples_of(flav_mp4, path) == expected
@@ -0,0 +1,105 @@
+import asyncio
+import time
+
+import pytest
+
+from flavtool.player import FlavPlayer
+from flavtool.reader import FlavReader
+
+from conftest import read_samples
+
+
+def test_plays_every_sample_on_the_media_clock(synthetic_path):
+    expected = read_samples(synthetic_path)["tast"]
+
+    async def run():
+        player = FlavPlayer(synthetic_path, decode=False)
+        got = []
+        begin = time.monotonic()
+        async for t, frame in player.play(start=1.0):
+            got.append((t, bytes(frame), time.monotonic() - begin))
+        player.close()
+        return got
+
+    got = asyncio.run(run())
+    # tast は 10Hz なので、1秒からは後半の10サンプル
+    assert [frame for _, frame, _ in got] == [data for data, _ in expected[10:]]
+    for t, _, elapsed in got:
+        # 予定時刻より前には返さない
+        assert elapsed >= t - 1.0 - 0.01
+    assert got[-1][2] < 1.0 + 0.5
+
+
+def test_pause_seek_and_stop(synthetic_path):
+    async def run():
+        player = FlavPlayer(synthetic_path, decode=False)
+        got = []
+        events = {}
+
+        async def control():
+            await asyncio.sleep(0.25)
+            player.pause()
+            events["paused_at"] = player.position
+            await asyncio.sleep(0.3)
+            events["after_pause"] = player.position
+            events["paused_count"] = len(got)
+            player.resume()
+            await asyncio.sleep(0.1)
+            player.seek(1.5)
+            events["seek_count"] = len(got)
+            await asyncio.sleep(0.25)
+            player.stop()
+
+        task = asyncio.create_task(control())
+        async for t, frame in player.play():
+            got.append(t)
+        await task
+        player.close()
+        return got, events
+
+    got, events = asyncio.run(run())
+    # 一時停止中は時刻が進まず、サンプルも返らない
+    assert events["after_pause"] == events["paused_at"]
+    assert events["paused_count"] == len([t for t in got if t <= events["paused_at"]])
+    # シークした後は 1.5 秒からのサンプルになり、stop() で終わる
+    after_seek = got[events["seek_count"]:]
+    assert after_seek and after_seek[0] == pytest.approx(1.5)
+    assert after_seek == sorted(after_seek)
+    assert got[-1] < 2.0 - 0.05
+
+
+def test_shared_reader_and_max_lateness(synthetic_path):
+    expected = read_samples(synthetic_path)["tast"]
+
+    async def session(reader, start):
+        player = FlavPlayer(reader=reader, max_lateness=0.05)
+        got = []
+        async for t, frame in player.play(start=start):
+            got.append(t)
+            if len(got) == 3:
+                break
+        return got
+
+    async def late(reader):
+        # 受け取るたびにイベントループを止めて遅らせると、遅れたサンプルは捨てられる
+        player = FlavPlayer(reader=reader, decode=False, max_lateness=0.05)
+        got = []
+        async for t, frame in player.play(start=1.5):
+            got.append(t)
+            time.sleep(0.25)
+        return got
+
+    async def run(reader):
+        sessions = await asyncio.gather(*[session(reader, start) for start in (0.0, 0.5, 1.0, 1.5)])
+        return sessions, await late(reader)
+
+    with FlavReader(synthetic_path) as reader:
+        sessions, dropped = asyncio.run(run(reader))
+    for start, got in zip((0.0, 0.5, 1.0, 1.5), sessions):
+        assert got == pytest.approx([start, start + 0.1, start + 0.2])
+    assert 0 < len(dropped) < len(expected[15:])
+
+
+def test_player_requires_path_or_reader():
+    with pytest.raises(Exception):
+        FlavPlayer()
@@ -0,0 +1,106 @@
+import io
+import os
+
+import pytest
+
+from flavtool.analyzer import analyze
+from flavtool.composer import Composer
+from flavtool.parser import Parser
+from flavtool.parser.range_writer import RangeWriter
+
+method_sets = [("copy_file_range", "sendfile"), ("sendfile",), ()]
+# (start, length) または bytes。先頭の3つの範囲は元ファイル上で連続している
+operations = [(0, 1000), (1000, 200000), (201000, 5), b"header", (300000, 70000), (10, 20), b"", (0, 0),
+              (120000, 100000), b"tail"]
+
+
+@pytest.fixture
+def source_path(tmp_path) -> str:
+    path = str(tmp_path / "source.bin")
+    with open(path, "wb") as f:
+        f.write(os.urandom(400000))
+    return path
+
+
+def expected_output(source_path) -> bytes:
+    with open(source_path, "rb") as f:
+        data = f.read()
+    return b"".join(op if isinstance(op, bytes) else data[op[0]:op[0] + op[1]] for op in operations)
+
+
+@pytest.mark.parametrize("methods", method_sets)
+@pytest.mark.parametrize("min_kernel_copy", [0, RangeWriter.min_kernel_copy])
+def test_all_methods_write_the_same_bytes(source_path, tmp_path, monkeypatch, methods, min_kernel_copy):
+    monkeypatch.setattr(RangeWriter, "methods", methods)
+    monkeypatch.setattr(RangeWriter, "min_kernel_copy", min_kernel_copy)
+    path = str(tmp_path / "out.bin")
+    with open(source_path, "rb") as source, open(path, "wb") as dst:
+        dst.write(b"prefix")
+        writer = RangeWriter(dst, source)
+        for op in operations:
+            if isinstance(op, bytes):
+                writer.write(op)
+            else:
+                writer.copy(*op)
+        writer.flush()
+        dst.write(b"suffix")
+    with open(path, "rb") as f:
+        assert f.read() == b"prefix" + expected_output(source_path) + b"suffix"
+
+    copied = sum(op[1] for op in operations if not isinstance(op, bytes))
+    assert sum(writer.copied.values()) == copied
+    if methods == ():
+        assert writer.copied["read"] == copied
+    assert all(writer.copied[method] == 0 for method in ("copy_file_range", "sendfile") if method not in methods)
+
+
+def test_contiguous_ranges_are_merged(source_path):
+    with open(source_path, "rb") as source:
+        dst = io.BytesIO()
+        writer = RangeWriter(dst, source)
+        writer.copy(0, 10)
+        writer.copy(10, 20)
+        writer.copy(30, 5)
+        assert (writer.pending_start, writer.pending_length) == (0, 35)
+        assert dst.getvalue() == b""
+        writer.copy(100, 5)
+        assert (writer.pending_start, writer.pending_length) == (100, 5)
+        writer.flush()
+        source.seek(0)
+        data = source.read()
+    # BytesIO はファイルでないので読み書きでコピーする
+    assert writer.copied == {"copy_file_range": 0, "sendfile": 0, "read": 40}
+    assert dst.getvalue() == data[:35] + data[100:105]
+
+
+def test_copy_without_source_raises():
+    writer = RangeWriter(io.BytesIO())
+    writer.copy(0, 0)
+    with pytest.raises(Exception):
+        writer.copy(0, 10)
+
+
+def test_copy_past_end_of_source_raises(source_path, monkeypatch):
+    monkeypatch.setattr(RangeWriter, "methods", ())
+    with open(source_path, "rb") as source:
+        writer = RangeWriter(io.BytesIO(), source)
+        writer.copy(399990, 20)
+        with pytest.raises(Exception):
+            writer.flush()
+
+
+@pytest.mark.parametrize("methods", method_sets)
+def test_streaming_compose_matches_in_memory(synthetic_path, tmp_path, monkeypatch, methods):
+    reference = str(tmp_path / "reference.mp4")
+    composer = Composer(analyze(Parser(synthetic_path).parse(read_mdat_bytes=True)))
+    composer.compose()
+    composer.write(reference)
+
+    monkeypatch.setattr(RangeWriter, "methods", methods)
+    monkeypatch.setattr(RangeWriter, "min_kernel_copy", 0)
+    path = str(tmp_path / "streamed.mp4")
+    composer = Composer(analyze(Parser(synthetic_path).parse(read_mdat_bytes=False)))
+    composer.compose()
+    composer.write(path)
+    with open(reference, "rb") as expected, open(path, "rb") as out:
+        assert out.read() == expected.read()
@@ -0,0 +1,70 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from flavtool.analyzer import analyze
+from flavtool.parser import Parser
+from flavtool.reader import FlavReader
+
+from conftest import read_samples
+
+
+def test_reads_every_sample(synthetic_path):
+    expected = read_samples(synthetic_path)
+    with FlavReader(synthetic_path, cache_chunks=2) as reader:
+        for media_type, samples in expected.items():
+            assert reader.sample_count(media_type) == len(samples)
+            # 逆順に読んでも(キャッシュから追い出されても)同じサンプルになる
+            for i in reversed(range(len(samples))):
+                assert bytes(reader.read_sample(media_type, i)) == samples[i][0]
+
+
+def test_read_chunk_and_decode(synthetic_path):
+    flav_mp4 = analyze(Parser(synthetic_path).parse())
+    with FlavReader(synthetic_path, flav_mp4=flav_mp4) as reader:
+        chunk = flav_mp4.media_datas["vide"].data[1]
+        assert reader.read_chunk("vide", 1) == b"".join(bytes(s.data) for s in chunk.samples)
+        decoded = reader.decode_sample("tast", 0)
+        assert decoded.shape == (5,)
+        assert np.array_equal(decoded, np.frombuffer(bytes(flav_mp4.media_datas["tast"].data[0].samples[0].data),
+                                                     dtype=np.uint8))
+
+
+def test_concurrent_reads(synthetic_path):
+    expected = read_samples(synthetic_path)["vide"]
+    with FlavReader(synthetic_path, cache_chunks=1) as reader:
+        with ThreadPoolExecutor(8) as executor:
+            got = list(executor.map(lambda i: bytes(reader.read_sample("vide", i)), range(len(expected))))
+    assert got == [data for data, _ in expected]
+
+
+def test_closed_reader(synthetic_path):
+    reader = FlavReader(synthetic_path)
+    reader.close()
+    with pytest.raises(Exception):
+        reader.read_sample("vide", 0)
+
+
+def test_short_reads_are_completed(synthetic_path, monkeypatch):
+    expected = read_samples(synthetic_path)
+    pread = os.pread
+    # 1回の読み込みで最大7バイトしか返さない
+    monkeypatch.setattr(os, "pread", lambda fd, size, offset: pread(fd, min(size, 7), offset))
+    with FlavReader(synthetic_path) as reader:
+        for media_type, samples in expected.items():
+            assert [bytes(reader.read_sample(media_type, i)) for i in range(len(samples))] == \
+                   [data for data, _ in samples]
+
+
+def test_truncated_file_raises(synthetic_path, tmp_path):
+    path = str(tmp_path / "truncated.mp4")
+    with open(synthetic_path, "rb") as f:
+        data = f.read()
+    with open(path, "wb") as f:
+        f.write(data[:-3])
+    with FlavReader(path) as reader:
+        last_chunk = int(reader.index("vide").chunk_ids[-1])
+        with pytest.raises(Exception):
+            reader.read_chunk("vide", last_chunk)
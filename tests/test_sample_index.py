@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from flavtool.analyzer import analyze
+from flavtool.analyzer.media_data import SampleIndex
+from flavtool.parser import Parser
+
+
+def linear_sample_at_time(chunks, t):
+    time = 0
+    i = 0
+    for chunk in chunks:
+        for sample in chunk.samples:
+            if time <= t < time + sample.delta:
+                return i
+            time += sample.delta
+            i += 1
+    raise IndexError(t)
+
+
+def test_index_from_sample_table_matches_chunks(synthetic_path):
+    flav_mp4 = analyze(Parser(synthetic_path).parse())
+    for media_type, media_data in flav_mp4.media_datas.items():
+        if media_data is None:
+            continue
+        from_table = SampleIndex.from_sample_table(media_data.sample_table)
+        from_chunks = SampleIndex.from_chunks(media_data.data)
+        for name in ["decode_times", "deltas", "sizes", "chunk_ids"]:
+            assert np.array_equal(getattr(from_table, name), getattr(from_chunks, name)), name
+        assert from_table.duration == flav_mp4.tracks[media_type].media.header.duration
+
+
+def test_sample_lookup(synthetic_path):
+    media_data = analyze(Parser(synthetic_path).parse()).media_datas["tast"]
+    index = media_data.index
+    for t in [0, 1, 999, 1000, 1001, 7500, index.duration - 1]:
+        assert index.sample_at_time(t) == linear_sample_at_time(media_data.data, t)
+    with pytest.raises(IndexError):
+        index.sample_at_time(index.duration)
+    with pytest.raises(IndexError):
+        index.sample_at_time(-1)
+
+    assert index.time_of_sample(3) == 3000
+    assert index.samples_in_range(1000, 3000) == range(1, 3)
+    assert index.samples_in_range(1500, 3001) == range(1, 4)
+    assert index.samples_in_range(5000, 5000) == range(5, 5)
+    assert index.samples_in_range(0, index.duration + 1000) == range(0, len(index))
@@ -0,0 +1,77 @@
+import io
+
+import numpy as np
+import pytest
+
+from flavtool.parser import Parser
+from flavtool.parser.boxs.leaf import SttsBox, StscBox, StszBox, StcoBox, Co64Box, TimeToSample, SampleToChunk
+
+
+def reparse(box):
+    data = bytes(box.to_bytes())
+    f = io.BytesIO(data)
+    box_type, box_size, body_size, _ = box.get_type_and_size(f)
+    assert box_type == box.box_type
+    assert box_size == len(data) == box.get_size()
+    return type(box)(box_type).parse(f, body_size)
+
+
+def test_parsed_tables_round_trip(synthetic_path):
+    root = Parser(synthetic_path).parse()
+    with open(synthetic_path, "rb") as f:
+        raw = f.read()
+    stbl = root["moov"]["trak"]["mdia"]["minf"]["stbl"]
+    layout = {box_type: (offset, size) for box_type, offset, size in Parser(synthetic_path).scan()}
+    moov_offset, moov_size = layout["moov"]
+    for box_type in ["stts", "stsc", "stsz", "stco"]:
+        data = bytes(stbl[box_type].to_bytes())
+        assert data in raw[moov_offset:moov_offset + moov_size]
+
+
+@pytest.mark.parametrize("box, table_name, table", [
+    (SttsBox("stts"), "time_to_sample_table", [TimeToSample(3, 1000), TimeToSample(1, 500)]),
+    (StscBox("stsc"), "sample_to_chunk_table", [SampleToChunk(1, 10, 1), SampleToChunk(4, 2, 1)]),
+    (StszBox("stsz"), "sample_size_table", [10, 20, 30]),
+    (StcoBox("stco"), "chunk_to_offset_table", [100, 200]),
+    (Co64Box("co64"), "chunk_to_offset_table", [2 ** 33, 2 ** 34]),
+])
+def test_count_follows_table(box, table_name, table):
+    size = box.cached_size()
+    setattr(box, table_name, table)
+    assert box.number_of_entries == len(table)
+    assert box.cached_size() == size + len(table) * getattr(box, table_name).dtype.itemsize
+    parsed = reparse(box)
+    assert parsed.number_of_entries == len(table)
+    assert np.array_equal(np.asarray(getattr(parsed, table_name)), np.asarray(getattr(box, table_name)))
+
+
+def test_tables_keep_list_methods():
+    stts = SttsBox("stts", time_to_sample_table=[TimeToSample(2, 1000)])
+    size = stts.cached_size()
+    stts.time_to_sample_table.append(TimeToSample(1, 500))
+    stts.time_to_sample_table += [(4, 250)]
+    assert stts.number_of_entries == 3
+    assert stts.cached_size() == size + 2 * 8
+    assert stts.time_to_sample_table.sample_delta.tolist() == [1000, 500, 250]
+    assert stts.time_to_sample_table[1].sample_count == 1
+
+    stco = StcoBox("stco", chunk_to_offset_table=[100, 200])
+    # 配列の += (各要素への加算)ではなく、リストと同じく追加になる
+    stco.chunk_to_offset_table += [300]
+    stco.chunk_to_offset_table.extend(range(400, 1000, 100))
+    assert stco.chunk_to_offset_table.tolist() == [100, 200, 300, 400, 500, 600, 700, 800, 900]
+    assert reparse(stco).chunk_to_offset_table.tolist() == stco.chunk_to_offset_table.tolist()
+
+
+def test_count_only_boxes():
+    stco = StcoBox("stco", number_of_entries=3)
+    assert stco.chunk_to_offset_table.tolist() == [0, 0, 0]
+    assert stco.get_size() == 8 + 8 + 3 * 4
+    co64 = Co64Box(number_of_entries=stco.number_of_entries)
+    assert co64.get_size() == 8 + 8 + 3 * 8
+
+    stsz = StszBox("stsz", sample_size=100, number_of_entries=5)
+    assert stsz.number_of_entries == 5
+    assert len(stsz.sample_size_table) == 0
+    parsed = reparse(stsz)
+    assert (parsed.sample_size, parsed.number_of_entries) == (100, 5)
@@ -0,0 +1,38 @@
+import pytest
+
+from flavtool.analyzer import analyze
+from flavtool.analyzer.media_data import SampleData, StreamingSampleData, ChunkData, MediaData
+from flavtool.parser import Parser
+from flavtool.parser.boxs.leaf import TimeToSample, SampleToChunk, EditList
+
+from conftest import samples_of, read_samples
+
+
+@pytest.mark.parametrize("obj", [
+    SampleData(b"abc", 10), StreamingSampleData(100, 3, 10), ChunkData([], "tast"),
+    TimeToSample(1, 10), SampleToChunk(1, 2, 1), EditList(),
+])
+def test_entries_have_no_dict(obj):
+    assert not hasattr(obj, "__dict__")
+    with pytest.raises(AttributeError):
+        obj.unknown_attribute = 1
+
+
+def test_streaming_sample():
+    sample = StreamingSampleData(100, 3, 10)
+    assert (sample.start, sample.length, sample.delta) == (100, 3, 10)
+    assert len(sample) == 3
+    assert sample.data == b""
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_list_media_data_from_mdat(synthetic_path, streaming):
+    flav_mp4 = analyze(Parser(synthetic_path).parse(read_mdat_bytes=not streaming))
+    expected = read_samples(synthetic_path)
+    for media_type, media_data in list(flav_mp4.media_datas.items()):
+        if media_data is not None:
+            flav_mp4.media_datas[media_type] = MediaData.from_mdat_box(
+                flav_mp4.mdats, flav_mp4.sample_tables[media_type], media_type, streaming=streaming)
+    sample_type = StreamingSampleData if streaming else SampleData
+    assert all(type(sample) is sample_type for chunk in flav_mp4.media_datas["vide"].data for sample in chunk.samples)
+    assert samples_of(flav_mp4, synthetic_path) == expected
@@ -0,0 +1,39 @@
+import pytest
+
+from flavtool.analyzer import analyze
+from flavtool.analyzer.media_data import StreamingSampleData
+from flavtool.composer import Composer
+from flavtool.parser import Parser
+
+from conftest import read_samples
+
+
+def test_streaming_compose_keeps_mdat_out_of_memory(moov_last_path, tmp_path):
+    expected = read_samples(moov_last_path)
+    flav_mp4 = analyze(Parser(moov_last_path).parse(read_mdat_bytes=False))
+    assert isinstance(flav_mp4.media_datas["vide"].data[0].samples[0], StreamingSampleData)
+    composer = Composer(flav_mp4, faststart=True)
+    composer.compose()
+    assert flav_mp4.mdat.body == b""
+    assert flav_mp4.mdat.chunks is not None
+
+    path = str(tmp_path / "out.mp4")
+    composer.write(path)
+    assert [box_type for box_type, _, _ in Parser(path).scan()] == ["ftyp", "moov", "mdat"]
+    assert read_samples(path) == expected
+
+
+def test_streaming_compose_from_memory(synthetic_path, tmp_path):
+    expected = read_samples(synthetic_path)
+    composer = Composer(analyze(Parser(synthetic_path).parse()))
+    composer.compose(streaming=True)
+    path = str(tmp_path / "out.mp4")
+    composer.write(path)
+    assert read_samples(path) == expected
+
+
+def test_streaming_compose_cannot_overwrite_source(synthetic_path):
+    composer = Composer(analyze(Parser(synthetic_path).parse(read_mdat_bytes=False)))
+    composer.compose()
+    with pytest.raises(Exception):
+        composer.write(synthetic_path)
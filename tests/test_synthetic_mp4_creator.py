@@ -0,0 +1,33 @@
+import numpy as np
+
+from flavtool.codec import decode_batch
+from flavtool.composer.utils import SyntheticMp4Creator
+
+from conftest import samples_of, read_samples
+
+
+def test_tracks_and_durations():
+    creator = SyntheticMp4Creator(3, sample_rates={"vide": 30, "soun": 40, "tast": 10}, samples_per_chunk=4,
+                                  sample_sizes={"vide": 1000, "soun": 100})
+    flav_mp4 = creator.create()
+    samples = samples_of(flav_mp4)
+    assert {media_type: len(s) for media_type, s in samples.items()} == {"vide": 90, "soun": 120, "tast": 30}
+    assert flav_mp4.tracks["scnt"] is None
+    assert all(len(chunk.samples) <= 4 for chunk in flav_mp4.media_datas["vide"].data)
+    assert all(750 <= len(data) <= 1250 for data, _ in samples["vide"])
+    for media_type, track in flav_mp4.tracks.items():
+        if track is not None:
+            assert track.header.duration == 3000
+    taste = decode_batch("raw5", [data for data, _ in samples["tast"]])
+    assert taste.shape == (30, 5)
+
+
+def test_seeded(tmp_path):
+    a, b, c = (str(tmp_path / name) for name in ["a.mp4", "b.mp4", "c.mp4"])
+    SyntheticMp4Creator(1, seed=1).write(a)
+    SyntheticMp4Creator(1, seed=1).write(b)
+    SyntheticMp4Creator(1, seed=2).write(c)
+    with open(a, "rb") as fa, open(b, "rb") as fb:
+        assert fa.read() == fb.read()
+    assert read_samples(a) != read_samples(c)
+    assert read_samples(a) == samples_of(SyntheticMp4Creator(1, seed=1).create())
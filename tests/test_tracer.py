@@ -0,0 +1,58 @@
+import pytest
+
+from flavtool.analyzer import analyze
+from flavtool.composer import Composer
+from flavtool.parser import Parser
+from flavtool.parser.boxs.leaf import MvhdBox
+from flavtool.tracer import tracer
+
+
+@pytest.fixture
+def enabled_tracer():
+    tracer.clear()
+    yield tracer
+    tracer.disable()
+    tracer.clear()
+
+
+def compose(path, out):
+    composer = Composer(analyze(Parser(path).parse()))
+    composer.compose()
+    composer.write(out)
+
+
+def test_silent_by_default(synthetic_path, tmp_path, capsys):
+    compose(synthetic_path, str(tmp_path / "out.mp4"))
+    assert capsys.readouterr().out == ""
+    assert tracer.records == []
+
+
+def test_records_boxes(synthetic_path, enabled_tracer):
+    enabled_tracer.enable()
+    Parser(synthetic_path).parse()
+    top_level = [(r.box_type, r.offset, r.size) for r in enabled_tracer.records if r.depth == 0]
+    assert top_level == Parser(synthetic_path).scan()
+    summary = enabled_tracer.summary()
+    assert summary["trak"][0] == 3
+    assert summary["stsz"][0] == 3
+
+
+def test_dump_trees(synthetic_path, tmp_path, enabled_tracer, capsys):
+    enabled_tracer.enable(dump_trees=True)
+    compose(synthetic_path, str(tmp_path / "out.mp4"))
+    assert "moov" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("switch", ["enable", "disable"])
+def test_switching_during_parse(synthetic_path, enabled_tracer, monkeypatch, switch):
+    if switch == "disable":
+        enabled_tracer.enable()
+    parse = MvhdBox.parse
+
+    def parse_and_switch(self, f, body_size):
+        getattr(enabled_tracer, switch)()
+        return parse(self, f, body_size)
+
+    monkeypatch.setattr(MvhdBox, "parse", parse_and_switch)
+    Parser(synthetic_path).parse()
+    assert enabled_tracer.depth == 0